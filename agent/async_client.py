@@ -0,0 +1,128 @@
+# agent/async_client.py
+"""
+asyncio-native Deepfake Detection Client
+Same surface as DeepfakeDetectionAgent (detect_image / detect_audio / process_message), built on
+aiohttp so one process can keep hundreds of uploads in flight without a thread per request.
+"""
+
+import asyncio
+import os
+import sys
+from typing import Iterable, List, Optional
+
+import aiohttp
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agent.main import BACKEND_URL, DeepfakeDetectionAgent
+
+
+class AsyncDeepfakeDetectionAgent:
+    """
+    Async detection client.
+
+    Args:
+        name (str): Agent name, as for DeepfakeDetectionAgent.
+        backend_url (str): Detection backend base URL.
+        max_concurrency (int): Requests allowed in flight at once (semaphore).
+        connection_limit (int): Size of the keep-alive connection pool.
+        timeout (float): Total seconds allowed per request.
+
+    Use as ``async with AsyncDeepfakeDetectionAgent(...) as agent:`` or call ``close()``.
+    """
+
+    # Result formatting is identical to the blocking agent
+    format_result = DeepfakeDetectionAgent.format_result
+
+    def __init__(self, name: str, backend_url: str = BACKEND_URL, max_concurrency: int = 100,
+                 connection_limit: int = 100, timeout: float = 60.0):
+        self.name = name
+        self.backend_url = backend_url.rstrip('/')
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def __aenter__(self):
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=30)
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def process_message(self, message_text: str = None, file_path: str = None, file_type: str = None):
+        """
+        Process user input and return appropriate response
+        """
+        try:
+            if file_path and file_type:
+                if file_type.startswith("image/"):
+                    return self.format_result(await self.detect_image(file_path))
+                elif file_type.startswith("audio/"):
+                    return self.format_result(await self.detect_audio(file_path))
+                else:
+                    return "Sorry, I can only process image and audio files."
+        except Exception as e:
+            return f"Sorry, an error occurred: {str(e)}"
+
+        # Text-only replies need no I/O; reuse the blocking agent's wording
+        return DeepfakeDetectionAgent.process_message(self, message_text=message_text)
+
+    async def detect_image(self, file_path: str):
+        """Send image to backend for analysis"""
+        return await self._detect("/detect-image", file_path, "image/jpeg", "image")
+
+    async def detect_audio(self, file_path: str):
+        """Send audio to backend for analysis"""
+        return await self._detect("/detect-audio", file_path, "audio/wav", "audio")
+
+    async def _detect(self, endpoint: str, file_path: str, content_type: str, kind: str):
+        async with self._semaphore:
+            try:
+                with open(file_path, 'rb') as f:
+                    # aiohttp streams file objects in chunks, reading them off the event loop
+                    form = aiohttp.FormData()
+                    form.add_field('file', f, filename=os.path.basename(file_path), content_type=content_type)
+                    async with self._get_session().post(f"{self.backend_url}{endpoint}", data=form) as response:
+                        response.raise_for_status()
+                        return await response.json()
+            except Exception as e:
+                return {"error": f"Failed to analyze {kind}: {str(e)}"}
+
+    async def detect_many(self, file_paths: Iterable[str]) -> List[dict]:
+        """Analyze many files concurrently (bounded by max_concurrency); results keep input order"""
+        tasks = []
+        for path in file_paths:
+            extension = os.path.splitext(path)[1].lower()
+            if extension in ('.wav', '.mp3', '.flac', '.ogg', '.m4a'):
+                tasks.append(self.detect_audio(path))
+            else:
+                tasks.append(self.detect_image(path))
+        return await asyncio.gather(*tasks)
+
+
+async def _main(paths):
+    async with AsyncDeepfakeDetectionAgent(name="deepfake_detector_async") as agent:
+        for path, result in zip(paths, await agent.detect_many(paths)):
+            print(f"{path}: {agent.format_result(result)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python agent/async_client.py <file> [<file> ...]")
+    else:
+        asyncio.run(_main(sys.argv[1:]))
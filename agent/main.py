@@ -4,14 +4,23 @@ Conversational Agent using Google Agent Development Kit (ADK)
 This agent interacts with users, accepts image/audio input, and calls backend endpoints for deepfake detection.
 """
 
-import requests
 import json
+import mimetypes
+import os
+import sys
+from contextlib import ExitStack
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google_agent.http_client import get_client
 
 BACKEND_URL = "http://127.0.0.1:8080"  # Our tested backend URL
 
 class DeepfakeDetectionAgent:
     def __init__(self, name: str):
         self.name = name
+        self.http = get_client()  # Pooled keep-alive connections shared by every call
         print(f"Initializing {self.name} agent...")
 
     def process_message(self, message_text: str = None, file_path: str = None, file_type: str = None):
@@ -48,7 +57,7 @@ class DeepfakeDetectionAgent:
         try:
             with open(file_path, 'rb') as f:
                 files = {'file': (file_path, f, 'image/jpeg')}
-                response = requests.post(f"{BACKEND_URL}/detect-image", files=files)
+                response = self.http.post(f"{BACKEND_URL}/detect-image", files=files, retry=True)
                 response.raise_for_status()
                 return response.json()
         except Exception as e:
@@ -59,12 +68,32 @@ class DeepfakeDetectionAgent:
         try:
             with open(file_path, 'rb') as f:
                 files = {'file': (file_path, f, 'audio/wav')}
-                response = requests.post(f"{BACKEND_URL}/detect-audio", files=files)
+                response = self.http.post(f"{BACKEND_URL}/detect-audio", files=files, retry=True)
                 response.raise_for_status()
                 return response.json()
         except Exception as e:
             return {"error": f"Failed to analyze audio: {str(e)}"}
 
+    def detect_batch(self, file_paths):
+        """
+        Send many images/audio files in one request to /detect-batch.
+        Yields one result dict per file, in the order the backend finishes them.
+        """
+        try:
+            with ExitStack() as stack:
+                files = []
+                for path in file_paths:
+                    mime_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+                    files.append(('files', (os.path.basename(path), stack.enter_context(open(path, 'rb')), mime_type)))
+                response = self.http.post(f"{BACKEND_URL}/detect-batch", files=files, stream=True,
+                                          deadline=600, retry=True)
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+        except Exception as e:
+            yield {"error": f"Failed to analyze batch: {str(e)}"}
+
     def format_result(self, result):
         """Format analysis results for user-friendly display"""
         if "error" in result:
@@ -0,0 +1,411 @@
+"""
+ASGI Serving Mode for the Detection Backend
+Starlette routes sharing main.py's models, caches, uploader and job queue. Request bodies and
+URL downloads are awaited chunk by chunk on the event loop and only inference is offloaded to
+the inference thread pool, so slow clients and slow origins no longer hold a worker.
+
+Run with:
+    uvicorn asgi:app --app-dir backend --host 0.0.0.0 --port 8080
+"""
+
+import asyncio
+import contextvars
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from functools import partial
+
+import aiohttp
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import main
+from ingestion import (AUDIO_MAX_BYTES, CHUNK_SIZE, DEFAULT_MAX_BYTES, RAW_BODY_TYPES, IngestionError, PayloadTooLarge,
+                       guess_media_kind, ingest_async_stream, ingest_file, raw_body_filename, url_filename)
+from image_preprocess import ImageDecodeError
+from jobs import QueueFull, validate_callback_url
+from metrics import metrics_payload, stage, track_request
+
+URL_FETCH_TIMEOUT = float(os.environ.get('URL_FETCH_TIMEOUT', 30))
+
+http_session = None
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Run model work on the shared inference pool without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry the request's metrics labels over to the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(main.inference_executor, partial(context.run, fn, *args, **kwargs))
+
+
+async def completed(value):
+    return value
+
+
+async def ingest_url_async(url, kind='file', **limits):
+    """Stream a URL download into an IngestedPayload without blocking the event loop"""
+    max_bytes = limits.get('max_bytes', DEFAULT_MAX_BYTES)
+    try:
+        async with http_session.get(url) as r:
+            r.raise_for_status()
+            if r.content_length is not None and r.content_length > max_bytes:
+                raise PayloadTooLarge(max_bytes)
+            return await ingest_async_stream(r.content.iter_chunked(CHUNK_SIZE), url_filename(url),
+                                             r.headers.get('Content-Type'), **limits)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise IngestionError(f'Error downloading {kind} from URL: {e}', 400)
+
+
+async def ingest_upload(upload, **limits):
+    """Copy a parsed multipart part into an IngestedPayload off the event loop"""
+    try:
+        return await run_in_threadpool(ingest_file, upload.file, upload.filename, upload.content_type, **limits)
+    finally:
+        await upload.close()
+
+
+async def ingest_request_async(request, kind, **limits):
+    """
+    ASGI counterpart of ingestion.ingest_request.
+
+    Accepts a multipart 'file' part, a JSON 'url', or a raw image/audio body (filename from
+    ``?filename=``) that is streamed into the payload as it arrives.
+    """
+    content_type = request.headers.get('content-type', '')
+    max_bytes = limits.get('max_bytes', DEFAULT_MAX_BYTES)
+    declared = request.headers.get('content-length')
+    if declared and declared.isdigit() and int(declared) > max_bytes + CHUNK_SIZE:
+        raise PayloadTooLarge(max_bytes)
+
+    if content_type.startswith('multipart/form-data'):
+        form = await request.form(max_files=1)
+        upload = form.get('file')
+        if upload is None or isinstance(upload, str):
+            raise IngestionError(f'No {kind} file or URL provided.', 400)
+        return await ingest_upload(upload, **limits)
+    if content_type.startswith('application/json'):
+        try:
+            body = await request.json()
+        except ValueError:
+            raise IngestionError('Request body is not valid JSON.', 400)
+        if isinstance(body, dict) and body.get('url'):
+            return await ingest_url_async(body['url'], kind, **limits)
+    elif content_type.startswith(RAW_BODY_TYPES):
+        mimetype = content_type.split(';')[0]
+        filename = raw_body_filename(request.headers, request.query_params, mimetype)
+        return await ingest_async_stream(request.stream(), filename, mimetype, **limits)
+    raise IngestionError(f'No {kind} file or URL provided.', 400)
+
+
+async def archive_payload(payload):
+    # Enqueueing can block briefly when the upload queue applies backpressure
+    await run_in_threadpool(main.archive_payload, payload)
+
+
+@track_request('/detect-image', main.IMAGE_MODEL_ID)
+async def detect_image(request):
+    try:
+        with stage('ingest'):
+            payload = await ingest_request_async(request, 'image')
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+
+    with payload:
+        with stage('archive'):
+            await archive_payload(payload)
+        try:
+            result = await run_inference(main.analyze_image_payload, payload, archive=False,
+                                         near_duplicates=main.near_duplicates_requested(request.query_params))
+        except ImageDecodeError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+        except Exception as e:
+            return JSONResponse({'error': f'Error processing image: {e}'}, status_code=500)
+    return JSONResponse(result)
+
+
+@track_request('/detect-audio', main.AUDIO_MODEL_ID)
+async def detect_audio(request):
+    try:
+        with stage('ingest'):
+            payload = await ingest_request_async(request, 'audio', max_bytes=AUDIO_MAX_BYTES)
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+
+    with payload:
+        with stage('archive'):
+            await archive_payload(payload)
+        try:
+            result = await run_inference(main.analyze_audio_payload, payload,
+                                         request.query_params.get('mode') == 'stream', archive=False)
+        except Exception as e:
+            return JSONResponse({'error': f'Error processing audio: {e}'}, status_code=500)
+    return JSONResponse(result)
+
+
+async def near_duplicates(request):
+    if request.method == 'GET':
+        return JSONResponse(main.near_duplicate_index.stats())
+    try:
+        radius = request.query_params.get('radius')
+        dhash_radius = request.query_params.get('dhash_radius')
+        radius = int(radius) if radius is not None else None
+        dhash_radius = int(dhash_radius) if dhash_radius is not None else None
+    except ValueError:
+        return JSONResponse({'error': 'radius and dhash_radius must be integers.'}, status_code=400)
+    try:
+        with await ingest_request_async(request, 'image') as payload:
+            result = await run_in_threadpool(main.inspect_near_duplicates, payload, radius, dhash_radius)
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    return JSONResponse(result)
+
+
+@track_request('/voices/search', 'resemblyzer')
+async def search_voices(request):
+    try:
+        k = max(1, int(request.query_params.get('k', 5)))
+    except ValueError:
+        return JSONResponse({'error': 'k must be an integer.'}, status_code=400)
+    try:
+        with stage('ingest'):
+            payload = await ingest_request_async(request, 'audio')
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+
+    with payload:
+        try:
+            result = await run_inference(main.search_voice_payload, payload, k)
+        except Exception as e:
+            return JSONResponse({'error': f'Error processing audio: {e}'}, status_code=500)
+    return JSONResponse(result)
+
+
+async def voices(request):
+    if request.method == 'GET':
+        index = await run_in_threadpool(main.registry.get, 'voice_index')
+        return JSONResponse(index.stats())
+    # label/name come as form fields (multipart), JSON fields next to 'url', or query parameters
+    # (raw bodies); Starlette caches the parsed body for ingest_request_async
+    content_type = request.headers.get('content-type', '')
+    fields = request.query_params
+    try:
+        if content_type.startswith('multipart/form-data'):
+            fields = await request.form()
+        elif content_type.startswith('application/json'):
+            body = await request.json()
+            fields = body if isinstance(body, dict) else fields
+    except ValueError:
+        return JSONResponse({'error': 'Request body is not valid JSON.'}, status_code=400)
+    try:
+        with await ingest_request_async(request, 'audio') as payload:
+            entry = await run_inference(main.enroll_voice_payload, payload, fields.get('label'), fields.get('name'))
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    except Exception as e:
+        return JSONResponse({'error': f'Error processing audio: {e}'}, status_code=500)
+    return JSONResponse(entry, status_code=201)
+
+
+async def detect_audio_timeline(request):
+    try:
+        window_seconds = float(request.query_params.get('window', 2.0))
+        hop_seconds = float(request.query_params.get('hop', 0.5))
+    except ValueError:
+        return JSONResponse({'error': 'window and hop must be numbers of seconds.'}, status_code=400)
+    if window_seconds <= 0 or hop_seconds <= 0:
+        return JSONResponse({'error': 'window and hop must be positive.'}, status_code=400)
+
+    try:
+        payload = await ingest_request_async(request, 'audio')
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+
+    with payload:
+        try:
+            result = await run_inference(main.analyze_timeline_payload, payload, window_seconds, hop_seconds)
+        except Exception as e:
+            return JSONResponse({'error': f'Error processing audio: {e}'}, status_code=500)
+    return JSONResponse(result)
+
+
+async def detect_batch_item(index, source, kind=None):
+    """Await the download (for URLs) and archiving, then analyze on the inference pool"""
+    if isinstance(source, str):
+        try:
+            source = await ingest_url_async(source)
+        except IngestionError as e:
+            return {'index': index, 'source': source, 'error': str(e)}
+    try:
+        await archive_payload(source)
+    except Exception as e:
+        source.close()
+        return {'index': index, 'source': source.filename, 'error': f'Error archiving file: {e}'}
+    return await run_inference(main.detect_batch_item, index, source, kind, archive=False)
+
+
+async def detect_batch(request):
+    """Same contract as the Flask /detect-batch route: NDJSON lines in completion order"""
+    uploads, url_items = [], []
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        form = await request.form(max_files=main.BATCH_MAX_ITEMS + 1)
+        uploads = [part for part in form.getlist('files') + form.getlist('file') if not isinstance(part, str)]
+    else:
+        try:
+            body = await request.json()
+        except ValueError:
+            body = {}
+        for entry in body.get('urls', []) if isinstance(body, dict) else []:
+            if isinstance(entry, dict):
+                url_items.append((entry.get('url'), entry.get('type')))
+            else:
+                url_items.append((entry, None))
+
+    total = len(uploads) + len(url_items)
+    if total == 0:
+        return JSONResponse({'error': 'No files or URLs provided.'}, status_code=400)
+    if total > main.BATCH_MAX_ITEMS:
+        for upload in uploads:
+            await upload.close()
+        return JSONResponse({'error': f'Too many items; the limit is {main.BATCH_MAX_ITEMS} per batch.'},
+                            status_code=413)
+
+    tasks = []
+    for index, upload in enumerate(uploads):
+        try:
+            payload = await ingest_upload(upload)
+        except IngestionError as e:
+            tasks.append(asyncio.ensure_future(
+                completed({'index': index, 'source': upload.filename, 'error': str(e)})))
+            continue
+        tasks.append(asyncio.ensure_future(detect_batch_item(index, payload)))
+    for index, (url, kind) in enumerate(url_items, start=len(uploads)):
+        if not isinstance(url, str) or not url:
+            tasks.append(asyncio.ensure_future(completed({'index': index, 'error': 'Invalid URL entry'})))
+            continue
+        tasks.append(asyncio.ensure_future(detect_batch_item(index, url, kind)))
+
+    async def generate():
+        for next_result in asyncio.as_completed(tasks):
+            yield json.dumps(await next_result) + '\n'
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson')
+
+
+async def submit_job(request):
+    """Same contract as the Flask /jobs route"""
+    content_type = request.headers.get('content-type', '')
+    upload = None
+    if content_type.startswith('multipart/form-data'):
+        form = await request.form(max_files=1)
+        params = form
+        upload = form.get('file') if not isinstance(form.get('file'), str) else None
+    else:
+        try:
+            params = await request.json()
+        except ValueError:
+            params = {}
+        params = params if isinstance(params, dict) else {}
+    options = {'mode': params.get('mode')}
+    callback_url = params.get('callback_url')
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            return JSONResponse({'error': str(e)}, status_code=400)
+
+    try:
+        if upload is not None:
+            with await ingest_upload(upload, max_bytes=AUDIO_MAX_BYTES) as payload:
+                kind = params.get('type') or guess_media_kind(payload.filename, payload.content_type)
+                # Only audio gets the long-recording limit
+                if kind != 'audio' and payload.size > DEFAULT_MAX_BYTES:
+                    raise PayloadTooLarge(DEFAULT_MAX_BYTES)
+                source_path = await run_in_threadpool(payload.hand_off_file)
+                job_id = await run_in_threadpool(main.job_queue.submit, kind or 'unknown', source_path,
+                                                 payload.filename, payload.content_type, options, callback_url)
+        elif params.get('url'):
+            options['url'] = params['url']
+            kind = params.get('type') or guess_media_kind(params['url'])
+            job_id = await run_in_threadpool(main.job_queue.submit, kind or 'unknown',
+                                             options=options, callback_url=callback_url)
+        else:
+            return JSONResponse({'error': 'No file or URL provided.'}, status_code=400)
+    except IngestionError as e:
+        return JSONResponse({'error': str(e)}, status_code=e.status_code)
+    except QueueFull as e:
+        return JSONResponse({'error': str(e)}, status_code=503)
+
+    return JSONResponse({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': request.url_for('get_job', job_id=job_id).path
+    }, status_code=202)
+
+
+async def get_job(request):
+    job = await run_in_threadpool(main.job_queue.get, request.path_params['job_id'])
+    if job is None:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+    return JSONResponse(job)
+
+
+async def health_check(request):
+    return JSONResponse(await run_in_threadpool(main.health_status))
+
+
+async def metrics(request):
+    body, content_type, status_code = metrics_payload()
+    return Response(body, status_code=status_code, media_type=content_type)
+
+
+async def liveness(request):
+    return JSONResponse({'status': 'ok'})
+
+
+async def readiness(request):
+    body, status_code = main.readiness_status()
+    return JSONResponse(body, status_code=status_code)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global http_session
+    http_session = aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=URL_FETCH_TIMEOUT),
+        connector=aiohttp.TCPConnector(limit=100)
+    )
+    if main.PRELOAD_MODE != 'background':
+        # Load weights before the first request (the inference pool already forked at import)
+        await run_in_threadpool(main.warm_up)
+    yield
+    await http_session.close()
+
+
+app = Starlette(
+    routes=[
+        Route('/', health_check),
+        Route('/metrics', metrics),
+        Route('/healthz', liveness),
+        Route('/readyz', readiness),
+        Route('/detect-image', detect_image, methods=['POST']),
+        Route('/detect-audio', detect_audio, methods=['POST']),
+        Route('/detect-audio/timeline', detect_audio_timeline, methods=['POST']),
+        Route('/detect-batch', detect_batch, methods=['POST']),
+        Route('/near-duplicates', near_duplicates, methods=['GET', 'POST']),
+        Route('/voices', voices, methods=['GET', 'POST']),
+        Route('/voices/search', search_voices, methods=['POST']),
+        Route('/jobs', submit_job, methods=['POST']),
+        Route('/jobs/{job_id}', get_job, name='get_job'),
+    ],
+    lifespan=lifespan,
+)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 8080)))
@@ -0,0 +1,147 @@
+"""
+Multi-Process Inference Pool
+Forks inference worker processes after the models are loaded, so every worker shares one
+copy-on-write copy of the weights and image decoding/preprocessing runs outside the web
+process's GIL. Request threads dispatch work over the pool's local call queue.
+"""
+
+import gc
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Callable, Iterable, Optional
+
+
+def _init_worker(threads_per_worker: int):
+    # Keep torch/BLAS from starting one thread per core in every worker
+    try:
+        import torch
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+
+
+def _call_with_source(fn: Callable, source, *args):
+    # Spilled payloads arrive as a path, in-memory ones as bytes
+    return fn(BytesIO(source) if isinstance(source, bytes) else source, *args)
+
+
+class InferencePool:
+    """
+    Process pool forked from a parent that already holds the loaded models.
+
+    The pool starts in the process that calls ``start()`` or first uses it, loads ``preload``
+    models from ``registry`` and then forks ``processes`` workers. Call ``start()`` before
+    the process starts other threads, so no worker inherits a lock held mid-operation. Weight tensors are never written during inference, so
+    their pages stay shared between all workers instead of being copied per process.
+
+    Args:
+        registry: ModelRegistry whose models the workers use.
+        processes (int): Worker processes to fork.
+        preload (iterable): Registry names to load before forking.
+        threads_per_worker (int): torch intra-op threads per worker (default: cores / processes).
+    """
+
+    def __init__(self, registry, processes: int, preload: Optional[Iterable[str]] = None,
+                 threads_per_worker: Optional[int] = None):
+        if processes < 1:
+            raise ValueError("processes must be at least 1")
+        self.registry = registry
+        self.processes = processes
+        self.preload = list(preload) if preload is not None else None
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // processes)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._tasks = 0
+        self._failed = 0
+        self._restarts = 0
+
+    def _ensure_started(self) -> ProcessPoolExecutor:
+        if self._executor is not None and self._pid == os.getpid():
+            return self._executor
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                try:
+                    self.registry.preload(self.preload)
+                except Exception as e:
+                    # Fork anyway: the workers load (and retry) the failed model themselves
+                    print(f"Warning: inference pool preload failed: {e}")
+                # Move everything loaded so far out of the collector's reach, so GC passes in
+                # the workers don't write to (and un-share) the pages holding the models
+                gc.collect()
+                gc.freeze()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_worker,
+                    initargs=(self.threads_per_worker,),
+                )
+                # ProcessPoolExecutor forks its workers on the first submit; do that here so
+                # start() really forks, before the caller starts any threads of its own
+                self._executor.submit(os.getpid).result()
+                self._pid = os.getpid()
+                print(f"Inference pool started with {self.processes} processes "
+                      f"({self.threads_per_worker} threads each)")
+        return self._executor
+
+    def start(self):
+        """Load the models and fork the workers now instead of on first use"""
+        self._ensure_started()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Run ``fn(*args)`` in a worker; ``fn`` must be a module-level function"""
+        executor = self._ensure_started()
+        with self._lock:
+            self._tasks += 1
+        return executor.submit(fn, *args)
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Submit and wait for the result; a crashed worker pool is re-forked for later calls"""
+        try:
+            return self.submit(fn, *args).result(timeout=timeout)
+        except BrokenProcessPool:
+            self._restart()
+            raise
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+
+    def run_on_payload(self, fn: Callable, payload, *args, timeout: Optional[float] = None) -> Any:
+        """
+        Run ``fn(file_like_or_path, *args)`` in a worker for an IngestedPayload.
+        Spilled payloads are passed by path rather than copied through the call queue.
+        """
+        source = payload.path if payload.path is not None else payload.getvalue()
+        return self.run(_call_with_source, fn, source, *args, timeout=timeout)
+
+    def _restart(self):
+        with self._lock:
+            self._failed += 1
+            self._restarts += 1
+            broken, self._executor = self._executor, None
+        print("Inference pool worker died; re-forking the pool")
+        if broken is not None:
+            broken.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "processes": self.processes,
+                "threads_per_worker": self.threads_per_worker,
+                "started": self._executor is not None and self._pid == os.getpid(),
+                "tasks": self._tasks,
+                "failed": self._failed,
+                "restarts": self._restarts,
+            }
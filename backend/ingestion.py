@@ -0,0 +1,354 @@
+"""
+Upload and URL Ingestion for the Detection Backends
+Streams request bodies and URL downloads into a bounded in-memory buffer, spilling to a
+uniquely named temp file only above a size threshold, and hands detectors a zero-copy view.
+"""
+
+import base64
+import binascii
+import hashlib
+import mimetypes
+import mmap
+import os
+import shutil
+import tempfile
+import uuid
+from io import BytesIO
+from typing import Any, AsyncIterable, Dict, Iterable, Optional, Tuple
+from urllib.parse import unquote
+
+import requests
+
+IMAGE_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'bmp', 'webp'}
+AUDIO_EXTENSIONS = {'wav', 'mp3', 'flac', 'ogg', 'm4a'}
+
+# Request bodies with these content types are the file itself, streamed as it arrives
+RAW_BODY_TYPES = ('image/', 'audio/', 'application/octet-stream')
+# Metadata of a raw-body upload travels in percent-encoded headers
+FILENAME_HEADER = 'X-Filename'
+FIELD_HEADERS = {'message': 'X-Message', 'session_id': 'X-Session-Id'}
+# Legacy JSON clients send base64 file contents under these (data, filename) keys
+LEGACY_BASE64_FIELDS = (('file_data', 'filename'), ('image_data', 'image_filename'), ('audio_data', 'audio_filename'))
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_BYTES = int(os.environ.get('INGEST_MAX_BYTES', 32 * 1024 * 1024))
+DEFAULT_SPOOL_THRESHOLD = int(os.environ.get('INGEST_SPOOL_THRESHOLD', 8 * 1024 * 1024))
+# Audio routes take long recordings (an hour of 16 kHz 16-bit mono WAV is ~115 MB); anything
+# above the spool threshold is on disk and large files are analyzed block by block
+AUDIO_MAX_BYTES = int(os.environ.get('INGEST_AUDIO_MAX_BYTES', 256 * 1024 * 1024))
+
+
+class IngestionError(Exception):
+    """Raised when a payload cannot be ingested; carries the HTTP status to return"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class PayloadTooLarge(IngestionError):
+    def __init__(self, max_bytes: int):
+        super().__init__(f"Payload exceeds the maximum size of {max_bytes} bytes.", 413)
+
+
+class IngestedPayload:
+    """
+    Bytes of one upload, held in memory or in a private temp file.
+
+    ``sha256`` and ``size`` are computed while streaming, so callers never need a second
+    pass over the data. Use as a context manager so spilled files are always removed.
+    """
+
+    def __init__(self, filename: str, content_type: Optional[str] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, spool_threshold: int = DEFAULT_SPOOL_THRESHOLD):
+        self.filename = filename
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self.spool_threshold = spool_threshold
+        self.size = 0
+        self.sha256: Optional[str] = None
+
+        self._hash = hashlib.sha256()
+        self._chunks = []
+        self._data: Optional[bytes] = None
+        self._file = None
+        self._path: Optional[str] = None
+        self._mmap = None
+
+    def write(self, chunk: bytes):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise PayloadTooLarge(self.max_bytes)
+        self._hash.update(chunk)
+
+        if self._file is None and self.size > self.spool_threshold:
+            self._spill()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._chunks.append(chunk)
+
+    def _spill(self):
+        # A unique name per payload, so concurrent uploads with the same filename never collide
+        suffix = os.path.splitext(self.filename or '')[1][:16]
+        fd, self._path = tempfile.mkstemp(prefix='ingest-', suffix=suffix)
+        self._file = os.fdopen(fd, 'w+b')
+        for chunk in self._chunks:
+            self._file.write(chunk)
+        self._chunks = []
+
+    def finish(self) -> "IngestedPayload":
+        """Mark the payload complete; called by the ingest_* helpers"""
+        self.sha256 = self._hash.hexdigest()
+        if self._file is not None:
+            self._file.flush()
+        else:
+            self._data = b''.join(self._chunks)
+            self._chunks = []
+        return self
+
+    @property
+    def in_memory(self) -> bool:
+        return self._file is None
+
+    @property
+    def path(self) -> Optional[str]:
+        """Temp file path for spilled payloads, None for in-memory ones"""
+        return self._path
+
+    def view(self) -> memoryview:
+        """Zero-copy view of the payload (memory-mapped when spilled to disk)"""
+        if self._file is None:
+            return memoryview(self._data)
+        if self._mmap is None:
+            if self.size == 0:
+                return memoryview(b'')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def open(self):
+        """
+        Fresh file-like object positioned at the start, for PIL/soundfile/librosa.
+        In-memory payloads are wrapped without copying the bytes.
+        """
+        if self._file is None:
+            return BytesIO(self._data)
+        return open(self._path, 'rb')
+
+    def getvalue(self) -> bytes:
+        """The payload as bytes; free for in-memory payloads, one read for spilled ones"""
+        if self._file is None:
+            return self._data
+        with open(self._path, 'rb') as f:
+            return f.read()
+
+    def hand_off_file(self) -> str:
+        """
+        Give the payload's bytes to another owner (e.g. the background uploader or job queue)
+        as a file the caller must delete. Spilled payloads are hard-linked (or copied where
+        links are not supported) rather than rewritten; in-memory payloads are written out once.
+        """
+        suffix = os.path.splitext(self._path or self.filename or '')[1][:16]
+        fd, target = tempfile.mkstemp(prefix='handoff-', suffix=suffix)
+        if self._path is None:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._data)
+            return target
+
+        os.close(fd)
+        os.remove(target)
+        try:
+            os.link(self._path, target)
+        except OSError:
+            shutil.copyfile(self._path, target)
+        return target
+
+    def close(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # A view from view() is still alive; the mapping goes away with the last view
+                pass
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+        self._data = None
+        self._chunks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def guess_media_kind(filename: Optional[str], content_type: Optional[str] = None) -> Optional[str]:
+    """Return 'image', 'audio' or None from the content type, falling back to the file extension"""
+    if content_type:
+        major = content_type.split('/', 1)[0].lower()
+        if major in ('image', 'audio'):
+            return major
+    extension = (filename or '').rsplit('.', 1)[-1].lower() if '.' in (filename or '') else ''
+    if extension in IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in AUDIO_EXTENSIONS:
+        return 'audio'
+    return None
+
+
+def ingest_stream(chunks: Iterable[bytes], filename: str, content_type: Optional[str] = None,
+                  max_bytes: int = DEFAULT_MAX_BYTES,
+                  spool_threshold: int = DEFAULT_SPOOL_THRESHOLD) -> IngestedPayload:
+    """Consume an iterable of byte chunks into an IngestedPayload"""
+    payload = IngestedPayload(filename, content_type, max_bytes, spool_threshold)
+    try:
+        for chunk in chunks:
+            payload.write(chunk)
+    except BaseException:
+        payload.close()
+        raise
+    return payload.finish()
+
+
+async def ingest_async_stream(chunks: AsyncIterable[bytes], filename: str, content_type: Optional[str] = None,
+                              max_bytes: int = DEFAULT_MAX_BYTES,
+                              spool_threshold: int = DEFAULT_SPOOL_THRESHOLD) -> IngestedPayload:
+    """Async counterpart of ingest_stream, for ASGI request bodies and aiohttp downloads"""
+    payload = IngestedPayload(filename, content_type, max_bytes, spool_threshold)
+    try:
+        async for chunk in chunks:
+            payload.write(chunk)
+    except BaseException:
+        payload.close()
+        raise
+    return payload.finish()
+
+
+def url_filename(url: str) -> str:
+    """Last path segment of a URL, used as the payload filename"""
+    return url.split('?')[0].rstrip('/').split('/')[-1] or 'download'
+
+
+def _read_chunks(stream, chunk_size: int = CHUNK_SIZE):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def ingest_file(stream, filename: str, content_type: Optional[str] = None, **limits) -> IngestedPayload:
+    """Ingest any readable binary stream (werkzeug FileStorage, request.stream, open file)"""
+    return ingest_stream(_read_chunks(stream), filename, content_type, **limits)
+
+
+def ingest_url(url: str, timeout: float = 30, session=None, **limits) -> IngestedPayload:
+    """Stream a URL download into an IngestedPayload, rejecting oversized responses early"""
+    max_bytes = limits.get('max_bytes', DEFAULT_MAX_BYTES)
+    http = session or requests
+    with http.get(url, stream=True, timeout=timeout) as r:
+        r.raise_for_status()
+        declared = r.headers.get('Content-Length')
+        if declared and declared.isdigit() and int(declared) > max_bytes:
+            raise PayloadTooLarge(max_bytes)
+        return ingest_stream(r.iter_content(chunk_size=CHUNK_SIZE), url_filename(url),
+                             r.headers.get('Content-Type'), **limits)
+
+
+def ingest_request(flask_request, kind: str, **limits) -> IngestedPayload:
+    """
+    Ingest the 'file' part of a multipart request or the JSON 'url' field.
+
+    Args:
+        flask_request: The current Flask request.
+        kind (str): 'image' or 'audio', used in error messages.
+
+    Raises:
+        IngestionError: With the status code the route should return.
+    """
+    if 'file' in flask_request.files:
+        upload = flask_request.files['file']
+        return ingest_file(upload.stream, upload.filename, upload.mimetype, **limits)
+    body = flask_request.get_json(silent=True) if flask_request.is_json else None
+    if isinstance(body, dict) and body.get('url'):
+        try:
+            return ingest_url(body['url'], **limits)
+        except requests.exceptions.RequestException as e:
+            raise IngestionError(f'Error downloading {kind} from URL: {e}', 400)
+    if flask_request.mimetype.startswith(RAW_BODY_TYPES):
+        return ingest_raw_body(flask_request, **limits)
+    raise IngestionError(f'No {kind} file or URL provided.', 400)
+
+
+def unnamed_upload_filename(content_type: Optional[str] = None) -> str:
+    """
+    Unique name for an upload that came without one: ``upload-<uuid>`` plus an extension from
+    the content type, so archived copies never overwrite each other and the media kind survives
+    """
+    mime = (content_type or '').split(';', 1)[0].strip().lower()
+    subtype = mime.rsplit('/', 1)[-1]
+    subtype = {'x-wav': 'wav', 'wave': 'wav'}.get(subtype, subtype)
+    if subtype in IMAGE_EXTENSIONS | AUDIO_EXTENSIONS:
+        extension = '.' + subtype
+    else:
+        extension = (mimetypes.guess_extension(mime) or '') if mime else ''
+    return f"upload-{uuid.uuid4().hex}{extension}"
+
+
+def raw_body_filename(headers, args, content_type: Optional[str] = None) -> str:
+    """Filename of a raw-body upload, from the X-Filename header or ?filename=, else a unique one"""
+    return (unquote(headers.get(FILENAME_HEADER, '')) or args.get('filename')
+            or unnamed_upload_filename(content_type))
+
+
+def ingest_raw_body(flask_request, **limits) -> IngestedPayload:
+    """Stream a raw image/audio request body into a payload without buffering it whole"""
+    declared = flask_request.content_length
+    max_bytes = limits.get('max_bytes', DEFAULT_MAX_BYTES)
+    if declared is not None and declared > max_bytes:
+        raise PayloadTooLarge(max_bytes)
+    filename = raw_body_filename(flask_request.headers, flask_request.args, flask_request.mimetype)
+    return ingest_file(flask_request.stream, filename, flask_request.mimetype, **limits)
+
+
+def ingest_message_request(flask_request, **limits) -> Tuple[Dict[str, Any], Optional[IngestedPayload]]:
+    """
+    Text fields and optional attachment of a chat-style request, in any of:
+      - multipart form: fields plus a 'file' part (browser FormData, requests ``files=``)
+      - raw image/audio body: fields from X-Message / X-Session-Id headers, name from X-Filename
+      - JSON: fields, with base64 contents under the legacy file_data/image_data/audio_data keys
+
+    Raises:
+        IngestionError: With the status code the route should return.
+    """
+    if flask_request.mimetype.startswith(RAW_BODY_TYPES):
+        fields = {name: unquote(flask_request.headers[header])
+                  for name, header in FIELD_HEADERS.items() if header in flask_request.headers}
+        return fields, ingest_raw_body(flask_request, **limits)
+
+    if flask_request.is_json:
+        fields = flask_request.get_json(silent=True)
+        if not isinstance(fields, dict):
+            raise IngestionError('Request body is not a JSON object.', 400)
+        for data_key, name_key in LEGACY_BASE64_FIELDS:
+            if fields.get(data_key):
+                try:
+                    data = base64.b64decode(fields.pop(data_key), validate=False)
+                except (binascii.Error, ValueError):
+                    raise IngestionError('Attached file is not valid base64.', 400)
+                return fields, ingest_stream([data], fields.get(name_key) or unnamed_upload_filename(), **limits)
+        return fields, None
+
+    fields = flask_request.form.to_dict()
+    upload = flask_request.files.get('file')
+    if upload is None or not upload.filename:
+        return fields, None
+    return fields, ingest_file(upload.stream, upload.filename, upload.mimetype, **limits)
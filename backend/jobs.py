@@ -0,0 +1,374 @@
+"""
+Asynchronous Detection Jobs
+SQLite-backed persistent job queue with a bounded worker pool, polling and webhook callbacks,
+so request threads return immediately instead of waiting on model compute.
+"""
+
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Matches a job only while it is still the claim (id, RUNNING, attempt number) a worker took:
+# once a lease expires and the job is claimed again, the earlier worker's renewals and results
+# no longer match and are dropped
+OWNED_CLAIM = "id = ? AND status = ? AND attempts = ?"
+
+
+class QueueFull(Exception):
+    """Raised when the number of pending jobs reaches ``max_pending``"""
+
+
+def validate_callback_url(url: str) -> str:
+    """Return ``url`` if it is an absolute http(s) URL, else raise ValueError"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise ValueError("callback_url must be an absolute http or https URL")
+    return url
+
+
+class JobQueue:
+    """
+    Persistent job queue.
+
+    Jobs and their status live in SQLite and input files in ``spool_dir``, so queued work
+    survives restarts and can be shared by several worker processes on one host. A job
+    claimed by a worker holds a lease, renewed while the handler runs; if the process dies,
+    the job is picked up again once the lease expires. Every claim counts as an attempt, so a
+    job that keeps killing its worker fails after ``max_attempts`` instead of looping.
+
+    Args:
+        db_path (str): SQLite database file.
+        spool_dir (str): Directory holding job input files until the job finishes.
+        handler (callable): ``handler(job) -> dict`` computing the result of a job.
+        workers (int): Worker threads in this process.
+        max_pending (int): Queued jobs accepted before ``submit`` raises QueueFull.
+        lease_seconds (float): How long a claimed job survives without a lease renewal (i.e. after
+            its worker died) before it is retried.
+        retention_seconds (float): How long finished jobs stay available for polling.
+    """
+
+    def __init__(self, db_path: str, spool_dir: str, handler: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 workers: int = 2, max_pending: int = 1000, lease_seconds: float = 600,
+                 retention_seconds: float = 86400, max_attempts: int = 3, poll_interval: float = 1.0):
+        self.db_path = db_path
+        self.spool_dir = spool_dir
+        self.handler = handler
+        self.workers = workers
+        self.max_pending = max_pending
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+
+        os.makedirs(spool_dir, exist_ok=True)
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        self._threads = []
+        # Webhook callbacks are posted by their own thread, so a dead callback URL never
+        # holds up a job worker
+        self._callbacks: "queue.Queue" = queue.Queue()
+        self._notifier = None
+        self._start_lock = threading.Lock()
+        self._stopping = False
+        self._pid = os.getpid()
+        self._init_schema()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; SQLite handles cross-thread and cross-process locking
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _init_schema(self):
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " kind TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " input_path TEXT,"
+            " filename TEXT,"
+            " content_type TEXT,"
+            " options TEXT NOT NULL,"
+            " callback_url TEXT,"
+            " result TEXT,"
+            " error TEXT,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_until REAL,"
+            " created_at REAL NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def start(self):
+        """Start the worker threads (idempotent per process)"""
+        with self._start_lock:
+            if self._pid != os.getpid():
+                # Forked after start(): the threads and SQLite connections stayed in the parent
+                self._pid = os.getpid()
+                self._local = threading.local()
+                self._threads = []
+                self._callbacks = queue.Queue()
+                self._notifier = None
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            self._notifier = threading.Thread(target=self._deliver_callbacks, name="job-notifier", daemon=True)
+            self._notifier.start()
+
+    def submit(self, kind: str, source_path: Optional[str] = None, filename: Optional[str] = None,
+               content_type: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+               callback_url: Optional[str] = None) -> str:
+        """
+        Queue a job and return its id.
+
+        ``source_path`` is moved into the spool directory; the queue owns it from then on.
+        Jobs without a file (e.g. URL jobs) pass their inputs through ``options``.
+        Raises ValueError for a callback URL that is not absolute http(s).
+        """
+        if callback_url:
+            try:
+                validate_callback_url(callback_url)
+            except ValueError:
+                if source_path:
+                    os.remove(source_path)
+                raise
+        if self.pending() >= self.max_pending:
+            if source_path:
+                os.remove(source_path)
+            raise QueueFull(f"Job queue is full ({self.max_pending} pending jobs)")
+
+        job_id = uuid.uuid4().hex
+        input_path = None
+        if source_path:
+            input_path = os.path.join(self.spool_dir, job_id)
+            shutil.move(source_path, input_path)
+
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, kind, status, input_path, filename, content_type, options,"
+            " callback_url, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, kind, QUEUED, input_path, filename, content_type,
+             json.dumps(options or {}), callback_url, now, now),
+        )
+        self.start()
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job, or None if it does not exist (or has expired)"""
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def pending(self) -> int:
+        (count,) = self._conn().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchone()
+        return count
+
+    def stats(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        stats = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        stats.update({status: count for status, count in rows})
+        stats["workers"] = len(self._threads)
+        return stats
+
+    def _claim(self) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job (or one whose lease expired).
+        Expired jobs that already used ``max_attempts`` claims are failed instead.
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            exhausted = [dict(row) for row in conn.execute(
+                "SELECT * FROM jobs WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (RUNNING, now, self.max_attempts),
+            ).fetchall()]
+            for job in exhausted:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated_at = ? WHERE id = ?",
+                    (FAILED, f"Worker lost the job {job['attempts']} times (lease expired)", now, job["id"]),
+                )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_until = ?, updated_at = ?"
+                    " WHERE id = ?",
+                    (RUNNING, now + self.lease_seconds, now, row["id"]),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._after_lease_failures(exhausted)
+        if row is None:
+            return None
+        job = dict(row)
+        job["attempts"] += 1
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def _after_lease_failures(self, jobs: List[Dict[str, Any]]):
+        for job in jobs:
+            self._remove_input(job)
+            if job.get("callback_url"):
+                self._notify(job["callback_url"], self.get(job["id"]))
+
+    def _renew_leases(self, job: Dict[str, Any], done: threading.Event):
+        """Extend the job's lease until ``done`` is set, so long-running jobs are not run twice"""
+        while not done.wait(self.lease_seconds / 3):
+            now = time.time()
+            cursor = self._conn().execute(
+                f"UPDATE jobs SET lease_until = ?, updated_at = ? WHERE {OWNED_CLAIM}",
+                (now + self.lease_seconds, now, job["id"], RUNNING, job["attempts"]),
+            )
+            if cursor.rowcount == 0:
+                return
+
+    def _finish(self, job: Dict[str, Any], status: str, result=None, error: Optional[str] = None) -> bool:
+        """Record the outcome; False if the job was meanwhile reclaimed by another worker"""
+        cursor = self._conn().execute(
+            f"UPDATE jobs SET status = ?, result = ?, error = ?, lease_until = NULL, updated_at = ?"
+            f" WHERE {OWNED_CLAIM}",
+            (status, json.dumps(result) if result is not None else None, error, time.time(),
+             job["id"], RUNNING, job["attempts"]),
+        )
+        if cursor.rowcount == 0:
+            return False
+        self._remove_input(job)
+        return True
+
+    @staticmethod
+    def _remove_input(job: Dict[str, Any]):
+        if job.get("input_path"):
+            try:
+                os.remove(job["input_path"])
+            except OSError:
+                pass
+
+    def _run(self):
+        last_purge = 0.0
+        while not self._stopping:
+            job = self._claim()
+            if job is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                if time.time() - last_purge > 60:
+                    self.purge_expired()
+                    last_purge = time.time()
+                continue
+
+            done = threading.Event()
+            renewer = threading.Thread(target=self._renew_leases, args=(job, done),
+                                       name=f"{threading.current_thread().name}-lease", daemon=True)
+            renewer.start()
+            try:
+                result = self.handler(job)
+            except Exception as e:
+                if job["attempts"] < self.max_attempts:
+                    # Put it back for another attempt
+                    self._conn().execute(
+                        f"UPDATE jobs SET status = ?, lease_until = NULL, error = ?, updated_at = ? WHERE {OWNED_CLAIM}",
+                        (QUEUED, str(e), time.time(), job["id"], RUNNING, job["attempts"]),
+                    )
+                    continue
+                finished = self._finish(job, FAILED, error=str(e))
+            else:
+                finished = self._finish(job, DONE, result=result)
+            finally:
+                done.set()
+                renewer.join()
+
+            if finished and job.get("callback_url"):
+                self._notify(job["callback_url"], self.get(job["id"]))
+
+    def _notify(self, callback_url: str, job: Dict[str, Any]):
+        """Queue the finished job for delivery to its callback URL by the notifier thread"""
+        try:
+            # Rows queued before submit() validated callback URLs are checked here too
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            print(f"Job callback to {callback_url} skipped: {e}")
+            return
+        self._callbacks.put((callback_url, job))
+
+    def _deliver_callbacks(self):
+        while True:
+            item = self._callbacks.get()
+            if item is None:
+                return
+            self._post_callback(*item)
+
+    @staticmethod
+    def _post_callback(callback_url: str, job: Dict[str, Any], attempts: int = 3):
+        """POST a job to its callback URL, retrying transient failures with backoff"""
+        for attempt in range(attempts):
+            try:
+                response = requests.post(callback_url, json=job, timeout=10)
+                if response.status_code < 500:
+                    return
+            except requests.RequestException as e:
+                print(f"Job callback to {callback_url} failed: {e}")
+            if attempt + 1 < attempts:
+                time.sleep(2 ** attempt)
+
+    def purge_expired(self):
+        """Delete finished jobs older than the retention period"""
+        cutoff = time.time() - self.retention_seconds
+        self._conn().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff)
+        )
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        if self._notifier is not None:
+            # Pending callbacks are delivered before the notifier exits
+            self._callbacks.put(None)
+            self._notifier.join()
+            self._notifier = None
@@ -1,18 +1,51 @@
 import os
-from flask import Flask, request, jsonify
-from google.cloud import storage
-import requests
-import os
-from PIL import Image
-from io import BytesIO
+import sys
 
-app = Flask(__name__)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Imported first so the startup report covers everything below
+from startup import startup_timer
 
-# Configure your GCS bucket name
-GCS_BUCKET = os.environ.get('GCS_BUCKET', 'your-bucket-name')
+with startup_timer.phase('imports'):
+    import contextvars
+    import json
+    import threading
+    import time
+    from io import BytesIO
+    from functools import partial
+    from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+    from flask import Flask, request, jsonify, Response, url_for
+    from werkzeug.utils import secure_filename
+
+    # Heavy ML libraries (transformers, torch, resemblyzer) are imported by the model
+    # loaders on first use, not here
+    from model_registry import registry
+    from batching import MicroBatcher
+    from result_cache import ResultCache, make_cache_key
+    from storage_uploader import BackgroundUploader, create_storage_from_env
+    from ingestion import (AUDIO_MAX_BYTES, DEFAULT_MAX_BYTES, IngestedPayload, IngestionError, PayloadTooLarge,
+                           guess_media_kind, ingest_file, ingest_request, ingest_url)
+    from audio_features import analyze_audio, analyze_timeline, synthetic_spans
+    from audio_stream import analyze_audio_stream
+    from jobs import JobQueue, QueueFull, validate_callback_url
+    from inference_pool import InferencePool
+    from image_preprocess import ImageDecodeError, ImagePreprocessor, classify_pixels
+    from near_duplicates import NearDuplicateIndex, describe_match, image_hashes
+    from voice_index import LABELS as VOICE_LABELS, VoiceIndex
+    from voice_embedding import combine_partials, forward_partials, utterance_partials
+    from metrics import metrics_payload, record_cache, record_result, stage, track_request
+
+app = Flask(__name__)
 
-# Initialize GCS client
-gcs_client = storage.Client()
+# Uploads are archived to object storage (GCS_BUCKET, or a local directory when
+# STORAGE_BACKEND=local) by background threads, off the request path
+uploader = BackgroundUploader(
+    create_storage_from_env(),
+    max_queue=int(os.environ.get('UPLOAD_QUEUE_SIZE', 100)),
+    workers=int(os.environ.get('UPLOAD_WORKERS', 2)),
+    max_retries=int(os.environ.get('UPLOAD_MAX_RETRIES', 3)),
+    enqueue_timeout=float(os.environ.get('UPLOAD_ENQUEUE_TIMEOUT', 1.0))
+)
 
 # Configuration (using environment variables)
 CONFIDENCE_THRESHOLD_IMAGE = float(os.environ.get('CONFIDENCE_THRESHOLD_IMAGE', 0.8))
@@ -21,6 +54,211 @@ DEEPFAKE_RESULT = os.environ.get('DEEPFAKE_RESULT', 'deepfake')
 SYNTHETIC_RESULT = os.environ.get('SYNTHETIC_RESULT', 'synthetic')
 REAL_RESULT = os.environ.get('REAL_RESULT', 'real')
 HUMAN_RESULT = os.environ.get('HUMAN_RESULT', 'human')
+IMAGE_MODEL_ID = os.environ.get('IMAGE_MODEL_ID', 'dima806/deepfake_vs_real_image_detection')
+# 'true' loads models at import, 'background' warms them in a thread while /healthz already
+# answers (and /readyz reports 503 until they are warm), 'false' loads them on first use
+PRELOAD_MODE = os.environ.get('PRELOAD_MODELS', 'false').lower()
+PRELOAD_MODELS = PRELOAD_MODE == 'true'
+# Models that must be warm before /readyz reports ready
+READY_MODELS = [name.strip() for name in os.environ.get('READY_MODELS', 'image,image_preprocessor').split(',') if name.strip()]
+IMAGE_BATCH_MAX_SIZE = int(os.environ.get('IMAGE_BATCH_MAX_SIZE', 8))
+IMAGE_BATCH_MAX_WAIT_MS = float(os.environ.get('IMAGE_BATCH_MAX_WAIT_MS', 10))
+IMAGE_MODEL_VERSION = os.environ.get('IMAGE_MODEL_VERSION', 'main')
+# Voice embeddings: partial-utterance windows of concurrent clips share one LSTM forward pass
+VOICE_BATCH_MAX_SIZE = int(os.environ.get('VOICE_BATCH_MAX_SIZE', 8))
+VOICE_BATCH_MAX_WAIT_MS = float(os.environ.get('VOICE_BATCH_MAX_WAIT_MS', 10))
+VOICE_BATCH_MAX_WINDOWS = int(os.environ.get('VOICE_BATCH_MAX_WINDOWS', 256))
+# 'torch' (Hugging Face pipeline) or 'onnx' (ONNX Runtime on CPU, see onnx_backend.py)
+IMAGE_BACKEND = os.environ.get('IMAGE_BACKEND', 'torch').lower()
+ONNX_MODEL_DIR = os.environ.get('ONNX_MODEL_DIR', '/tmp/onnx-image-model')
+ONNX_QUANTIZE = os.environ.get('ONNX_QUANTIZE', 'false').lower() == 'true'
+ONNX_THREADS = int(os.environ.get('ONNX_THREADS', 0))
+AUDIO_MODEL_ID = os.environ.get('AUDIO_MODEL_ID', 'spectral-heuristic')
+AUDIO_MODEL_VERSION = os.environ.get('AUDIO_MODEL_VERSION', '1')
+# Recordings larger than this (or requests with ?mode=stream) are analyzed segment by segment
+AUDIO_STREAM_THRESHOLD_BYTES = int(os.environ.get('AUDIO_STREAM_THRESHOLD_BYTES', 10 * 1024 * 1024))
+AUDIO_SEGMENT_SECONDS = float(os.environ.get('AUDIO_SEGMENT_SECONDS', 10))
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', 64))
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', os.cpu_count() or 4))
+# Inference worker processes forked after model load (0 runs inference in the web process)
+INFERENCE_PROCESSES = int(os.environ.get('INFERENCE_PROCESSES', 0))
+
+# Re-encoded/resized copies of an analyzed image reuse its verdict (pHash/dHash Hamming radius, 0-64).
+# Opt-in: a face swap of an indexed real photo can hash within the radius and be answered "real"
+# without inference, so enable it only where re-shared copies dominate and that risk is accepted
+NEAR_DUPLICATE_ENABLED = os.environ.get('NEAR_DUPLICATE_ENABLED', 'false').lower() == 'true'
+NEAR_DUPLICATE_RADIUS = int(os.environ.get('NEAR_DUPLICATE_RADIUS', 4))
+NEAR_DUPLICATE_DHASH_RADIUS = int(os.environ.get('NEAR_DUPLICATE_DHASH_RADIUS', 8))
+
+# Enrolled synthetic/human voice embeddings (append-only files in VOICE_INDEX_DIR; empty disables persistence)
+VOICE_INDEX_DIR = os.environ.get('VOICE_INDEX_DIR', '/tmp/voice-index')
+VOICE_INDEX_IVF_MIN_SIZE = int(os.environ.get('VOICE_INDEX_IVF_MIN_SIZE', 50000))
+VOICE_INDEX_NLIST = int(os.environ.get('VOICE_INDEX_NLIST', 0))
+VOICE_INDEX_NPROBE = int(os.environ.get('VOICE_INDEX_NPROBE', 8))
+# Cosine similarity at which the nearest enrolled voice decides the verdict
+VOICE_MATCH_THRESHOLD = float(os.environ.get('VOICE_MATCH_THRESHOLD', 0.8))
+
+JOB_DB = os.environ.get('JOB_DB', '/tmp/deepfake-jobs.db')
+JOB_SPOOL_DIR = os.environ.get('JOB_SPOOL_DIR', '/tmp/deepfake-jobs')
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 1000))
+
+# Worker threads shared by batch requests; image items still meet in the micro-batcher
+inference_executor = ThreadPoolExecutor(max_workers=INFERENCE_WORKERS, thread_name_prefix='inference')
+
+# Result cache (in-memory LRU, plus SQLite when RESULT_CACHE_DB is set)
+result_cache = ResultCache(
+    max_entries=int(os.environ.get('RESULT_CACHE_SIZE', 1024)),
+    ttl_seconds=float(os.environ.get('RESULT_CACHE_TTL_SECONDS', 86400)),
+    disk_path=os.environ.get('RESULT_CACHE_DB') or None,
+    disk_max_entries=int(os.environ.get('RESULT_CACHE_DB_MAX_ENTRIES', 100000))
+)
+
+# Perceptual-hash index of analyzed images, consulted after an exact-digest cache miss
+near_duplicate_index = NearDuplicateIndex(
+    radius=NEAR_DUPLICATE_RADIUS,
+    dhash_radius=NEAR_DUPLICATE_DHASH_RADIUS,
+    max_entries=int(os.environ.get('NEAR_DUPLICATE_MAX_ENTRIES', 50000))
+)
+
+
+def load_image_classifier():
+    """Build the image classifier for IMAGE_BACKEND: the Hugging Face pipeline or its ONNX export"""
+    if IMAGE_BACKEND == 'onnx':
+        from onnx_backend import MODEL_FILE, QUANTIZED_MODEL_FILE, OnnxImageClassifier, export_onnx, quantize_onnx
+        model_path = os.path.join(ONNX_MODEL_DIR, MODEL_FILE)
+        # Without a pre-built model directory, export once; later starts reuse the files
+        if not os.path.exists(model_path):
+            export_onnx(IMAGE_MODEL_ID, ONNX_MODEL_DIR)
+        if ONNX_QUANTIZE and not os.path.exists(os.path.join(ONNX_MODEL_DIR, QUANTIZED_MODEL_FILE)):
+            quantize_onnx(model_path, os.path.join(ONNX_MODEL_DIR, QUANTIZED_MODEL_FILE))
+        return OnnxImageClassifier(ONNX_MODEL_DIR, quantized=ONNX_QUANTIZE, threads=ONNX_THREADS)
+
+    from transformers import pipeline
+    return pipeline('image-classification', model=IMAGE_MODEL_ID)
+
+
+def load_voice_encoder():
+    """Build the Resemblyzer voice encoder"""
+    from resemblyzer import VoiceEncoder
+    return VoiceEncoder()
+
+
+def load_image_preprocessor():
+    """Batch preprocessor configured from the loaded classifier's image processor"""
+    return ImagePreprocessor.from_classifier(registry.get('image'), max_batch=IMAGE_BATCH_MAX_SIZE)
+
+
+def load_voice_index():
+    """Voice-embedding index, read from VOICE_INDEX_DIR when it exists"""
+    return VoiceIndex(VOICE_INDEX_DIR or None, ivf_min_size=VOICE_INDEX_IVF_MIN_SIZE,
+                      nlist=VOICE_INDEX_NLIST, nprobe=VOICE_INDEX_NPROBE)
+
+
+registry.register('image', load_image_classifier)
+registry.register('image_preprocessor', load_image_preprocessor)
+registry.register('voice_encoder', load_voice_encoder)
+registry.register('voice_index', load_voice_index)
+
+# Workers inherit the loaded image and voice models copy-on-write, so the weights exist once in RAM
+inference_pool = InferencePool(registry, INFERENCE_PROCESSES,
+                               preload=['image', 'image_preprocessor', 'voice_encoder']) if INFERENCE_PROCESSES > 0 else None
+if inference_pool is not None:
+    # Fork now, from the importing thread, before the uploader, batcher, job and warm-up
+    # threads exist: a child forked while another thread holds a lock inherits it held.
+    # This loads the preloaded models at import whatever PRELOAD_MODELS says (run gunicorn
+    # without --preload, so each worker imports the app and forks its own pool)
+    with startup_timer.phase('inference_pool'):
+        inference_pool.start()
+
+
+def run_on_payload(fn, payload, *args):
+    """Call ``fn(source, *args)`` on an ingested payload, in a worker process when the pool is enabled"""
+    if inference_pool is None:
+        return fn(payload.open(), *args)
+    return inference_pool.run_on_payload(fn, payload, *args)
+
+
+def image_backend_name():
+    if IMAGE_BACKEND == 'onnx':
+        return 'onnx-int8' if ONNX_QUANTIZE else 'onnx'
+    return 'torch'
+
+
+def image_cache_key(digest):
+    # Quantized/ONNX scores can drift slightly from torch, so backends never share entries
+    return make_cache_key(digest, IMAGE_MODEL_ID, IMAGE_MODEL_VERSION,
+                          threshold=CONFIDENCE_THRESHOLD_IMAGE,
+                          labels=[DEEPFAKE_RESULT, REAL_RESULT],
+                          backend=image_backend_name())
+
+
+def audio_cache_key(digest, mode='full'):
+    return make_cache_key(digest, AUDIO_MODEL_ID, AUDIO_MODEL_VERSION,
+                          threshold=CONFIDENCE_THRESHOLD_AUDIO,
+                          labels=[SYNTHETIC_RESULT, HUMAN_RESULT],
+                          mode=mode, segment_seconds=AUDIO_SEGMENT_SECONDS if mode == 'stream' else None)
+
+
+def archive_key(payload):
+    """
+    Storage key of an upload: its SHA-256 plus the sanitized client filename, so same-named
+    uploads never overwrite each other and identical bytes land on the same object
+    """
+    return f"{payload.sha256}-{secure_filename(payload.filename or '') or 'upload'}"
+
+
+def archive_payload(payload):
+    """Queue an ingested payload for background archiving without copying spilled files into memory"""
+    if payload.in_memory:
+        return uploader.submit(archive_key(payload), payload.getvalue(), payload.content_type)
+    return uploader.submit_file(archive_key(payload), payload.hand_off_file(), payload.content_type)
+
+
+def classify_image_batch(images):
+    """Run one batched forward pass and return the prediction list for each image"""
+    # One vectorized normalize into a reused buffer, fed to the model without the pipeline's processor
+    with stage('preprocess', route='image-batch', model=IMAGE_MODEL_ID):
+        pixel_values = registry.get('image_preprocessor').batch(images)
+    with stage('forward', route='image-batch', model=IMAGE_MODEL_ID), registry.use('image') as classifier:
+        predictions = classify_pixels(classifier, pixel_values)
+    return predictions
+
+
+def classify_encoded_images(blobs):
+    """
+    Decode and classify a batch of encoded images inside an inference worker process.
+    Each blob is decoded on its own: an undecodable upload gets its exception back as its
+    result (failing only that request) instead of failing every request batched with it.
+    """
+    preprocessor = registry.get('image_preprocessor')
+    results = [None] * len(blobs)
+    images, positions = [], []
+    for i, blob in enumerate(blobs):
+        try:
+            images.append(preprocessor.load(BytesIO(blob)))
+            positions.append(i)
+        except Exception as e:
+            results[i] = e
+    if images:
+        for i, predictions in zip(positions, classify_image_batch(images)):
+            results[i] = predictions
+    return results
+
+
+# Concurrent /detect-image requests share batched forward passes; with the process pool,
+# one dispatcher per worker process keeps every process busy with its own batch
+if inference_pool is not None:
+    image_batcher = MicroBatcher(partial(inference_pool.run, classify_encoded_images),
+                                 max_batch_size=IMAGE_BATCH_MAX_SIZE,
+                                 max_wait_ms=IMAGE_BATCH_MAX_WAIT_MS,
+                                 name='image-batcher',
+                                 workers=INFERENCE_PROCESSES)
+else:
+    image_batcher = MicroBatcher(classify_image_batch,
+                                 max_batch_size=IMAGE_BATCH_MAX_SIZE,
+                                 max_wait_ms=IMAGE_BATCH_MAX_WAIT_MS,
+                                 name='image-batcher')
 
 
 def detect_image_deepfake(image_path):
@@ -34,14 +272,19 @@ def detect_image_deepfake(image_path):
         tuple: A tuple containing the result (DEEPFAKE_RESULT or REAL_RESULT),
                confidence score, and an explanation.
     """
-    from transformers import pipeline
-
-    # Using a specific deepfake detection model from Hugging Face
-    classifier = pipeline('image-classification', model='dima806/deepfake_vs_real_image_detection')
+    if inference_pool is not None:
+        # Decoding and preprocessing happen in the worker process, outside this process's GIL
+        with stage('inference'):
+            predictions = image_batcher.run(image_path.read())
+    else:
+        # Decode (reduced-size for JPEGs) and resize on the request thread so only the
+        # normalize and forward pass are batched
+        with stage('decode'):
+            image = registry.get('image_preprocessor').load(image_path)
 
-    # Open the image using PIL
-    image = Image.open(image_path)
-    predictions = classifier(image)
+        # Waits for a batched forward pass shared with other in-flight requests
+        with stage('inference'):
+            predictions = image_batcher.run(image)
 
     # Find the most likely prediction
     best_prediction = max(predictions, key=lambda p: p['score'])
@@ -57,140 +300,645 @@ def detect_image_deepfake(image_path):
 
     return result, confidence, explanation
 
-from resemblyzer import VoiceEncoder, preprocess_wav
 from pathlib import Path
-import numpy as np
 
-# Initialize the voice encoder. This is a one-time setup.
-encoder = VoiceEncoder()
+def voice_partials(audio_path):
+    """
+    Decode and preprocess a recording into the mel windows Resemblyzer embeds.
+
+    Args:
+        audio_path (str or file-like): The path to the audio file, or an open binary stream.
+    """
+    # Deferred: resemblyzer pulls in torch and webrtcvad, which would slow every cold start
+    from resemblyzer import preprocess_wav
+
+    if isinstance(audio_path, (str, Path)):
+        wav = preprocess_wav(Path(audio_path))
+    else:
+        import librosa
+        samples, sample_rate = librosa.load(audio_path, sr=None)
+        wav = preprocess_wav(samples, source_sr=sample_rate)
+    return utterance_partials(wav)
+
+def embed_voice_batch(partials):
+    """One stacked voice-encoder forward pass over the windows of several clips"""
+    with registry.use('voice_encoder') as encoder:
+        return forward_partials(encoder, partials, max_windows=VOICE_BATCH_MAX_WINDOWS)
+
+# Like the image batcher: with the process pool, one dispatcher per worker process
+if inference_pool is not None:
+    voice_batcher = MicroBatcher(partial(inference_pool.run, embed_voice_batch),
+                                 max_batch_size=VOICE_BATCH_MAX_SIZE,
+                                 max_wait_ms=VOICE_BATCH_MAX_WAIT_MS,
+                                 name='voice-batcher',
+                                 workers=INFERENCE_PROCESSES)
+else:
+    voice_batcher = MicroBatcher(embed_voice_batch,
+                                 max_batch_size=VOICE_BATCH_MAX_SIZE,
+                                 max_wait_ms=VOICE_BATCH_MAX_WAIT_MS,
+                                 name='voice-batcher')
+
+def embed_voice(audio_path):
+    """
+    Resemblyzer utterance embedding (256-d, unit length) of a recording.
+
+    Args:
+        audio_path (str or file-like): The path to the audio file, or an open binary stream.
+    """
+    return combine_partials(voice_batcher.run(voice_partials(audio_path)))
+
+def embed_voice_payload(payload):
+    """Utterance embedding of an ingested recording; decoding runs in a worker process when the pool is enabled"""
+    with stage('decode'):
+        partials = run_on_payload(voice_partials, payload)
+    # Waits for a forward pass shared with other in-flight clips
+    with stage('inference'):
+        return combine_partials(voice_batcher.run(partials))
 
-# Mock function for audio deepfake detection (replace with your actual model)
 def detect_audio_deepfake(audio_path):
     """
-    Detects if an audio recording is synthetic using Resemblyzer.
+    Detects if an audio recording is synthetic from the enrolled voice closest to its
+    Resemblyzer embedding (see /voices). The embedding is unit length, so the verdict comes
+    from cosine similarity to known voices rather than from the embedding itself.
 
     Args:
-        audio_path (str): The path to the audio file.
+        audio_path (str or file-like): The path to the audio file, or an open binary stream.
 
     Returns:
-        tuple: A tuple containing the result (SYNTHETIC_RESULT or HUMAN_RESULT),
-               confidence score, and an explanation.
+        tuple: A tuple containing the result (SYNTHETIC_RESULT, HUMAN_RESULT or 'unknown'
+               when no enrolled voice reaches VOICE_MATCH_THRESHOLD), confidence score,
+               and an explanation.
     """
     try:
-        # Preprocess the audio file and create an embedding
-        wav = preprocess_wav(Path(audio_path))
-        embed = encoder.embed_utterance(wav)
-
-        # Heuristic for synthetic speech detection.
-        # Real human speech tends to have a certain level of variance and complexity
-        # that can be captured in the embedding's norm. This is a simplified check.
-        # A value between 1.2 and 2.0 is typical for human speech.
-        embedding_norm = np.linalg.norm(embed)
-        
-        # Normalize the norm to a 0-1 confidence score (approximate)
-        confidence = min(1.0, embedding_norm / 2.0)
-
-        if embedding_norm < 1.2:  # Threshold for detecting synthetic voices
-            result = SYNTHETIC_RESULT
-            explanation = f"Voice characteristics (embedding norm: {embedding_norm:.2f}) suggest a synthetic origin."
-        else:
-            result = HUMAN_RESULT
-            explanation = f"Voice characteristics (embedding norm: {embedding_norm:.2f}) are consistent with human speech."
-        
+        embedding = embed_voice(audio_path)
+        result, confidence, explanation, _ = voice_verdict(embedding, k=1)
         return result, confidence, explanation
-
     except Exception as e:
         # Handle cases where audio processing fails
         return "error", 0.0, f"Could not process audio file: {e}"
 
+def detect_audio_features(audio_source):
+    """
+    Detects if an audio recording is synthetic from its spectral features.
+
+    Args:
+        audio_source (str or file-like): The path to the audio file, or an open binary stream.
+
+    Returns:
+        tuple: A tuple containing the result (SYNTHETIC_RESULT or HUMAN_RESULT),
+               confidence score, and an explanation.
+    """
+    try:
+        # MFCC, centroid, rolloff and ZCR all come from a single STFT pass
+        is_synthetic, confidence, details = analyze_audio(audio_source)
+    except Exception as e:
+        return "error", 0.0, f"Could not process audio file: {e}"
+
+    if is_synthetic:
+        return SYNTHETIC_RESULT, confidence, f"Audio features suggest synthetic origin. {details}"
+    return HUMAN_RESULT, confidence, f"Audio features suggest human origin. {details}"
+
+def detect_audio_stream(audio_source):
+    """
+    Detects synthetic speech in a long recording, decoding it block by block.
+
+    Args:
+        audio_source (str or file-like): The path to the audio file, or an open binary stream.
+
+    Returns:
+        dict: The aggregate result, confidence and explanation plus per-segment verdicts.
+    """
+    try:
+        analysis = analyze_audio_stream(audio_source, segment_seconds=AUDIO_SEGMENT_SECONDS)
+    except Exception as e:
+        # Same shape as detect_audio_features, so a bad or empty file fails alike in both modes
+        return {'result': 'error', 'confidence': 0.0, 'explanation': f"Could not process audio file: {e}",
+                'segments': []}
+    origin = 'synthetic' if analysis['synthetic'] else 'human'
+    segments = [
+        {**segment, 'result': SYNTHETIC_RESULT if segment.pop('synthetic') else HUMAN_RESULT}
+        for segment in analysis['segments']
+    ]
+    return {
+        'result': SYNTHETIC_RESULT if analysis['synthetic'] else HUMAN_RESULT,
+        'confidence': analysis['confidence'],
+        'explanation': f"Audio features suggest {origin} origin across {len(segments)} segments. {analysis['details']}",
+        'duration': analysis['duration'],
+        'segments': segments
+    }
+
+def analyze_image_payload(payload, archive=True, near_duplicates=True):
+    """
+    Archive, cache-check and classify an ingested image; returns the response dict.
+    ``near_duplicates=False`` skips the perceptual-hash index (lookup and insert) for this image.
+    """
+    # Archive to object storage in the background; detection runs on the in-memory bytes
+    if archive:
+        with stage('archive'):
+            archive_payload(payload)
+
+    # Re-submitted images are answered from the result cache
+    cache_key = image_cache_key(payload.sha256)
+    with stage('cache'):
+        cached = result_cache.get(cache_key)
+    record_cache(cached is not None, IMAGE_MODEL_ID)
+    if cached is not None:
+        record_result(cached['result'])
+        return {**cached, 'cached': True}
+
+    # Re-encoded, resized or lightly edited copies of an analyzed image get its verdict
+    hashes = None
+    if NEAR_DUPLICATE_ENABLED and near_duplicates:
+        with stage('near_duplicate'):
+            hashes = payload_hashes(payload)
+            match = near_duplicate_index.lookup(hashes) if hashes is not None else None
+        if match is not None:
+            result = {**match['result'], 'near_duplicate': describe_match(match)}
+            result_cache.set(cache_key, result)
+            record_result(result['result'])
+            return result
+
+    # Call deepfake detection model
+    result, confidence, explanation = detect_image_deepfake(payload.open())
+    result = {
+        'type': 'image',
+        'result': result, 'confidence': confidence, 'explanation': explanation}
+    result_cache.set(cache_key, result)
+    if hashes is not None:
+        near_duplicate_index.add(payload.sha256, hashes, result)
+    record_result(result['result'])
+    return result
+
+def near_duplicates_requested(args):
+    """False when the request opts out of near-duplicate answers (``?near_duplicates=false``)"""
+    return args.get('near_duplicates', 'true').lower() != 'false'
+
+def payload_hashes(payload):
+    """(pHash, dHash) of an ingested image, or None when it cannot be decoded"""
+    try:
+        return image_hashes(payload.open())
+    except Exception:
+        # Undecodable uploads fall through to the model path, which reports the error
+        return None
+
+def inspect_near_duplicates(payload, radius=None, dhash_radius=None):
+    """Hashes of an ingested image and every indexed image within the radii; runs no inference"""
+    hashes = payload_hashes(payload)
+    if hashes is None:
+        raise IngestionError('Could not decode the image.', 400)
+    return {
+        'phash': f"{hashes[0]:016x}",
+        'dhash': f"{hashes[1]:016x}",
+        'radius': NEAR_DUPLICATE_RADIUS if radius is None else radius,
+        'dhash_radius': NEAR_DUPLICATE_DHASH_RADIUS if dhash_radius is None else dhash_radius,
+        'matches': [describe_match(match) for match in near_duplicate_index.matches(hashes, radius, dhash_radius)]
+    }
+
+def analyze_audio_payload(payload, stream_mode=False, archive=True):
+    """Archive, cache-check and analyze an ingested recording; returns the response dict"""
+    # Archive to object storage in the background
+    if archive:
+        with stage('archive'):
+            archive_payload(payload)
+
+    stream_mode = stream_mode or payload.size > AUDIO_STREAM_THRESHOLD_BYTES
+    cache_key = audio_cache_key(payload.sha256, 'stream' if stream_mode else 'full')
+    with stage('cache'):
+        cached = result_cache.get(cache_key)
+    record_cache(cached is not None, AUDIO_MODEL_ID)
+    if cached is not None:
+        record_result(cached['result'])
+        return {**cached, 'cached': True}
+
+    if stream_mode:
+        # Long recordings: bounded-memory, per-segment analysis
+        with stage('analyze_stream'):
+            result = {'type': 'audio', 'mode': 'stream', **run_on_payload(detect_audio_stream, payload)}
+        if result['result'] != 'error':
+            result_cache.set(cache_key, result)
+        record_result(result['result'])
+        return result
+
+    # Call audio deepfake detection model
+    with stage('analyze'):
+        result, confidence, explanation = run_on_payload(detect_audio_features, payload)
+    record_result(result)
+    result = {
+        'type': 'audio',
+        'result': result,
+        'confidence': confidence,
+        'explanation': explanation
+    }
+    if result['result'] != 'error':
+        result_cache.set(cache_key, result)
+    return result
+
 @app.route('/detect-image', methods=['POST'])
+@track_request('/detect-image', IMAGE_MODEL_ID)
 def detect_image():
-    # Accept file upload or URL
-    if 'file' in request.files:
-        image_file = request.files['file']
-        filename = image_file.filename
-        temp_path = f'/tmp/{filename}'
-        image_file.save(temp_path)
-    elif 'url' in request.json:
-        try:
-            url = request.json['url']
-            filename = url.split('/')[-1]
-            temp_path = f'/tmp/{filename}'
-            r = requests.get(url, stream=True)
-            r.raise_for_status()  # Raise HTTPError for bad responses (4xx or 5xx)
-            with open(temp_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Error downloading image from URL: {e}'}), 400
-    else:
-        return jsonify({'error': 'No image file or URL provided.'}), 400
-
+    # Accept file upload or URL, streamed into memory (spilled to a private temp file if large)
     try:
-        # Upload to GCS
-        bucket = gcs_client.bucket(GCS_BUCKET)
-        blob = bucket.blob(filename)
-        blob.upload_from_filename(temp_path)
-
-        # Download the image from GCS
-        bucket = gcs_client.bucket(GCS_BUCKET)
-        blob = bucket.blob(filename)
-        image_data = blob.download_as_bytes()
-        image = BytesIO(image_data)
-
-        # Call deepfake detection model
-        result, confidence, explanation = detect_image_deepfake(image)
-        result = {
-            'type': 'image',
-            'result': result, 'confidence': confidence, 'explanation': explanation}
-        return jsonify(result)
-    finally:
-        if temp_path:
-            os.remove(temp_path)
+        with stage('ingest'):
+            payload = ingest_request(request, 'image')
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    with payload:
+        try:
+            return jsonify(analyze_image_payload(payload, near_duplicates=near_duplicates_requested(request.args)))
+        except ImageDecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': f'Error processing image: {e}'}), 500
 
 @app.route('/detect-audio', methods=['POST'])
+@track_request('/detect-audio', AUDIO_MODEL_ID)
 def detect_audio():
-    # Accept file upload or URL
-    if 'file' in request.files:
-        audio_file = request.files['file']
-        filename = audio_file.filename
-        temp_path = f'/tmp/{filename}'
-        audio_file.save(temp_path)
-    elif 'url' in request.json:
+    # Accept file upload or URL, streamed into memory (spilled to a private temp file if large)
+    try:
+        with stage('ingest'):
+            # Long recordings are spooled to disk and streamed, so the audio limit is higher
+            payload = ingest_request(request, 'audio', max_bytes=AUDIO_MAX_BYTES)
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    with payload:
         try:
-            url = request.json['url']
-            filename = url.split('/')[-1]
-            temp_path = f'/tmp/{filename}'
-            r = requests.get(url, stream=True)
-            r.raise_for_status()
-            with open(temp_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Error downloading audio from URL: {e}'}), 400
-    else:
-        return jsonify({'error': 'No audio file or URL provided.'}), 400
+            return jsonify(analyze_audio_payload(payload, request.args.get('mode') == 'stream'))
+        except Exception as e:
+            return jsonify({'error': f'Error processing audio: {e}'}), 500
+
+@app.route('/near-duplicates', methods=['GET', 'POST'])
+def near_duplicates():
+    """GET: index statistics. POST an image (file or url): its hashes and the indexed images near it"""
+    if request.method == 'GET':
+        return jsonify(near_duplicate_index.stats())
+    try:
+        radius = request.args.get('radius', type=int)
+        dhash_radius = request.args.get('dhash_radius', type=int)
+        with ingest_request(request, 'image') as payload:
+            return jsonify(inspect_near_duplicates(payload, radius, dhash_radius))
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+def voice_verdict(embedding, k=5):
+    """
+    Verdict of the enrolled voice closest to an utterance embedding.
+
+    Returns:
+        tuple: (result, confidence, explanation, matches), where result is 'unknown' when no
+               enrolled voice reaches VOICE_MATCH_THRESHOLD.
+    """
+    with stage('search'):
+        matches = registry.get('voice_index').search(embedding, k)
+
+    best = matches[0] if matches else None
+    if best is None or best['similarity'] < VOICE_MATCH_THRESHOLD:
+        return 'unknown', best['similarity'] if best else 0.0, 'No enrolled voice is similar enough to decide.', matches
+    result = SYNTHETIC_RESULT if best['label'] == 'synthetic' else HUMAN_RESULT
+    explanation = (f"Closest enrolled voice{' ' + repr(best['name']) if best.get('name') else ''} "
+                   f"is {best['label']} (cosine similarity {best['similarity']:.2f}).")
+    return result, best['similarity'], explanation, matches
+
+def search_voice_payload(payload, k=5):
+    """Nearest enrolled voices to an ingested recording, with the verdict of the closest one"""
+    embedding = embed_voice_payload(payload)
+    result, confidence, explanation, matches = voice_verdict(embedding, k)
+    record_result(result)
+    return {
+        'type': 'audio',
+        'result': result,
+        'confidence': confidence,
+        'explanation': explanation,
+        'threshold': VOICE_MATCH_THRESHOLD,
+        'matches': matches
+    }
 
+def enroll_voice_payload(payload, label, name=None):
+    """Add an ingested recording to the voice index as a known synthetic or human voice"""
+    if label not in VOICE_LABELS:
+        raise IngestionError(f"label must be one of: {', '.join(VOICE_LABELS)}.", 400)
+    embedding = embed_voice_payload(payload)
+    return registry.get('voice_index').add(embedding, label, name=name, sha256=payload.sha256)
+
+@app.route('/voices/search', methods=['POST'])
+@track_request('/voices/search', 'resemblyzer')
+def search_voices():
+    """Nearest known synthetic/human voices to an uploaded recording (?k=5)"""
+    k = request.args.get('k', 5, type=int)
+    try:
+        with stage('ingest'):
+            payload = ingest_request(request, 'audio')
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    with payload:
+        try:
+            return jsonify(search_voice_payload(payload, max(1, k)))
+        except Exception as e:
+            return jsonify({'error': f'Error processing audio: {e}'}), 500
+
+@app.route('/voices', methods=['GET', 'POST'])
+def voices():
+    """GET: index statistics. POST a recording with form fields label (synthetic|human) and name to enroll it"""
+    if request.method == 'GET':
+        return jsonify(registry.get('voice_index').stats())
+    # Form fields alongside a multipart upload, or JSON fields next to 'url'
+    fields = request.get_json(silent=True) or request.values
     try:
-        # Upload to GCS
-        bucket = gcs_client.bucket(GCS_BUCKET)
-        blob = bucket.blob(filename)
-        blob.upload_from_filename(temp_path)
-
-        # Call audio deepfake detection model (stub)
-        # Replace with actual model/API call
-        result = {
-            'type': 'audio',
-            'result': SYNTHETIC_RESULT,
-            'confidence': 0.88,
-            'explanation': 'Voice cadence and pitch match known synthetic patterns.'
-        }
-        return jsonify(result)
+        payload = ingest_request(request, 'audio')
+        with payload:
+            entry = enroll_voice_payload(payload, fields.get('label'), fields.get('name'))
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         return jsonify({'error': f'Error processing audio: {e}'}), 500
-    finally:
-        if temp_path:
-            os.remove(temp_path)
+    return jsonify(entry), 201
+
+def completed_future(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+def detect_batch_item(index, source, kind=None, archive=True):
+    """Ingest (for URLs) and analyze one batch item; never raises so every item gets a line"""
+    name = source if isinstance(source, str) else source.filename
+    try:
+        payload = source if isinstance(source, IngestedPayload) else ingest_url(source)
+    except Exception as e:
+        return {'index': index, 'source': name, 'error': f'Error downloading file: {e}'}
+
+    with payload:
+        kind = kind or guess_media_kind(payload.filename, payload.content_type)
+        try:
+            if kind == 'image':
+                result = analyze_image_payload(payload, archive=archive)
+            elif kind == 'audio':
+                result = analyze_audio_payload(payload, archive=archive)
+            else:
+                return {'index': index, 'source': name, 'error': 'Unsupported file type'}
+        except Exception as e:
+            return {'index': index, 'source': name, 'error': f'Error processing {kind}: {e}'}
+    return {'index': index, 'source': name, **result}
+
+@app.route('/detect-batch', methods=['POST'])
+def detect_batch():
+    """
+    Analyze many images and/or audio files in one request.
+    Accepts multipart 'files' parts or JSON {"urls": [url or {"url": ..., "type": "image"|"audio"}]}
+    and streams one NDJSON line per item in completion order.
+    """
+    uploads = request.files.getlist('files') + request.files.getlist('file')
+    url_items = []
+    body = request.get_json(silent=True) if not uploads and request.is_json else None
+    if isinstance(body, dict):
+        for entry in body.get('urls') or []:
+            if isinstance(entry, dict):
+                url_items.append((entry.get('url'), entry.get('type')))
+            else:
+                url_items.append((entry, None))
+
+    total = len(uploads) + len(url_items)
+    if total == 0:
+        return jsonify({'error': 'No files or URLs provided.'}), 400
+    if total > BATCH_MAX_ITEMS:
+        return jsonify({'error': f'Too many items; the limit is {BATCH_MAX_ITEMS} per batch.'}), 413
+
+    futures = []
+    # Multipart parts are buffered up front because the request body is gone once streaming starts
+    for index, upload in enumerate(uploads):
+        try:
+            payload = ingest_file(upload.stream, upload.filename, upload.mimetype)
+        except IngestionError as e:
+            futures.append(completed_future({'index': index, 'source': upload.filename, 'error': str(e)}))
+            continue
+        # Each item runs in its own copy of the request context, so its stages keep the route labels
+        futures.append(inference_executor.submit(contextvars.copy_context().run, detect_batch_item, index, payload))
+    for index, (url, kind) in enumerate(url_items, start=len(uploads)):
+        if not isinstance(url, str) or not url:
+            futures.append(completed_future({'index': index, 'error': 'Invalid URL entry'}))
+            continue
+        futures.append(inference_executor.submit(contextvars.copy_context().run, detect_batch_item, index, url, kind))
+
+    def generate():
+        for future in as_completed(futures):
+            yield json.dumps(future.result()) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+def run_detection_job(job):
+    """Job queue handler: rebuild the payload from the spooled file (or URL) and analyze it"""
+    options = job['options']
+    max_bytes = DEFAULT_MAX_BYTES if job['kind'] == 'image' else AUDIO_MAX_BYTES
+    if job['input_path']:
+        with open(job['input_path'], 'rb') as f:
+            payload = ingest_file(f, job['filename'], job['content_type'], max_bytes=max_bytes)
+    else:
+        payload = ingest_url(options['url'], max_bytes=max_bytes)
+
+    with payload:
+        kind = job['kind'] if job['kind'] in ('image', 'audio') else guess_media_kind(payload.filename, payload.content_type)
+        if kind == 'image':
+            return analyze_image_payload(payload)
+        if kind == 'audio':
+            return analyze_audio_payload(payload, options.get('mode') == 'stream')
+        raise ValueError('Unsupported file type')
+
+
+# Heavy detections run here instead of on request threads; state survives restarts in JOB_DB
+job_queue = JobQueue(JOB_DB, JOB_SPOOL_DIR, run_detection_job,
+                     workers=JOB_WORKERS, max_pending=JOB_MAX_PENDING)
+# Started with the app in every process that imports it (each gunicorn worker), after the
+# inference pool forked, so jobs persisted before a restart resume without waiting for a request
+job_queue.start()
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queue a detection and return its job id immediately (202).
+    Accepts a multipart 'file' or JSON 'url', plus optional 'type' (image/audio),
+    'mode' ('stream' for long audio) and 'callback_url' notified when the job finishes.
+    """
+    params = request.form if request.files else (request.get_json(silent=True) or {})
+    options = {'mode': params.get('mode')}
+    callback_url = params.get('callback_url')
+    if callback_url:
+        try:
+            validate_callback_url(callback_url)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    try:
+        if 'file' in request.files:
+            upload = request.files['file']
+            with ingest_file(upload.stream, upload.filename, upload.mimetype, max_bytes=AUDIO_MAX_BYTES) as payload:
+                kind = params.get('type') or guess_media_kind(payload.filename, payload.content_type)
+                # Only audio gets the long-recording limit
+                if kind != 'audio' and payload.size > DEFAULT_MAX_BYTES:
+                    raise PayloadTooLarge(DEFAULT_MAX_BYTES)
+                job_id = job_queue.submit(kind or 'unknown', payload.hand_off_file(), payload.filename,
+                                          payload.content_type, options, callback_url)
+        elif params.get('url'):
+            options['url'] = params['url']
+            kind = params.get('type') or guess_media_kind(params['url'])
+            job_id = job_queue.submit(kind or 'unknown', options=options, callback_url=callback_url)
+        else:
+            return jsonify({'error': 'No file or URL provided.'}), 400
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'status_url': url_for('get_job', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    # No-op unless this process was forked from one that imported the app (gunicorn --preload)
+    job_queue.start()
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/detect-audio/timeline', methods=['POST'])
+def detect_audio_timeline():
+    """Time-indexed synthetic/human scores over sliding windows of one clip"""
+    try:
+        window_seconds = float(request.args.get('window', 2.0))
+        hop_seconds = float(request.args.get('hop', 0.5))
+    except ValueError:
+        return jsonify({'error': 'window and hop must be numbers of seconds.'}), 400
+    if window_seconds <= 0 or hop_seconds <= 0:
+        return jsonify({'error': 'window and hop must be positive.'}), 400
+
+    try:
+        payload = ingest_request(request, 'audio')
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    with payload:
+        try:
+            return jsonify(analyze_timeline_payload(payload, window_seconds, hop_seconds))
+        except Exception as e:
+            return jsonify({'error': f'Error processing audio: {e}'}), 500
+
+def analyze_timeline_payload(payload, window_seconds, hop_seconds):
+    """Window-by-window scores for an ingested recording; returns the response dict"""
+    # One decode and one feature pass; every window reuses the framewise arrays
+    (is_synthetic, confidence, details), timeline, duration = run_on_payload(
+        analyze_timeline, payload, window_seconds, hop_seconds)
+
+    spans = synthetic_spans(timeline)
+    for window in timeline:
+        window['result'] = SYNTHETIC_RESULT if window.pop('synthetic') else HUMAN_RESULT
+    return {
+        'type': 'audio',
+        'result': SYNTHETIC_RESULT if is_synthetic else HUMAN_RESULT,
+        'confidence': confidence,
+        'explanation': details,
+        'duration': round(duration, 3),
+        'window_seconds': window_seconds,
+        'hop_seconds': hop_seconds,
+        'synthetic_spans': spans,
+        'timeline': timeline
+    }
+
+def is_ready():
+    return all(registry.is_warm(name) for name in READY_MODELS)
+
+def health_status():
+    return {
+        'status': 'Deepfake Detection Backend is running',
+        'ready': is_ready(),
+        'models': registry.status(),
+        'image_backend': image_backend_name(),
+        'image_batching': image_batcher.stats(),
+        'voice_batching': voice_batcher.stats(),
+        'result_cache': result_cache.stats(),
+        'near_duplicates': near_duplicate_index.stats(),
+        'uploads': uploader.stats(),
+        'jobs': job_queue.stats(),
+        'inference_pool': inference_pool.stats() if inference_pool is not None else None,
+        'startup': startup_timer.report(registry)
+    }
+
+def readiness_status():
+    """(body, status code) for the readiness probe"""
+    ready = is_ready()
+    if ready:
+        # Covers lazily loaded models too, which become warm on their first request
+        startup_timer.mark_ready()
+    return {
+        'ready': ready,
+        'models': registry.status(),
+        'startup': startup_timer.report(registry)
+    }, 200 if ready else 503
+
+@app.route('/metrics')
+def metrics():
+    body, content_type, status_code = metrics_payload()
+    return Response(body, status=status_code, content_type=content_type)
+
+@app.route('/healthz')
+def liveness():
+    # Liveness only: the process is up and serving, even while models are still loading
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readiness():
+    body, status_code = readiness_status()
+    return jsonify(body), status_code
+
+@app.route('/')
+def health_check():
+    return jsonify(health_status())
+
+def warm_up(retry=False):
+    """Load the models, then log the startup report; with ``retry``, keep reloading failed
+    readiness models on the registry's backoff until they are warm"""
+    with startup_timer.phase('model_warmup'):
+        try:
+            # With the inference pool, the pooled models were loaded and forked at import
+            registry.preload()
+        except Exception as e:
+            print(f"Warning: model warm-up failed: {e}")
+    if is_ready():
+        startup_timer.mark_ready()
+    print(startup_timer.format_report(registry))
+
+    while retry and not is_ready():
+        time.sleep(max(1.0, registry.seconds_until_retry(READY_MODELS) or 0.0))
+        try:
+            registry.preload(READY_MODELS)
+        except Exception as e:
+            print(f"Warning: model warm-up retry failed: {e}")
+        if is_ready():
+            startup_timer.mark_ready()
+            print("Models ready after retrying warm-up")
+
+_warmup_thread = None
+
+def start_background_warmup():
+    """Warm up in a daemon thread so the server starts answering liveness probes immediately"""
+    global _warmup_thread
+    if _warmup_thread is None:
+        _warmup_thread = threading.Thread(target=warm_up, kwargs={'retry': True},
+                                          name='model-warmup', daemon=True)
+        _warmup_thread.start()
+
+if PRELOAD_MODE == 'true':
+    # Load weights at import time so every gunicorn worker starts warm
+    with startup_timer.phase('model_preload'):
+        registry.preload()
+elif PRELOAD_MODE == 'background':
+    start_background_warmup()
 
 if __name__ == '__main__':
+    # Pre-load models to avoid paying the load cost on the first request
+    if PRELOAD_MODE != 'background':
+        warm_up()
     app.run(host='0.0.0.0', port=8080)
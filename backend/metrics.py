@@ -0,0 +1,149 @@
+"""
+Request Metrics for the Detection Services
+Per-stage timing spans, cache/fallback/error counters and a Prometheus /metrics payload.
+prometheus_client is optional: without it every call is a no-op and /metrics says so.
+"""
+
+import contextvars
+import functools
+import inspect
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+try:
+    from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter,
+                                   Histogram, generate_latest, multiprocess)
+except ImportError:
+    Counter = Histogram = None
+
+# Spans are short (decode, cache lookups) as well as long (downloads, inference)
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_route = contextvars.ContextVar('metrics_route', default='other')
+_model = contextvars.ContextVar('metrics_model', default='none')
+_result = contextvars.ContextVar('metrics_result', default=None)
+
+
+class _NoOpMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def observe(self, value):
+        pass
+
+    def inc(self, amount=1):
+        pass
+
+
+if Histogram is not None:
+    STAGE_SECONDS = Histogram('deepfake_stage_duration_seconds', 'Time spent in one stage of a request',
+                              ['route', 'stage', 'model'], buckets=LATENCY_BUCKETS)
+    REQUEST_SECONDS = Histogram('deepfake_request_duration_seconds', 'End-to-end request latency',
+                                ['route', 'model', 'result'], buckets=LATENCY_BUCKETS)
+    CACHE_LOOKUPS = Counter('deepfake_cache_lookups_total', 'Result cache lookups', ['model', 'outcome'])
+    MOCK_FALLBACKS = Counter('deepfake_mock_fallbacks_total', 'Responses served from mock results',
+                             ['route', 'kind'])
+    ERRORS = Counter('deepfake_errors_total', 'Errors by route and stage', ['route', 'stage'])
+else:
+    STAGE_SECONDS = REQUEST_SECONDS = CACHE_LOOKUPS = MOCK_FALLBACKS = ERRORS = _NoOpMetric()
+
+
+@contextmanager
+def stage(name: str, route: Optional[str] = None, model: Optional[str] = None):
+    """
+    Time one stage of the current request (download, decode, inference, ...).
+    An exception escaping the block is counted as an error of that stage.
+    """
+    route = route or _route.get()
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        ERRORS.labels(route, name).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(route, name, model or _model.get()).observe(time.perf_counter() - start)
+
+
+def record_result(result: str):
+    """Set the ``result`` label (e.g. 'deepfake', 'human') of the current request"""
+    _result.set(str(result))
+
+
+def record_cache(hit: bool, model: Optional[str] = None):
+    CACHE_LOOKUPS.labels(model or _model.get(), 'hit' if hit else 'miss').inc()
+
+
+def record_mock_fallback(kind: str, route: Optional[str] = None):
+    MOCK_FALLBACKS.labels(route or _route.get(), kind).inc()
+
+
+def record_error(stage_name: str, route: Optional[str] = None):
+    ERRORS.labels(route or _route.get(), stage_name).inc()
+
+
+def _status_code(response) -> int:
+    if isinstance(response, tuple) and len(response) > 1 and isinstance(response[1], int):
+        return response[1]
+    return getattr(response, 'status_code', 200)
+
+
+def track_request(route: str, model: str = 'none'):
+    """
+    Decorator for route handlers (sync or async): sets the route/model used by ``stage``
+    and records end-to-end latency labelled with the result from ``record_result``
+    (or 'ok'/'error' from the status code when none was recorded).
+    """
+    def decorator(fn):
+        def begin():
+            return _route.set(route), _model.set(model), _result.set(None), time.perf_counter()
+
+        def end(tokens, response, failed):
+            route_token, model_token, result_token, start = tokens
+            result = _result.get()
+            if result is None:
+                result = 'error' if failed or _status_code(response) >= 400 else 'ok'
+            if failed or _status_code(response) >= 500:
+                ERRORS.labels(route, 'request').inc()
+            REQUEST_SECONDS.labels(route, model, result).observe(time.perf_counter() - start)
+            _result.reset(result_token)
+            _model.reset(model_token)
+            _route.reset(route_token)
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                tokens, response, failed = begin(), None, True
+                try:
+                    response = await fn(*args, **kwargs)
+                    failed = False
+                    return response
+                finally:
+                    end(tokens, response, failed)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            tokens, response, failed = begin(), None, True
+            try:
+                response = fn(*args, **kwargs)
+                failed = False
+                return response
+            finally:
+                end(tokens, response, failed)
+        return wrapper
+    return decorator
+
+
+def metrics_payload() -> Tuple[bytes, str, int]:
+    """(body, content type, status code) for a /metrics endpoint"""
+    if Histogram is None:
+        return b'prometheus_client is not installed\n', 'text/plain; charset=utf-8', 501
+    registry = REGISTRY
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # gunicorn with several workers: aggregate every worker's metric files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry), CONTENT_TYPE_LATEST, 200
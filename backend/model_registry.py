@@ -0,0 +1,165 @@
+"""
+Model Registry for the Deepfake Detection Backend
+Loads each detector once per worker process and shares it across request threads.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+COLD = "cold"
+LOADING = "loading"
+WARM = "warm"
+FAILED = "failed"
+
+
+class _ModelEntry:
+    """Bookkeeping for a single registered model"""
+
+    def __init__(self, loader: Callable[[], Any], fallback: Any = None, serialize: bool = False):
+        self.loader = loader
+        self.fallback = fallback
+        self.model = None
+        self.state = COLD
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        # Consecutive failed loads and the monotonic time before which no reload is tried
+        self.failures = 0
+        self.retry_at = 0.0
+        self.load_lock = threading.Lock()
+        # Only models that are not safe to call from several threads get an inference lock
+        self.inference_lock = threading.Lock() if serialize else None
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of lazily loaded models.
+    Each model is loaded at most once per process; concurrent first requests wait on
+    a per-model lock so two different models can load in parallel without blocking each other.
+    A failed load is retried by the next ``get()`` after an exponential backoff
+    (``retry_backoff`` seconds, doubling up to ``max_retry_backoff``), so a transient error
+    such as a network hiccup while fetching weights does not last until the process restarts.
+    """
+
+    def __init__(self, retry_backoff: float = 5.0, max_retry_backoff: float = 300.0):
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any], fallback: Any = None, serialize: bool = False):
+        """
+        Register a model loader under a name.
+
+        Args:
+            name (str): Registry key, e.g. 'image' or 'voice_encoder'.
+            loader (callable): Zero-argument function returning the loaded model.
+            fallback: Value returned instead of raising when the loader fails (e.g. "mock").
+            serialize (bool): Guard inference with a lock for models that are not thread-safe.
+        """
+        with self._lock:
+            self._entries[name] = _ModelEntry(loader, fallback, serialize)
+
+    def _entry(self, name: str) -> _ModelEntry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Model '{name}' is not registered") from None
+
+    def get(self, name: str) -> Any:
+        """Return the loaded model, loading it on first use"""
+        entry = self._entry(name)
+        if entry.state == WARM:
+            return entry.model
+        if entry.state == FAILED and time.monotonic() < entry.retry_at:
+            return self._failed(name, entry)
+
+        with entry.load_lock:
+            # Another thread may have finished (or failed) loading while we waited
+            if entry.state == WARM:
+                return entry.model
+            if entry.state == FAILED and time.monotonic() < entry.retry_at:
+                return self._failed(name, entry)
+
+            entry.state = LOADING
+            print(f"Loading model '{name}'...")
+            start = time.perf_counter()
+            try:
+                model = entry.loader()
+            except Exception as e:
+                entry.load_seconds = time.perf_counter() - start
+                entry.error = str(e)
+                entry.failures += 1
+                delay = min(self.max_retry_backoff, self.retry_backoff * 2 ** (entry.failures - 1))
+                entry.retry_at = time.monotonic() + delay
+                entry.state = FAILED
+                print(f"Warning: Could not load model '{name}' (retrying in {delay:.0f}s): {e}")
+                return self._failed(name, entry)
+
+            entry.model = model
+            entry.load_seconds = time.perf_counter() - start
+            entry.error = None
+            entry.failures = 0
+            entry.state = WARM
+            print(f"Model '{name}' loaded in {entry.load_seconds:.1f}s")
+            return model
+
+    def _failed(self, name: str, entry: _ModelEntry) -> Any:
+        if entry.fallback is not None:
+            return entry.fallback
+        raise RuntimeError(f"Model '{name}' failed to load: {entry.error}")
+
+    @contextmanager
+    def use(self, name: str):
+        """Context manager yielding the model, serializing calls if it was registered with serialize=True"""
+        model = self.get(name)
+        lock = self._entry(name).inference_lock
+        if lock is None:
+            yield model
+            return
+        with lock:
+            yield model
+
+    def is_warm(self, name: str) -> bool:
+        return self._entry(name).state == WARM
+
+    def seconds_until_retry(self, names: Optional[Iterable[str]] = None) -> Optional[float]:
+        """Time until the earliest failed model among ``names`` may be reloaded; None if none failed"""
+        now = time.monotonic()
+        delays = [max(0.0, entry.retry_at - now)
+                  for name, entry in self._entries.items()
+                  if (names is None or name in names) and entry.state == FAILED]
+        return min(delays) if delays else None
+
+    def preload(self, names: Optional[Iterable[str]] = None):
+        """Load the given models (or every registered model) up front, e.g. at startup"""
+        for name in list(names) if names is not None else list(self._entries):
+            self.get(name)
+
+    def unload(self, name: str):
+        """Drop a loaded model so the next request reloads it"""
+        entry = self._entry(name)
+        with entry.load_lock:
+            entry.model = None
+            entry.error = None
+            entry.load_seconds = None
+            entry.failures = 0
+            entry.state = COLD
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Warm/cold state of every registered model, suitable for a health endpoint"""
+        return {
+            name: {
+                "state": entry.state,
+                "load_seconds": round(entry.load_seconds, 3) if entry.load_seconds is not None else None,
+                "error": entry.error,
+                "failures": entry.failures,
+            }
+            for name, entry in self._entries.items()
+        }
+
+
+# Shared registry for the process; backend servers register their models on this instance
+registry = ModelRegistry(retry_backoff=float(os.environ.get('MODEL_RETRY_SECONDS', 5)))
@@ -0,0 +1,240 @@
+"""
+Perceptual-Hash Near-Duplicate Index for Images
+Re-encoded, resized and lightly edited copies of an analyzed image hash to nearby 64-bit
+pHash/dHash values. A BK-tree over the pHash finds every prior image within a Hamming radius
+in far fewer comparisons than a linear scan, so a re-shared variant gets the earlier verdict
+without another forward pass.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+# pHash takes the DCT of a (HASH_SIZE * 4)-pixel square and keeps the lowest frequencies
+PHASH_SAMPLE_SIZE = HASH_SIZE * 4
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    """Orthonormal DCT-II basis, so ``D @ X @ D.T`` is the 2-D DCT of an n x n block"""
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_SAMPLE_SIZE)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), 'big')
+
+
+def load_grayscale(source) -> Image.Image:
+    """Decode a path or binary stream to grayscale; JPEGs decode at reduced scale (draft mode)"""
+    image = Image.open(source)
+    if image.format == 'JPEG':
+        image.draft('L', (PHASH_SAMPLE_SIZE * 2, PHASH_SAMPLE_SIZE * 2))
+    return image.convert('L')
+
+
+def phash(image: Image.Image) -> int:
+    """64-bit DCT hash: low-frequency coefficients above/below their median"""
+    pixels = np.asarray(image.resize((PHASH_SAMPLE_SIZE, PHASH_SAMPLE_SIZE), Image.BOX), dtype=np.float32)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    return _bits_to_int(low > np.median(low))
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit gradient hash: whether each pixel is brighter than its right-hand neighbour"""
+    pixels = np.asarray(image.resize((HASH_SIZE + 1, HASH_SIZE), Image.BOX), dtype=np.int16)
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def image_hashes(source) -> Tuple[int, int]:
+    """(pHash, dHash) of an image path or binary stream"""
+    image = load_grayscale(source)
+    return phash(image), dhash(image)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class _Node:
+    __slots__ = ('key', 'ids', 'children')
+
+    def __init__(self, key: int, item_id: str):
+        self.key = key
+        self.ids = [item_id]
+        self.children: Dict[int, "_Node"] = {}
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over integer hashes under Hamming distance.
+    A radius query only descends into children whose edge distance lies within
+    ``[d - radius, d + radius]`` of the query's distance to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        self._root: Optional[_Node] = None
+        self.size = 0
+
+    def add(self, key: int, item_id: str):
+        self.size += 1
+        if self._root is None:
+            self._root = _Node(key, item_id)
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node.key)
+            if distance == 0:
+                node.ids.append(item_id)
+                return
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(key, item_id)
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> List[Tuple[int, str]]:
+        """(distance, id) for every stored hash within ``radius`` of ``key``"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node.key)
+            if distance <= radius:
+                found.extend((distance, item_id) for item_id in node.ids)
+            for edge, child in node.children.items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    Bounded index of analyzed images keyed by content digest.
+
+    Candidates come from a pHash radius query on the BK-tree and must also agree on the
+    dHash, which rejects most pHash collisions between unrelated images. Keep both radii
+    tight: a face swap changes only part of the frame, so its hashes can sit close to the
+    source photo's.
+
+    Args:
+        radius (int): Maximum pHash Hamming distance (of 64 bits) for a match.
+        dhash_radius (int): Maximum dHash Hamming distance for a match.
+        max_entries (int): Images kept; the oldest are evicted first.
+    """
+
+    def __init__(self, radius: int = 4, dhash_radius: int = 8, max_entries: int = 50000):
+        self.radius = radius
+        self.dhash_radius = dhash_radius
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tree = BKTree()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def add(self, item_id: str, hashes: Tuple[int, int], result: Dict[str, Any]):
+        """Remember the verdict for an image; re-adding an id replaces its entry"""
+        phash_value, dhash_value = hashes
+        with self._lock:
+            replaced = self._entries.pop(item_id, None)
+            self._entries[item_id] = {
+                'id': item_id,
+                'phash': phash_value,
+                'dhash': dhash_value,
+                'result': dict(result),
+                'added_at': time.time(),
+                'hits': 0,
+            }
+            if replaced is None or replaced['phash'] != phash_value:
+                self._tree.add(phash_value, item_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            # Evicted ids stay in the tree until it is rebuilt; rebuild once they are the majority
+            if self._tree.size > 2 * max(len(self._entries), 1):
+                self._rebuild()
+
+    def _rebuild(self):
+        # Caller holds self._lock
+        tree = BKTree()
+        for entry in self._entries.values():
+            tree.add(entry['phash'], entry['id'])
+        self._tree = tree
+
+    def matches(self, hashes: Tuple[int, int], radius: Optional[int] = None,
+                dhash_radius: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Entries within the radii, closest first, with their pHash/dHash distances"""
+        phash_value, dhash_value = hashes
+        radius = self.radius if radius is None else radius
+        dhash_radius = self.dhash_radius if dhash_radius is None else dhash_radius
+        found = []
+        seen = set()
+        with self._lock:
+            for distance, item_id in self._tree.search(phash_value, radius):
+                entry = self._entries.get(item_id)
+                # Skip evicted ids and stale nodes left behind when an id was re-added with a new hash
+                if entry is None or item_id in seen or hamming(entry['phash'], phash_value) != distance:
+                    continue
+                seen.add(item_id)
+                dhash_distance = hamming(entry['dhash'], dhash_value)
+                if dhash_distance <= dhash_radius:
+                    found.append({**entry, 'distance': distance, 'dhash_distance': dhash_distance})
+        found.sort(key=lambda match: (match['distance'] + match['dhash_distance'], -match['added_at']))
+        return found
+
+    def lookup(self, hashes: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+        """Closest match within the configured radii (counted as a hit or miss), or None"""
+        found = self.matches(hashes)
+        with self._lock:
+            if not found:
+                self._misses += 1
+                return None
+            self._hits += 1
+            entry = self._entries.get(found[0]['id'])
+            if entry is not None:
+                entry['hits'] += 1
+                found[0]['hits'] = entry['hits']
+        return found[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tree = BKTree()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'capacity': self.max_entries,
+                'radius': self.radius,
+                'dhash_radius': self.dhash_radius,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def describe_match(match: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON-friendly view of a match (hashes as hex) for responses and the inspection API"""
+    return {
+        'id': match['id'],
+        'distance': match['distance'],
+        'dhash_distance': match['dhash_distance'],
+        'phash': f"{match['phash']:016x}",
+        'dhash': f"{match['dhash']:016x}",
+        'result': match['result'].get('result'),
+        'confidence': match['result'].get('confidence'),
+        'added_at': match['added_at'],
+        'hits': match['hits'],
+    }
@@ -0,0 +1,193 @@
+"""
+ONNX Runtime Backend for the Image Deepfake Classifier
+Exports the Hugging Face image classifier to ONNX (optionally int8-quantized), serves it with
+ONNX Runtime on CPU, and checks label/score parity of the served path (the backend's
+ImagePreprocessor feeding the exported model) against the torch pipeline.
+
+Usage:
+    python backend/onnx_backend.py export --output /models/onnx [--quantize]
+    python backend/onnx_backend.py parity --output /models/onnx image1.jpg image2.jpg ...
+"""
+
+import argparse
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from image_preprocess import ImagePreprocessor, _softmax, classify_pixels
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+
+
+def export_onnx(model_id: str, output_dir: str, quantize: bool = False, opset: int = 17) -> str:
+    """
+    Export ``model_id`` to ``output_dir`` with a dynamic batch axis.
+
+    The image processor and label config are saved next to the graph so the runtime needs
+    neither torch nor network access. Returns the path of the model file to serve.
+    """
+    import torch
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = AutoModelForImageClassification.from_pretrained(model_id).eval()
+    processor = AutoImageProcessor.from_pretrained(model_id)
+    model.config.save_pretrained(output_dir)
+    processor.save_pretrained(output_dir)
+
+    size = processor.size.get("height", 224) if isinstance(processor.size, dict) else processor.size
+    dummy = torch.zeros(1, 3, size, size)
+    model_path = os.path.join(output_dir, MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (dummy,), model_path,
+            input_names=["pixel_values"], output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset,
+        )
+    print(f"Exported {model_id} to {model_path}")
+
+    if not quantize:
+        return model_path
+    return quantize_onnx(model_path, os.path.join(output_dir, QUANTIZED_MODEL_FILE))
+
+
+def quantize_onnx(model_path: str, output_path: str) -> str:
+    """Dynamic int8 weight quantization; activations stay fp32 so no calibration set is needed"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+    print(f"Quantized {model_path} to {output_path}")
+    return output_path
+
+
+class OnnxImageClassifier:
+    """
+    Drop-in replacement for the ``image-classification`` pipeline on CPU.
+
+    Called with a list of PIL images, it returns one list of ``{'label', 'score'}`` dicts
+    per image, sorted by score, the same shape the transformers pipeline returns.
+
+    Args:
+        model_dir (str): Directory written by ``export_onnx``.
+        quantized (bool): Serve the int8 model instead of the fp32 one.
+        threads (int): ONNX Runtime intra-op threads (0 lets the runtime decide).
+    """
+
+    def __init__(self, model_dir: str, quantized: bool = False, threads: int = 0):
+        import onnxruntime as ort
+        from transformers import AutoImageProcessor
+
+        self.model_dir = model_dir
+        self.quantized = quantized
+        self.model_path = os.path.join(model_dir, QUANTIZED_MODEL_FILE if quantized else MODEL_FILE)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+        self.processor = AutoImageProcessor.from_pretrained(model_dir)
+
+        with open(os.path.join(model_dir, "config.json")) as f:
+            id2label = json.load(f)["id2label"]
+        self.labels = [id2label[str(i)] for i in range(len(id2label))]
+
+    def predict_pixels(self, pixel_values: np.ndarray) -> List[List[Dict[str, Any]]]:
+        """Classify an already preprocessed (batch, 3, H, W) float32 array"""
+        (logits,) = self.session.run(["logits"], {"pixel_values": np.ascontiguousarray(pixel_values, dtype=np.float32)})
+        scores = _softmax(logits.astype(np.float64))
+        results = []
+        for row in scores:
+            order = np.argsort(row)[::-1]
+            results.append([{"label": self.labels[i], "score": float(row[i])} for i in order])
+        return results
+
+    def __call__(self, images: Sequence[Any], batch_size: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        single = not isinstance(images, (list, tuple))
+        batch = [images] if single else list(images)
+        pixel_values = self.processor(images=batch, return_tensors="np")["pixel_values"]
+        results = self.predict_pixels(pixel_values)
+        return results[0] if single else results
+
+
+def parity_check(reference, candidate, sources: Sequence[Any], score_tolerance: float = 0.02,
+                 preprocessor: Optional[ImagePreprocessor] = None) -> Dict[str, Any]:
+    """
+    Compare a reference classifier (the torch pipeline on fully decoded images) with a candidate
+    served the way the backend serves it: decoded by ``ImagePreprocessor.load`` (JPEG draft
+    mode, one resize), normalized into an NCHW batch and run through ``classify_pixels``.
+    The drift reported is therefore the drift requests actually see.
+
+    Args:
+        sources: Image paths (each is opened once per side).
+        preprocessor: Serving preprocessor; by default built from the candidate's processor config.
+
+    Returns:
+        dict: label agreement, max/mean absolute drift of the top label's score and the
+              per-image details of every mismatch or drift above ``score_tolerance``.
+    """
+    from PIL import Image
+
+    sources = list(sources)
+    expected = reference([Image.open(source).convert("RGB") for source in sources], batch_size=len(sources))
+    preprocessor = preprocessor or ImagePreprocessor.from_classifier(candidate, max_batch=len(sources))
+    pixel_values = preprocessor.batch([preprocessor.load(source) for source in sources])
+    actual = classify_pixels(candidate, pixel_values)
+
+    drifts, mismatches = [], []
+    label_matches = 0
+    for index, (ref, cand) in enumerate(zip(expected, actual)):
+        ref_top, cand_top = ref[0], cand[0]
+        cand_scores = {p["label"]: p["score"] for p in cand}
+        drift = abs(ref_top["score"] - cand_scores.get(ref_top["label"], 0.0))
+        drifts.append(drift)
+        label_matches += ref_top["label"] == cand_top["label"]
+        if ref_top["label"] != cand_top["label"] or drift > score_tolerance:
+            mismatches.append({
+                "index": index,
+                "reference": ref_top,
+                "candidate": cand_top,
+                "score_drift": round(drift, 6),
+            })
+
+    return {
+        "images": len(drifts),
+        "label_agreement": label_matches / max(1, len(drifts)),
+        "max_score_drift": round(max(drifts, default=0.0), 6),
+        "mean_score_drift": round(float(np.mean(drifts)) if drifts else 0.0, 6),
+        "score_tolerance": score_tolerance,
+        "passed": not mismatches,
+        "mismatches": mismatches,
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Export or verify the ONNX image classifier")
+    parser.add_argument("command", choices=["export", "parity"])
+    parser.add_argument("images", nargs="*", help="Images for the parity check")
+    parser.add_argument("--model-id", default=os.environ.get("IMAGE_MODEL_ID", "dima806/deepfake_vs_real_image_detection"))
+    parser.add_argument("--output", default=os.environ.get("ONNX_MODEL_DIR", "onnx_model"))
+    parser.add_argument("--quantize", action="store_true", help="Also write (or check) the int8 model")
+    parser.add_argument("--tolerance", type=float, default=0.02)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(args.model_id, args.output, quantize=args.quantize)
+        return
+
+    from transformers import pipeline
+
+    if not args.images:
+        parser.error("parity needs at least one image")
+    reference = pipeline("image-classification", model=args.model_id)
+    report = parity_check(reference, OnnxImageClassifier(args.output, quantized=args.quantize),
+                          args.images, args.tolerance)
+    print(json.dumps(report, indent=2))
+    raise SystemExit(0 if report["passed"] else 1)
+
+
+if __name__ == "__main__":
+    _main()
@@ -0,0 +1,181 @@
+"""
+Content-Hash Result Cache for Detection Results
+Keys results by the SHA-256 of the uploaded bytes plus the model identity and thresholds,
+with an in-memory LRU tier and an optional SQLite tier shared across workers and restarts.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def content_digest(data) -> str:
+    """SHA-256 hex digest of a bytes-like object"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_cache_key(digest: str, model_id: str, model_version: str = "", **params) -> str:
+    """
+    Build a cache key from the content digest, model identity and any parameters
+    (thresholds, result labels) that change the verdict for the same bytes.
+    """
+    param_part = json.dumps(params, sort_keys=True, separators=(",", ":"))
+    return f"{digest}:{model_id}@{model_version}:{param_part}"
+
+
+class _SQLiteTier:
+    """Size-bounded on-disk tier; evicts least recently used rows beyond max_entries"""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at)")
+
+    def get(self, key: str, now: float):
+        """Return (value, expires_at) for a live entry, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE results SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(value), expires_at
+
+    def set(self, key: str, value: Dict[str, Any], expires_at: Optional[float], now: float) -> int:
+        """Store a value and return the number of rows evicted to stay within bounds"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+            evicted = self._conn.execute(
+                "DELETE FROM results WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).rowcount
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()
+            if count > self.max_entries:
+                evicted += self._conn.execute(
+                    "DELETE FROM results WHERE key IN ("
+                    " SELECT key FROM results ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+class ResultCache:
+    """
+    Two-tier detection result cache.
+
+    Args:
+        max_entries (int): Capacity of the in-memory LRU tier (0 disables it).
+        ttl_seconds (float): Entry lifetime in both tiers; None or 0 keeps entries until evicted.
+        disk_path (str): SQLite database path for the on-disk tier; None disables it.
+        disk_max_entries (int): Row limit of the on-disk tier.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None,
+                 disk_path: Optional[str] = None, disk_max_entries: int = 100000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds or None
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = _SQLiteTier(disk_path, disk_max_entries) if disk_path else None
+
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return a cached result, promoting disk hits into memory"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > now:
+                    self._memory.move_to_end(key)
+                    self._hits += 1
+                    return dict(value)
+                del self._memory[key]
+
+        found = self._disk.get(key, now) if self._disk is not None else None
+        with self._lock:
+            if found is None:
+                self._misses += 1
+                return None
+            value, expires_at = found
+            self._hits += 1
+            self._disk_hits += 1
+            self._remember(key, value, expires_at)
+        return dict(value)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        expires_at = self._expiry(now)
+        with self._lock:
+            self._remember(key, dict(value), expires_at)
+        if self._disk is not None:
+            evicted = self._disk.set(key, value, expires_at, now)
+            with self._lock:
+                self._evictions += evicted
+
+    def _expiry(self, now: float) -> Optional[float]:
+        return now + self.ttl_seconds if self.ttl_seconds else None
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: Optional[float]):
+        # Caller holds self._lock
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._disk is not None:
+            self._disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            stats = {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "memory_entries": len(self._memory),
+                "memory_capacity": self.max_entries,
+            }
+        if self._disk is not None:
+            stats["disk_entries"] = len(self._disk)
+        return stats
@@ -0,0 +1,72 @@
+"""
+Startup Timing for the Detection Backend
+Records how long interpreter boot, imports, setup and model warm-up take, so cold-start
+regressions show up in the logs and on the readiness endpoint instead of as failed probes.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process was started by the OS (Linux only, None elsewhere)"""
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 is the start time in clock ticks; fields after the command name start at 3
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return max(0.0, uptime - start_ticks / os.sysconf('SC_CLK_TCK'))
+
+
+class StartupTimer:
+    """Named startup phases measured from the moment this module was imported"""
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        # Interpreter start-up and anything imported before this module
+        self.boot_seconds = process_age()
+        self.phases: Dict[str, float] = {}
+        self.ready_seconds: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = round(self.phases.get(name, 0.0) + time.perf_counter() - start, 3)
+
+    def mark_ready(self):
+        if self.ready_seconds is None:
+            self.ready_seconds = round(time.perf_counter() - self._start, 3)
+
+    def report(self, registry=None) -> Dict[str, Any]:
+        """Phase breakdown plus per-model load times from ``registry`` when given"""
+        report: Dict[str, Any] = {
+            'boot_seconds': round(self.boot_seconds, 3) if self.boot_seconds is not None else None,
+            'phases': dict(self.phases),
+            'ready_seconds': self.ready_seconds,
+            'uptime_seconds': round(time.perf_counter() - self._start, 3),
+        }
+        if registry is not None:
+            report['model_load_seconds'] = {
+                name: status['load_seconds'] for name, status in registry.status().items()
+            }
+        return report
+
+    def format_report(self, registry=None) -> str:
+        report = self.report(registry)
+        parts = [f"boot {report['boot_seconds']}s"]
+        parts += [f"{name} {seconds}s" for name, seconds in report['phases'].items()]
+        parts += [f"load '{name}' {seconds}s"
+                  for name, seconds in report.get('model_load_seconds', {}).items() if seconds is not None]
+        return f"Startup: ready after {report['ready_seconds']}s ({', '.join(parts)})"
+
+
+# Shared timer; main.py imports this first so its clock starts before the heavy imports
+startup_timer = StartupTimer()
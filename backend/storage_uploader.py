@@ -0,0 +1,225 @@
+"""
+Background Object Storage Uploader
+Archives uploaded media off the request path using a bounded queue, retries and backpressure.
+"""
+
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from typing import Dict, Optional
+
+
+class GCSStorage:
+    """Google Cloud Storage backend; the client is created on first upload"""
+
+    def __init__(self, bucket_name: str, client=None):
+        self.bucket_name = bucket_name
+        self._client = client
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    def _get_bucket(self):
+        if self._bucket is None:
+            with self._lock:
+                if self._bucket is None:
+                    if self._client is None:
+                        from google.cloud import storage
+                        self._client = storage.Client()
+                    self._bucket = self._client.bucket(self.bucket_name)
+        return self._bucket
+
+    def upload(self, name: str, data: bytes, content_type: Optional[str] = None):
+        blob = self._get_bucket().blob(name)
+        blob.upload_from_string(data, content_type=content_type)
+
+    def upload_file(self, name: str, path: str, content_type: Optional[str] = None):
+        blob = self._get_bucket().blob(name)
+        blob.upload_from_filename(path, content_type=content_type)
+
+
+class LocalStorage:
+    """Directory-backed stand-in for object storage, for local runs and tests"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def upload(self, name: str, data: bytes, content_type: Optional[str] = None):
+        path = os.path.join(self.root, os.path.basename(name))
+        tmp_path = f"{path}.{threading.get_ident()}.part"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def upload_file(self, name: str, path: str, content_type: Optional[str] = None):
+        target = os.path.join(self.root, os.path.basename(name))
+        tmp_path = f"{target}.{threading.get_ident()}.part"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, target)
+
+
+class InMemoryStorage:
+    """Dict-backed fake storage; ``fail_times`` makes the first N uploads raise to exercise retries"""
+
+    def __init__(self, fail_times: int = 0):
+        self.objects: Dict[str, bytes] = {}
+        self.fail_times = fail_times
+        self._lock = threading.Lock()
+
+    def upload(self, name: str, data: bytes, content_type: Optional[str] = None):
+        with self._lock:
+            if self.fail_times > 0:
+                self.fail_times -= 1
+                raise IOError("simulated storage failure")
+            self.objects[name] = bytes(data)
+
+    def upload_file(self, name: str, path: str, content_type: Optional[str] = None):
+        with open(path, 'rb') as f:
+            self.upload(name, f.read(), content_type)
+
+
+class BackgroundUploader:
+    """
+    Uploads objects from worker threads so requests never wait on storage.
+
+    Args:
+        storage: Any object with ``upload(name, data, content_type)`` and
+            ``upload_file(name, path, content_type)``.
+        max_queue (int): Pending uploads held in memory before backpressure applies.
+        workers (int): Number of uploader threads.
+        max_retries (int): Retries per object after the first failed attempt.
+        backoff_seconds (float): Base delay for exponential backoff between retries.
+        enqueue_timeout (float): How long ``submit`` blocks on a full queue before dropping the upload.
+    """
+
+    def __init__(self, storage, max_queue: int = 100, workers: int = 2, max_retries: int = 3,
+                 backoff_seconds: float = 0.5, enqueue_timeout: float = 1.0):
+        self.storage = storage
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.enqueue_timeout = enqueue_timeout
+        self.workers = workers
+
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"queued": 0, "uploaded": 0, "retries": 0, "failed": 0, "dropped": 0}
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._start_lock:
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._run, name=f"uploader-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def submit(self, name: str, data: bytes, content_type: Optional[str] = None) -> bool:
+        """
+        Queue an object for upload.
+
+        Blocks for up to ``enqueue_timeout`` seconds when the queue is full and returns
+        False if the upload had to be dropped, so callers are slowed down rather than
+        letting pending payloads grow without bound.
+        """
+        return self._enqueue((name, data, None, content_type))
+
+    def submit_file(self, name: str, path: str, content_type: Optional[str] = None) -> bool:
+        """
+        Queue a file for upload without reading it into memory.
+        The uploader takes ownership of ``path`` and deletes it once the upload is done or dropped.
+        """
+        if not self._enqueue((name, None, path, content_type)):
+            self._remove(path)
+            return False
+        return True
+
+    def _enqueue(self, job) -> bool:
+        self._ensure_started()
+        try:
+            self._queue.put(job, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count("dropped")
+            print(f"Warning: upload queue full, dropped archive of {job[0]}")
+            return False
+        self._count("queued")
+        return True
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                self._upload_with_retry(*job)
+            finally:
+                self._queue.task_done()
+
+    def _upload_with_retry(self, name: str, data: Optional[bytes], path: Optional[str],
+                           content_type: Optional[str]):
+        try:
+            self._attempt_uploads(name, data, path, content_type)
+        finally:
+            if path is not None:
+                self._remove(path)
+
+    def _attempt_uploads(self, name: str, data: Optional[bytes], path: Optional[str],
+                         content_type: Optional[str]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                if path is not None:
+                    self.storage.upload_file(name, path, content_type)
+                else:
+                    self.storage.upload(name, data, content_type)
+                self._count("uploaded")
+                return
+            except Exception as e:
+                if attempt == self.max_retries:
+                    self._count("failed")
+                    print(f"Upload of {name} failed after {attempt + 1} attempts: {e}")
+                    return
+                self._count("retries")
+                delay = self.backoff_seconds * (2 ** attempt)
+                time.sleep(delay + random.uniform(0, delay))
+
+    def flush(self):
+        """Block until every queued upload has finished (or exhausted its retries)"""
+        self._queue.join()
+
+    def close(self):
+        """Finish queued uploads and stop the worker threads"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        return stats
+
+
+def create_storage_from_env():
+    """Pick the storage backend from STORAGE_BACKEND ('gcs' or 'local')"""
+    backend = os.environ.get('STORAGE_BACKEND', 'gcs').lower()
+    if backend == 'local':
+        return LocalStorage(os.environ.get('LOCAL_STORAGE_DIR', '/tmp/deepfake-uploads'))
+    return GCSStorage(os.environ.get('GCS_BUCKET', 'your-bucket-name'))
@@ -1,8 +1,7 @@
 import os
-from flask import Flask, request, jsonify
-import requests
+import sys
+from flask import Flask, Response, request, jsonify
 from PIL import Image
-from io import BytesIO
 import numpy as np
 from pathlib import Path
 
@@ -16,37 +15,36 @@ SYNTHETIC_RESULT = os.environ.get('SYNTHETIC_RESULT', 'synthetic')
 REAL_RESULT = os.environ.get('REAL_RESULT', 'real')
 HUMAN_RESULT = os.environ.get('HUMAN_RESULT', 'human')
 
-# Initialize models globally to avoid reloading
-image_classifier = None
-voice_encoder = None
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from model_registry import registry
+from ingestion import IngestionError, ingest_request
+from audio_features import analyze_audio, analyze_timeline, synthetic_spans
+from metrics import metrics_payload, record_mock_fallback, record_result, stage, track_request
+
+
+def _build_image_classifier():
+    from transformers import pipeline
+    return pipeline('image-classification',
+                    model='dima806/deepfake_vs_real_image_detection')
+
+
+def _build_audio_analyzer():
+    import librosa  # noqa: F401 - only checks that librosa is importable
+    return "librosa"
+
+
+# Models are loaded once per process; "mock" is served if a model cannot be loaded
+registry.register('image', _build_image_classifier, fallback="mock")
+registry.register('audio', _build_audio_analyzer, fallback="mock")
 
 def load_image_model():
     """Load the Hugging Face deepfake detection model"""
-    global image_classifier
-    if image_classifier is None:
-        try:
-            from transformers import pipeline
-            print("Loading image deepfake detection model...")
-            image_classifier = pipeline('image-classification', 
-                                       model='dima806/deepfake_vs_real_image_detection')
-            print("Image model loaded successfully!")
-        except Exception as e:
-            print(f"Warning: Could not load image model: {e}")
-            image_classifier = "mock"
-    return image_classifier
+    return registry.get('image')
 
 def load_audio_model():
     """Load librosa for audio analysis (simpler than Resemblyzer)"""
-    global voice_encoder
-    if voice_encoder is None:
-        try:
-            import librosa
-            print("Audio analysis using librosa is ready!")
-            voice_encoder = "librosa"
-        except Exception as e:
-            print(f"Warning: Could not load librosa: {e}")
-            voice_encoder = "mock"
-    return voice_encoder
+    return registry.get('audio')
 
 def detect_image_deepfake(image_path):
     """
@@ -56,6 +54,7 @@ def detect_image_deepfake(image_path):
     
     if classifier == "mock":
         # Fallback to mock if model couldn't load
+        record_mock_fallback('image')
         return REAL_RESULT, 0.85, "Mock: Image appears to be real based on basic analysis."
     
     try:
@@ -63,7 +62,8 @@ def detect_image_deepfake(image_path):
         image = Image.open(image_path)
         
         # Get predictions from the model
-        predictions = classifier(image)
+        with stage('inference', model='dima806/deepfake_vs_real_image_detection'):
+            predictions = classifier(image)
         
         # Find the most confident prediction
         best_prediction = max(predictions, key=lambda p: p['score'])
@@ -91,82 +91,20 @@ def detect_audio_deepfake(audio_path):
     
     if encoder == "mock":
         # Fallback to mock if model couldn't load
+        record_mock_fallback('audio')
         return HUMAN_RESULT, 0.92, "Mock: Voice characteristics suggest human origin."
     
     try:
-        import librosa
+        # MFCC, spectral centroid/rolloff and ZCR are computed from a single STFT pass
+        with stage('analyze', model='spectral-heuristic'):
+            is_synthetic, confidence, details = analyze_audio(audio_path)
         
-        # Load audio file
-        y, sr = librosa.load(audio_path, sr=None)
-        
-        # Extract audio features for analysis
-        # MFCCs (Mel-frequency cepstral coefficients) - good for voice analysis
-        mfccs = librosa.feature.mfcc(y=y, sr=sr, n_mfcc=13)
-        
-        # Spectral features
-        spectral_centroids = librosa.feature.spectral_centroid(y=y, sr=sr)
-        spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
-        zero_crossing_rate = librosa.feature.zero_crossing_rate(y)
-        
-        # Calculate statistical measures
-        mfcc_mean = np.mean(mfccs)
-        mfcc_var = np.var(mfccs)
-        centroid_mean = np.mean(spectral_centroids)
-        rolloff_mean = np.mean(spectral_rolloff)
-        zcr_mean = np.mean(zero_crossing_rate)
-        
-        # Heuristics for synthetic voice detection
-        # Based on research showing synthetic voices have different spectral characteristics
-        
-        # Synthetic voices often have:
-        # - More regular MFCC patterns (lower variance)
-        # - Different spectral centroid distributions
-        # - More consistent zero crossing rates
-        
-        # Thresholds (empirically determined)
-        mfcc_var_threshold = 50.0  # Synthetic voices often have lower MFCC variance
-        centroid_threshold = 2000.0  # Synthetic voices may have different spectral centroids
-        zcr_threshold = 0.1  # Zero crossing rate patterns
-        
-        # Calculate confidence based on multiple features
-        feature_scores = []
-        
-        # MFCC variance score (lower variance suggests synthetic)
-        if mfcc_var < mfcc_var_threshold:
-            feature_scores.append(0.3)  # Lower confidence (more likely synthetic)
-        else:
-            feature_scores.append(0.8)  # Higher confidence (more likely human)
-        
-        # Spectral centroid score
-        if 1000 < centroid_mean < 3000:  # Typical human speech range
-            feature_scores.append(0.8)
-        else:
-            feature_scores.append(0.4)
-        
-        # Zero crossing rate score
-        if 0.02 < zcr_mean < 0.15:  # Typical human speech range
-            feature_scores.append(0.7)
-        else:
-            feature_scores.append(0.4)
-        
-        # Combined confidence score
-        confidence = np.mean(feature_scores)
-        
-        # Determine if voice is synthetic or human based on features
-        synthetic_indicators = 0
-        if mfcc_var < mfcc_var_threshold:
-            synthetic_indicators += 1
-        if centroid_mean < 1000 or centroid_mean > 3000:
-            synthetic_indicators += 1
-        if zcr_mean < 0.02 or zcr_mean > 0.15:
-            synthetic_indicators += 1
-        
-        if synthetic_indicators >= 2:  # Majority vote
+        if is_synthetic:  # Majority vote of the feature heuristics
             result = SYNTHETIC_RESULT
-            explanation = f"Audio features suggest synthetic origin. MFCC variance: {mfcc_var:.1f}, Spectral centroid: {centroid_mean:.1f}Hz, ZCR: {zcr_mean:.3f}"
+            explanation = f"Audio features suggest synthetic origin. {details}"
         else:
             result = HUMAN_RESULT
-            explanation = f"Audio features suggest human origin. MFCC variance: {mfcc_var:.1f}, Spectral centroid: {centroid_mean:.1f}Hz, ZCR: {zcr_mean:.3f}"
+            explanation = f"Audio features suggest human origin. {details}"
         
         return result, confidence, explanation
         
@@ -174,98 +112,112 @@ def detect_audio_deepfake(audio_path):
         return "error", 0.0, f"Error processing audio: {str(e)}"
 
 @app.route('/detect-image', methods=['POST'])
+@track_request('/detect-image')
 def detect_image():
-    # Accept file upload or URL
-    if 'file' in request.files:
-        image_file = request.files['file']
-        filename = image_file.filename
-        temp_path = f'temp_{filename}'
-        image_file.save(temp_path)
-    elif request.is_json and 'url' in request.json:
-        try:
-            url = request.json['url']
-            filename = url.split('/')[-1]
-            temp_path = f'temp_{filename}'
-            r = requests.get(url, stream=True)
-            r.raise_for_status()
-            with open(temp_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Error downloading image from URL: {e}'}), 400
-    else:
-        return jsonify({'error': 'No image file or URL provided.'}), 400
-
+    # Accept file upload or URL, streamed into memory (spilled to a private temp file if large)
     try:
-        # For testing, use the local file directly
-        with open(temp_path, 'rb') as f:
-            image = BytesIO(f.read())
+        with stage('ingest'):
+            payload = ingest_request(request, 'image')
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
 
-        # Call deepfake detection model
-        result, confidence, explanation = detect_image_deepfake(image)
-        response_data = {
-            'type': 'image',
-            'result': result, 
-            'confidence': confidence, 
-            'explanation': explanation
-        }
-        return jsonify(response_data)
-    except Exception as e:
-        return jsonify({'error': f'Error processing image: {e}'}), 500
-    finally:
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
+    with payload:
+        try:
+            # Call deepfake detection model on the buffered bytes
+            result, confidence, explanation = detect_image_deepfake(payload.open())
+            record_result(result)
+            response_data = {
+                'type': 'image',
+                'result': result, 
+                'confidence': confidence, 
+                'explanation': explanation
+            }
+            return jsonify(response_data)
+        except Exception as e:
+            return jsonify({'error': f'Error processing image: {e}'}), 500
 
 @app.route('/detect-audio', methods=['POST'])
+@track_request('/detect-audio')
 def detect_audio():
-    # Accept file upload or URL
-    if 'file' in request.files:
-        audio_file = request.files['file']
-        filename = audio_file.filename
-        temp_path = f'temp_{filename}'
-        audio_file.save(temp_path)
-    elif request.is_json and 'url' in request.json:
+    # Accept file upload or URL, streamed into memory (spilled to a private temp file if large)
+    try:
+        with stage('ingest'):
+            payload = ingest_request(request, 'audio')
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    with payload:
         try:
-            url = request.json['url']
-            filename = url.split('/')[-1]
-            temp_path = f'temp_{filename}'
-            r = requests.get(url, stream=True)
-            r.raise_for_status()
-            with open(temp_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        except requests.exceptions.RequestException as e:
-            return jsonify({'error': f'Error downloading audio from URL: {e}'}), 400
-    else:
-        return jsonify({'error': 'No audio file or URL provided.'}), 400
+            # Call audio deepfake detection model
+            result, confidence, explanation = detect_audio_deepfake(payload.open())
+            record_result(result)
+            response_data = {
+                'type': 'audio',
+                'result': result,
+                'confidence': confidence,
+                'explanation': explanation
+            }
+            return jsonify(response_data)
+        except Exception as e:
+            return jsonify({'error': f'Error processing audio: {e}'}), 500
 
+@app.route('/detect-audio/timeline', methods=['POST'])
+def detect_audio_timeline():
+    """Time-indexed synthetic/human scores over sliding windows of one clip"""
     try:
-        # Call audio deepfake detection model
-        result, confidence, explanation = detect_audio_deepfake(temp_path)
-        response_data = {
-            'type': 'audio',
-            'result': result,
-            'confidence': confidence,
-            'explanation': explanation
-        }
-        return jsonify(response_data)
-    except Exception as e:
-        return jsonify({'error': f'Error processing audio: {e}'}), 500
-    finally:
-        if 'temp_path' in locals() and os.path.exists(temp_path):
-            os.remove(temp_path)
+        window_seconds = float(request.args.get('window', 2.0))
+        hop_seconds = float(request.args.get('hop', 0.5))
+    except ValueError:
+        return jsonify({'error': 'window and hop must be numbers of seconds.'}), 400
+    if window_seconds <= 0 or hop_seconds <= 0:
+        return jsonify({'error': 'window and hop must be positive.'}), 400
+
+    try:
+        payload = ingest_request(request, 'audio')
+    except IngestionError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    with payload:
+        try:
+            # One decode and one feature pass; every window reuses the framewise arrays
+            (is_synthetic, confidence, details), timeline, duration = analyze_timeline(
+                payload.open(), window_seconds, hop_seconds)
+        except Exception as e:
+            return jsonify({'error': f'Error processing audio: {e}'}), 500
+
+    spans = synthetic_spans(timeline)
+    for window in timeline:
+        window['result'] = SYNTHETIC_RESULT if window.pop('synthetic') else HUMAN_RESULT
+    return jsonify({
+        'type': 'audio',
+        'result': SYNTHETIC_RESULT if is_synthetic else HUMAN_RESULT,
+        'confidence': confidence,
+        'explanation': details,
+        'duration': round(duration, 3),
+        'window_seconds': window_seconds,
+        'hop_seconds': hop_seconds,
+        'synthetic_spans': spans,
+        'timeline': timeline
+    })
+
+@app.route('/metrics')
+def metrics():
+    body, content_type, status_code = metrics_payload()
+    return Response(body, status=status_code, content_type=content_type)
 
 @app.route('/')
 def health_check():
-    return jsonify({'status': 'Deepfake Detection Backend is running'})
+    return jsonify({
+        'status': 'Deepfake Detection Backend is running',
+        'models': registry.status()
+    })
 
 if __name__ == '__main__':
     print("Starting Deepfake Detection Backend...")
     print("Loading models on startup...")
     
     # Pre-load models to avoid timeout during requests
-    load_image_model()
-    load_audio_model()
+    registry.preload()
     
     print("All models loaded! Starting server...")
     app.run(host='127.0.0.1', port=8080, debug=False)  # Disable debug to prevent restarts
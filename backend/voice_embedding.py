@@ -0,0 +1,56 @@
+"""
+Batched Resemblyzer Utterance Embedding
+Splits ``VoiceEncoder.embed_utterance`` into its three steps so the LSTM forward pass can be
+shared: each request computes its partial-utterance mel windows on its own thread, the
+micro-batcher stacks the windows of every pending clip into one forward pass, and each clip
+averages its own partial embeddings afterwards. Results match ``embed_utterance``.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+# embed_utterance defaults: partial windows per second and minimum coverage of the last window
+PARTIALS_RATE = 1.3
+MIN_COVERAGE = 0.75
+
+
+def utterance_partials(wav: np.ndarray, rate: float = PARTIALS_RATE,
+                       min_coverage: float = MIN_COVERAGE) -> np.ndarray:
+    """
+    Mel spectrogram windows (n_partials, frames, mel channels) of a preprocessed waveform,
+    exactly as embed_utterance slices them. Needs no model, so it runs outside the batcher.
+    """
+    from resemblyzer import VoiceEncoder, audio
+
+    wav_slices, mel_slices = VoiceEncoder.compute_partial_slices(len(wav), rate, min_coverage)
+    max_wave_length = wav_slices[-1].stop
+    if max_wave_length >= len(wav):
+        wav = np.pad(wav, (0, max_wave_length - len(wav)), 'constant')
+    mel = audio.wav_to_mel_spectrogram(wav)
+    return np.array([mel[s] for s in mel_slices], dtype=np.float32)
+
+
+def forward_partials(encoder, partials: Sequence[np.ndarray], max_windows: int = 256) -> List[np.ndarray]:
+    """
+    Partial embeddings for several clips from stacked forward passes of at most ``max_windows``
+    windows each (bounding peak memory when a long recording shares the batch).
+    Returns one (n_partials, 256) array per clip, in order.
+    """
+    import torch
+
+    counts = [len(p) for p in partials]
+    stacked = np.concatenate(partials) if len(partials) > 1 else partials[0]
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(stacked), max_windows):
+            chunk = torch.from_numpy(np.ascontiguousarray(stacked[start:start + max_windows]))
+            outputs.append(encoder(chunk.to(encoder.device)).cpu().numpy())
+    embeddings = np.concatenate(outputs) if len(outputs) > 1 else outputs[0]
+    return np.split(embeddings, np.cumsum(counts)[:-1])
+
+
+def combine_partials(partial_embeddings: np.ndarray) -> np.ndarray:
+    """Unit-length utterance embedding: the normalized mean of the partial embeddings"""
+    raw = np.mean(partial_embeddings, axis=0)
+    return raw / np.linalg.norm(raw, 2)
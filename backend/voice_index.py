@@ -0,0 +1,300 @@
+"""
+Voice-Embedding Similarity Index
+Stores Resemblyzer utterance embeddings of known synthetic (TTS / cloned) voices and confirmed
+human speakers, and finds the nearest ones to a new clip by cosine similarity: one matrix-vector
+product over the whole set, or over a few IVF partitions once the set is large.
+
+On disk the index is two append-only files in one directory, so enrolling a voice never
+rewrites the whole matrix:
+    embeddings.f32    raw float32 rows, ``dim`` values each, L2-normalized
+    metadata.jsonl    one JSON object per row (id, label, name, added_at)
+    index.lock        flock target: appends take it exclusively, reloads shared
+
+Several processes (gunicorn workers) can share one directory: each appends under the
+exclusive lock and picks up the others' rows when the embeddings file grows.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # No flock (Windows): the index is then only safe within one process
+    fcntl = None
+
+LABELS = ('synthetic', 'human')
+EMBEDDINGS_FILE = 'embeddings.f32'
+METADATA_FILE = 'metadata.jsonl'
+LOCK_FILE = 'index.lock'
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first, without sorting the whole array"""
+    if len(scores) > k:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def train_ivf(vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 50000,
+              seed: int = 0) -> np.ndarray:
+    """Spherical k-means centroids (unit length) over a sample of ``vectors``"""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        # Re-seed empty partitions so every centroid stays useful
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class VoiceIndex:
+    """
+    Growable, persisted embedding matrix with exact or IVF cosine search.
+
+    Args:
+        path (str): Directory holding the index files; None keeps the index in memory only.
+        dim (int): Embedding size (256 for Resemblyzer).
+        ivf_min_size (int): Switch from exact search to IVF at this many embeddings (0 disables IVF).
+        nlist (int): IVF partitions; 0 picks about 4 * sqrt(size).
+        nprobe (int): Partitions scanned per IVF query.
+    """
+
+    def __init__(self, path: Optional[str] = None, dim: int = 256, ivf_min_size: int = 50000,
+                 nlist: int = 0, nprobe: int = 8):
+        self.path = path
+        self.dim = dim
+        self.ivf_min_size = ivf_min_size
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self._vectors = np.zeros((1024, dim), dtype=np.float32)
+        self._size = 0
+        self._metadata: List[Dict[str, Any]] = []
+        self._label_counts = {label: 0 for label in LABELS}
+        self._lock = threading.RLock()
+        # IVF state: unit centroids, partition of each row, and the size it was trained at
+        self._centroids: Optional[np.ndarray] = None
+        self._assignment = np.zeros(1024, dtype=np.int32)
+        self._lists: List[np.ndarray] = []
+        self._trained_size = 0
+        self._training = False
+        # Bytes of each file already loaded; rows appended by other processes are read from here
+        self._embeddings_offset = 0
+        self._metadata_offset = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self.refresh()
+            self._maybe_train()
+
+    def __len__(self):
+        return self._size
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = False):
+        if fcntl is None:
+            yield
+            return
+        with open(self._file(LOCK_FILE), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def refresh(self) -> int:
+        """Load rows other processes appended since the last look; returns how many were added"""
+        if not self.path:
+            return 0
+        try:
+            if os.path.getsize(self._file(EMBEDDINGS_FILE)) == self._embeddings_offset:
+                return 0
+        except OSError:
+            return 0
+        with self._lock, self._file_lock():
+            return self._sync()
+
+    def _sync(self) -> int:
+        # Caller holds self._lock and the file lock. Only rows present in both files are taken:
+        # a writer that died between its two appends leaves a tail the next writer truncates
+        try:
+            with open(self._file(EMBEDDINGS_FILE), 'rb') as f:
+                f.seek(self._embeddings_offset)
+                raw = f.read()
+            with open(self._file(METADATA_FILE), 'rb') as f:
+                f.seek(self._metadata_offset)
+                lines = f.read().splitlines(keepends=True)
+        except FileNotFoundError:
+            return 0
+        row_bytes = self.dim * 4
+        count = min(len(raw) // row_bytes, sum(1 for line in lines if line.endswith(b'\n')))
+        if count == 0:
+            return 0
+        vectors = np.frombuffer(raw[:count * row_bytes], dtype=np.float32).reshape(count, self.dim)
+        entries = [json.loads(line) for line in lines[:count]]
+        self._insert(vectors, entries)
+        self._embeddings_offset += count * row_bytes
+        self._metadata_offset += sum(len(line) for line in lines[:count])
+        return count
+
+    def _grow(self, needed: int):
+        # Caller holds self._lock (or is __init__); capacity doubles so appends are amortized O(1)
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        assignment = np.zeros(capacity, dtype=np.int32)
+        assignment[:self._size] = self._assignment[:self._size]
+        self._vectors, self._assignment = vectors, assignment
+
+    def _insert(self, vectors: np.ndarray, entries: List[Dict[str, Any]]):
+        # Caller holds self._lock
+        start, end = self._size, self._size + len(entries)
+        self._grow(end)
+        self._vectors[start:end] = vectors
+        if self._centroids is not None:
+            partitions = np.argmax(vectors @ self._centroids.T, axis=1)
+            self._assignment[start:end] = partitions
+            for row, partition in zip(range(start, end), partitions):
+                self._lists[partition] = np.append(self._lists[partition], row)
+        self._metadata.extend(entries)
+        for entry in entries:
+            self._label_counts[entry['label']] = self._label_counts.get(entry['label'], 0) + 1
+        self._size = end
+
+    def add(self, embedding, label: str, name: Optional[str] = None, **extra) -> Dict[str, Any]:
+        """Enroll one embedding as a known 'synthetic' or 'human' voice; returns its metadata"""
+        if label not in LABELS:
+            raise ValueError(f"label must be one of {', '.join(LABELS)}")
+        vector = _normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        entry = {'id': uuid.uuid4().hex, 'label': label, 'name': name, 'added_at': time.time(), **extra}
+        with self._lock:
+            if self.path:
+                with self._file_lock(exclusive=True):
+                    # Catch up with other writers first, so our row lands after theirs everywhere
+                    self._sync()
+                    self._append(vector, entry)
+            self._insert(vector[np.newaxis], [entry])
+        self._maybe_train()
+        return entry
+
+    def _append(self, vector: np.ndarray, entry: Dict[str, Any]):
+        # Caller holds the exclusive file lock and has synced. Anything past our offsets is the
+        # unpaired tail of a writer that died mid-append; drop it so both files stay aligned
+        for name, offset in ((EMBEDDINGS_FILE, self._embeddings_offset), (METADATA_FILE, self._metadata_offset)):
+            if os.path.exists(self._file(name)) and os.path.getsize(self._file(name)) > offset:
+                os.truncate(self._file(name), offset)
+        line = (json.dumps(entry) + '\n').encode()
+        with open(self._file(EMBEDDINGS_FILE), 'ab') as f:
+            f.write(vector.astype(np.float32).tobytes())
+        with open(self._file(METADATA_FILE), 'ab') as f:
+            f.write(line)
+        self._embeddings_offset += self.dim * 4
+        self._metadata_offset += len(line)
+
+    def _maybe_train(self):
+        # Partitions are retrained in the background whenever the set has doubled since the
+        # last training, so centroids keep up with the data without blocking enrollments
+        with self._lock:
+            if not self.ivf_min_size or self._size < self.ivf_min_size or self._training:
+                return
+            if self._centroids is not None and self._size < 2 * self._trained_size:
+                return
+            self._training = True
+        threading.Thread(target=self._train_in_background, name='voice-index-train', daemon=True).start()
+
+    def _train_in_background(self):
+        try:
+            self.train()
+        except Exception as e:
+            print(f"Warning: voice index training failed: {e}")
+        finally:
+            with self._lock:
+                self._training = False
+
+    def train(self):
+        """(Re)build the IVF partitions; k-means runs on a snapshot, outside the index lock"""
+        with self._lock:
+            size = self._size
+            # Rows are never modified once written and _grow copies into a new array, so this
+            # view stays valid while other threads keep adding
+            vectors = self._vectors[:size]
+        if size == 0:
+            return
+        nlist = min(self.nlist or max(1, int(4 * np.sqrt(size))), size)
+        centroids = train_ivf(vectors, nlist)
+        assignment = np.empty(size, dtype=np.int32)
+        # Assign in chunks to bound the temporary similarity matrix
+        for start in range(0, size, 65536):
+            chunk = vectors[start:start + 65536]
+            assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+
+        with self._lock:
+            # Rows enrolled while training
+            if self._size > size:
+                added = self._vectors[size:self._size]
+                assignment = np.concatenate([assignment, np.argmax(added @ centroids.T, axis=1).astype(np.int32)])
+            self._assignment[:self._size] = assignment
+            order = np.argsort(assignment, kind='stable')
+            bounds = np.searchsorted(assignment[order], np.arange(nlist + 1))
+            self._lists = [order[bounds[i]:bounds[i + 1]] for i in range(nlist)]
+            self._centroids = centroids
+            self._trained_size = self._size
+
+    def search(self, embedding, k: int = 5) -> List[Dict[str, Any]]:
+        """The ``k`` most similar enrolled voices, best first, each with its cosine similarity"""
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        if self.refresh():
+            self._maybe_train()
+        with self._lock:
+            if self._size == 0:
+                return []
+            if self._centroids is None:
+                rows = None
+                scores = self._vectors[:self._size] @ query
+            else:
+                probes = _top_k(self._centroids @ query, min(self.nprobe, len(self._centroids)))
+                rows = np.concatenate([self._lists[p] for p in probes])
+                scores = self._vectors[rows] @ query
+            best = _top_k(scores, k)
+            return [
+                {**self._metadata[rows[i] if rows is not None else i], 'similarity': round(float(scores[i]), 4)}
+                for i in best
+            ]
+
+    def stats(self) -> Dict[str, Any]:
+        self.refresh()
+        with self._lock:
+            return {
+                'size': self._size,
+                'labels': dict(self._label_counts),
+                'mode': 'ivf' if self._centroids is not None else 'exact',
+                'nlist': len(self._centroids) if self._centroids is not None else None,
+                'nprobe': self.nprobe,
+                'training': self._training,
+                'persisted': bool(self.path),
+            }
@@ -0,0 +1,384 @@
+"""
+Detection Backend Benchmark
+Generates reproducible synthetic images and audio of several sizes, drives /detect-image,
+/detect-audio and the webhook's /detect-file at configurable concurrency and writes latency
+percentiles, throughput and peak RSS as JSON so runs can be compared.
+
+Each scenario's client runs in a fresh interpreter, so its peak RSS belongs to that scenario
+alone. Server memory is sampled for the given PID plus all its descendants (gunicorn workers,
+inference pool processes): ``server`` sums their RSS, which counts pages shared copy-on-write
+once per process, and ``server_pss`` sums their proportional set size, which does not.
+
+By default every request is a distinct upload and asks /detect-image to skip the near-duplicate
+index (``?near_duplicates=false``), so image scenarios measure inference rather than cache or
+hash lookups. The webhook does not forward that flag, so if the backend runs with
+NEAR_DUPLICATE_ENABLED=true the detect-file-image target can be answered from the index.
+Responses answered from the result cache or the near-duplicate index are counted as
+``reused`` in each scenario.
+
+Usage:
+    python benchmarks/detection_benchmark.py --targets image,audio --concurrency 1,4,16 \\
+        --requests 200 --server-pid $(pgrep -f backend/main.py) --output results.json
+    python benchmarks/detection_benchmark.py --compare baseline.json results.json
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+IMAGE_SIZES = {"small": 224, "medium": 1024, "large": 3000}
+AUDIO_SECONDS = {"short": 2.0, "medium": 10.0, "long": 60.0}
+AUDIO_SAMPLE_RATE = 16000
+
+TARGETS = {
+    # name: (base URL option, path, media kind)
+    "image": ("backend_url", "/detect-image", "image"),
+    "audio": ("backend_url", "/detect-audio", "audio"),
+    "detect-file-image": ("webhook_url", "/detect-file", "image"),
+    "detect-file-audio": ("webhook_url", "/detect-file", "audio"),
+}
+
+
+# ---------------------------------------------------------------- workloads
+
+def make_image(side: int, rng: np.random.Generator) -> bytes:
+    """JPEG with smooth gradients plus noise, so decode cost resembles a real photo"""
+    from PIL import Image
+
+    y, x = np.mgrid[0:side, 0:side].astype(np.float32) / side
+    base = np.stack([x, y, 1.0 - x * y], axis=-1) * 200
+    noise = rng.normal(0, 20, size=(side, side, 3))
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buffer, format='JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def make_audio(seconds: float, rng: np.random.Generator) -> bytes:
+    """16-bit mono WAV: a voiced-like harmonic stack with vibrato plus background noise"""
+    import soundfile as sf
+
+    t = np.arange(int(seconds * AUDIO_SAMPLE_RATE)) / AUDIO_SAMPLE_RATE
+    f0 = 140 + 20 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(f0) / AUDIO_SAMPLE_RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 6)) * 0.2
+    signal += rng.normal(0, 0.01, size=t.shape)
+    buffer = io.BytesIO()
+    sf.write(buffer, signal.astype(np.float32), AUDIO_SAMPLE_RATE, format='WAV', subtype='PCM_16')
+    return buffer.getvalue()
+
+
+def build_workloads(kinds, seed: int) -> Dict[Tuple[str, str], bytes]:
+    """{(kind, size label): file bytes}, identical for identical seeds"""
+    rng = np.random.default_rng(seed)
+    workloads = {}
+    if "image" in kinds:
+        for label, side in IMAGE_SIZES.items():
+            workloads[("image", label)] = make_image(side, rng)
+    if "audio" in kinds:
+        for label, seconds in AUDIO_SECONDS.items():
+            workloads[("audio", label)] = make_audio(seconds, rng)
+    return workloads
+
+
+def unique_variant(data: bytes, kind: str, index: int) -> bytes:
+    """
+    A byte-level variant per request so the backend's exact-digest result cache misses.
+    JPEGs get a trailer after the end-of-image marker (ignored by decoders, so the pixels and
+    perceptual hashes are unchanged; see ``near_duplicates=false`` in ``send``); WAVs get
+    their last sample changed.
+    """
+    tag = index.to_bytes(4, 'little')
+    if kind == "image":
+        return data + tag
+    return data[:-4] + tag
+
+
+# ---------------------------------------------------------------- measurement
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, int(np.ceil(q / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def read_proc_mb(path: str, field: str) -> Optional[float]:
+    """A ``kB`` field of a /proc file (e.g. VmRSS in status, Pss in smaps_rollup) in MB"""
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        return None
+    return None
+
+
+def process_tree(pid: int) -> List[int]:
+    """``pid`` followed by all its live descendants"""
+    children: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; the parent PID is the second field after it
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+class RssSampler:
+    """
+    Polls the summed RSS and PSS of a process and its descendants in the background and keeps
+    the maxima; children are looked up on every sample, so restarted workers are followed
+    """
+
+    def __init__(self, pid: Optional[int], interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_mb: Optional[float] = None
+        self.peak_pss_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            pids = process_tree(self.pid)
+            rss = [read_proc_mb(f"/proc/{pid}/status", "VmRSS") for pid in pids]
+            pss = [read_proc_mb(f"/proc/{pid}/smaps_rollup", "Pss") for pid in pids]
+            if rss[0] is not None:
+                self.peak_mb = _max(self.peak_mb, sum(v for v in rss if v is not None))
+            if pss[0] is not None:
+                self.peak_pss_mb = _max(self.peak_pss_mb, sum(v for v in pss if v is not None))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.pid:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+_local = threading.local()
+
+
+def _session() -> requests.Session:
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = _local.session = requests.Session()
+    return session
+
+
+def was_reused(body: Dict[str, Any]) -> bool:
+    """True when the backend answered from the result cache or the near-duplicate index"""
+    # The webhook nests the backend's response under detection_result
+    result = body.get("detection_result") if isinstance(body.get("detection_result"), dict) else body
+    return bool(result.get("cached")) or "near_duplicate" in result
+
+
+def send(url: str, kind: str, data: bytes, timeout: float,
+         params: Optional[Dict[str, str]] = None) -> Tuple[float, bool, bool]:
+    extension, content_type = ("jpg", "image/jpeg") if kind == "image" else ("wav", "audio/wav")
+    start = time.perf_counter()
+    reused = False
+    try:
+        response = _session().post(url, files={'file': (f"bench.{extension}", data, content_type)},
+                                   params=params, timeout=timeout)
+        body = response.json()
+        ok = response.status_code < 400 and 'error' not in body
+        reused = ok and was_reused(body)
+    except (requests.RequestException, ValueError):
+        ok = False
+    return time.perf_counter() - start, ok, reused
+
+
+def run_scenario(url: str, kind: str, data: bytes, concurrency: int, total: int, warmup: int,
+                 timeout: float, unique: bool, server_pid: Optional[int], offset: int) -> Dict[str, Any]:
+    payloads = [unique_variant(data, kind, offset + i) if unique else data for i in range(warmup + total)]
+    # Distinct bytes still share pixels, so image requests also opt out of near-duplicate answers
+    params = {"near_duplicates": "false"} if unique and kind == "image" else None
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda p: send(url, kind, p, timeout, params), payloads[:warmup]))
+
+        with RssSampler(server_pid) as sampler:
+            start = time.perf_counter()
+            results = list(pool.map(lambda p: send(url, kind, p, timeout, params), payloads[warmup:]))
+            elapsed = time.perf_counter() - start
+
+    latencies = sorted(seconds * 1000 for seconds, ok, _ in results if ok)
+    errors = sum(1 for _, ok, _ in results if not ok)
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "reused": sum(1 for _, _, reused in results if reused),
+        "payload_bytes": len(data),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {
+            "p50": _round(percentile(latencies, 50)),
+            "p95": _round(percentile(latencies, 95)),
+            "p99": _round(percentile(latencies, 99)),
+            "mean": _round(float(np.mean(latencies)) if latencies else None),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+        "peak_rss_mb": {
+            "server": _round(sampler.peak_mb),
+            "server_pss": _round(sampler.peak_pss_mb),
+            # This process ran only this scenario (see run_scenario_isolated); ru_maxrss is in KiB on Linux
+            "client": _round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0),
+        },
+    }
+
+
+def run_scenario_isolated(*args) -> Dict[str, Any]:
+    """``run_scenario`` in a freshly spawned interpreter, so ru_maxrss covers this scenario only"""
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(run_scenario, *args).result()
+
+
+def _round(value):
+    return round(value, 2) if value is not None else None
+
+
+def _max(current, value):
+    return value if current is None else max(current, value)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# ---------------------------------------------------------------- reporting
+
+def compare(baseline_path: str, candidate_path: str):
+    """Print p50/p95/p99 and throughput changes between two result files"""
+    with open(baseline_path) as f:
+        baseline = {_key(s): s for s in json.load(f)["scenarios"]}
+    with open(candidate_path) as f:
+        candidate = json.load(f)["scenarios"]
+
+    for scenario in candidate:
+        before = baseline.get(_key(scenario))
+        if before is None:
+            continue
+        parts = []
+        for metric in ("p50", "p95", "p99"):
+            old, new = before["latency_ms"][metric], scenario["latency_ms"][metric]
+            if old and new is not None:
+                parts.append(f"{metric} {new:.1f}ms ({(new - old) / old:+.1%})")
+        old_rps, new_rps = before["throughput_rps"], scenario["throughput_rps"]
+        if old_rps and new_rps is not None:
+            parts.append(f"rps {new_rps:.1f} ({(new_rps - old_rps) / old_rps:+.1%})")
+        print(f"{scenario['target']:<18} {scenario['size']:<7} c={scenario['concurrency']:<3} " + ", ".join(parts))
+
+
+def _key(scenario):
+    return scenario["target"], scenario["size"], scenario["concurrency"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the deepfake detection endpoints")
+    parser.add_argument("--backend-url", default=os.getenv("BACKEND_URL", "http://127.0.0.1:8080"))
+    parser.add_argument("--webhook-url", default=os.getenv("WEBHOOK_URL", "http://127.0.0.1:8081"))
+    parser.add_argument("--targets", default="image,audio",
+                        help=f"Comma-separated subset of: {', '.join(TARGETS)}")
+    parser.add_argument("--sizes", default=None,
+                        help="Comma-separated size labels (small/medium/large, short/medium/long); default all")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per scenario")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests before each scenario")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--allow-cache", action="store_true",
+                        help="Send identical bytes every time and allow near-duplicate answers (measures cache hits)")
+    parser.add_argument("--server-pid", type=int, default=None, help="Backend PID for peak RSS sampling (its child processes are included)")
+    parser.add_argument("--output", default=None, help="Write the JSON report here (default: stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"),
+                        help="Compare two result files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"unknown targets: {', '.join(unknown)}")
+    sizes = set(args.sizes.split(",")) if args.sizes else None
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    workloads = build_workloads({TARGETS[t][2] for t in targets}, args.seed)
+    scenarios = []
+    offset = 0
+    for target in targets:
+        url_option, path, kind = TARGETS[target]
+        url = getattr(args, url_option).rstrip("/") + path
+        for (workload_kind, size), data in workloads.items():
+            if workload_kind != kind or (sizes and size not in sizes):
+                continue
+            for concurrency in levels:
+                result = run_scenario_isolated(url, kind, data, concurrency, args.requests, args.warmup,
+                                               args.timeout, not args.allow_cache, args.server_pid, offset)
+                offset += args.requests + args.warmup
+                scenarios.append({"target": target, "size": size, **result})
+                latency = result["latency_ms"]
+                print(f"{target:<18} {size:<7} c={concurrency:<3} p50={latency['p50']}ms "
+                      f"p95={latency['p95']}ms p99={latency['p99']}ms rps={result['throughput_rps']} "
+                      f"errors={result['errors']} reused={result['reused']}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "cache_busting": not args.allow_cache,
+        },
+        "scenarios": scenarios,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,16 @@ Cost-optimized version without Cloud Run webhook dependency
 """
 from flask import Flask, render_template, request, jsonify
 import os
+import sys
 import json
 from datetime import datetime
 import random
 
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ingestion import IngestionError, ingest_message_request
+
 app = Flask(__name__)
 
 class LocalADKAgent:
@@ -138,28 +144,34 @@ def index():
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """Chat API endpoint"""
-    data = request.json
+    """Chat API endpoint (multipart form from the web UI, raw body, or legacy base64 JSON)"""
+    try:
+        # Attachments stream into a bounded buffer instead of being decoded from JSON
+        data, upload = ingest_message_request(request)
+    except IngestionError as e:
+        return jsonify({"error": str(e)}), e.status_code
     message = data.get('message', '')
-    session_id = data.get('session_id', f"local-session-{datetime.now().strftime('%Y%m%d%H%M%S')}")
+    session_id = data.get('session_id') or f"local-session-{datetime.now().strftime('%Y%m%d%H%M%S')}"
     
-    file_data = data.get('file_data')
-    filename = data.get('filename')
-    
-    result = agent.send_message(message, session_id, file_data, filename)
+    if upload is None:
+        return jsonify(agent.send_message(message, session_id))
+    with upload:
+        result = agent.send_message(message, session_id, upload, upload.filename)
     return jsonify(result)
 
 @app.route('/api/detect', methods=['POST'])
 def detect_file():
     """File detection API endpoint"""
-    data = request.json
-    file_data = data.get('file_data')
-    filename = data.get('filename')
+    try:
+        _, upload = ingest_message_request(request)
+    except IngestionError as e:
+        return jsonify({"error": str(e)}), e.status_code
     
-    if not file_data or not filename:
-        return jsonify({"error": "File data and filename required"})
+    if upload is None:
+        return jsonify({"error": "File and filename required"})
     
-    result = agent.detect_file_direct(file_data, filename)
+    with upload:
+        result = agent.detect_file_direct(upload, upload.filename)
     return jsonify(result)
 
 @app.route('/api/health')
@@ -309,33 +321,23 @@ def create_template():
             }
             addMessage(displayMessage, true);
             
-            const payload = {
-                message: message || 'Analyze this file',
-                session_id: sessionId
-            };
-            
+            // Multipart upload: the browser sends the file as binary, no base64 or JSON encoding
+            const formData = new FormData();
+            formData.append('message', message || 'Analyze this file');
+            formData.append('session_id', sessionId);
             if (fileInput.files[0]) {
-                const file = fileInput.files[0];
-                const reader = new FileReader();
-                reader.onload = function(e) {
-                    payload.file_data = e.target.result.split(',')[1];
-                    payload.filename = file.name;
-                    sendToAgent(payload);
-                };
-                reader.readAsDataURL(file);
-            } else {
-                sendToAgent(payload);
+                formData.append('file', fileInput.files[0]);
             }
+            sendToAgent(formData);
             
             messageInput.value = '';
             fileInput.value = '';
         }
         
-        function sendToAgent(payload) {
+        function sendToAgent(formData) {
             fetch('/api/chat', {
                 method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify(payload)
+                body: formData
             })
             .then(response => response.json())
             .then(data => {
@@ -377,58 +379,51 @@ def create_template():
             const file = fileInput.files[0];
             resultEl.innerHTML = '<div class="result">🔍 Analyzing file...</div>';
             
-            const reader = new FileReader();
-            reader.onload = function(e) {
-                const payload = {
-                    file_data: e.target.result.split(',')[1],
-                    filename: file.name
-                };
-                
-                fetch('/api/detect', {
-                    method: 'POST',
-                    headers: { 'Content-Type': 'application/json' },
-                    body: JSON.stringify(payload)
-                })
-                .then(response => response.json())
-                .then(data => {
-                    if (data.error) {
-                        resultEl.innerHTML = `<div class="result error">❌ Error: ${data.error}</div>`;
-                    } else {
-                        const detection = data.detection_result || data;
-                        const detectionType = detection.result || detection.detection_type || 'Unknown';
-                        const confidence = detection.confidence || data.confidence || 0;
-                        const explanation = data.response || detection.explanation || 'Analysis completed';
-                        
-                        let typeDisplay = detectionType;
-                        let typeClass = '';
-                        if (detectionType.toLowerCase().includes('real') || detectionType.toLowerCase().includes('authentic')) {
-                            typeDisplay = '✅ Real/Authentic';
-                            typeClass = 'real';
-                        } else if (detectionType.toLowerCase().includes('fake') || detectionType.toLowerCase().includes('synthetic')) {
-                            typeDisplay = '🚨 Fake/Synthetic';
-                            typeClass = 'fake';
-                        } else if (detectionType !== 'Unknown') {
-                            typeDisplay = `🔍 ${detectionType}`;
-                        }
-                        
-                        resultEl.innerHTML = `
-                            <div class="result ${typeClass}">
-                                <h3>📊 Detection Results</h3>
-                                <p><strong>File:</strong> ${file.name}</p>
-                                <p><strong>Result:</strong> ${typeDisplay}</p>
-                                <p><strong>Confidence:</strong> ${(confidence * 100).toFixed(1)}%</p>
-                                <p><strong>Analysis:</strong> ${explanation}</p>
-                                ${data.intent ? `<p><small>📍 Intent: ${data.intent}</small></p>` : ''}
-                                <p><small>💻 Processed locally - no cloud charges</small></p>
-                            </div>
-                        `;
+            const formData = new FormData();
+            formData.append('file', file);
+            
+            fetch('/api/detect', {
+                method: 'POST',
+                body: formData
+            })
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    resultEl.innerHTML = `<div class="result error">❌ Error: ${data.error}</div>`;
+                } else {
+                    const detection = data.detection_result || data;
+                    const detectionType = detection.result || detection.detection_type || 'Unknown';
+                    const confidence = detection.confidence || data.confidence || 0;
+                    const explanation = data.response || detection.explanation || 'Analysis completed';
+                    
+                    let typeDisplay = detectionType;
+                    let typeClass = '';
+                    if (detectionType.toLowerCase().includes('real') || detectionType.toLowerCase().includes('authentic')) {
+                        typeDisplay = '✅ Real/Authentic';
+                        typeClass = 'real';
+                    } else if (detectionType.toLowerCase().includes('fake') || detectionType.toLowerCase().includes('synthetic')) {
+                        typeDisplay = '🚨 Fake/Synthetic';
+                        typeClass = 'fake';
+                    } else if (detectionType !== 'Unknown') {
+                        typeDisplay = `🔍 ${detectionType}`;
                     }
-                })
-                .catch(error => {
-                    resultEl.innerHTML = `<div class="result error">❌ Connection error: ${error}</div>`;
-                });
-            };
-            reader.readAsDataURL(file);
+                    
+                    resultEl.innerHTML = `
+                        <div class="result ${typeClass}">
+                            <h3>📊 Detection Results</h3>
+                            <p><strong>File:</strong> ${file.name}</p>
+                            <p><strong>Result:</strong> ${typeDisplay}</p>
+                            <p><strong>Confidence:</strong> ${(confidence * 100).toFixed(1)}%</p>
+                            <p><strong>Analysis:</strong> ${explanation}</p>
+                            ${data.intent ? `<p><small>📍 Intent: ${data.intent}</small></p>` : ''}
+                            <p><small>💻 Processed locally - no cloud charges</small></p>
+                        </div>
+                    `;
+                }
+            })
+            .catch(error => {
+                resultEl.innerHTML = `<div class="result error">❌ Connection error: ${error}</div>`;
+            });
         }
     </script>
 </body>
@@ -2,17 +2,24 @@
 Standalone Google ADK (Dialogflow CX) Terminal Interface
 Run the deepfake detection agent directly from command line
 """
-import requests
 import json
+import mimetypes
 import os
-import base64
+import sys
 from datetime import datetime
+from urllib.parse import quote
+
+# Add project root to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google_agent.http_client import get_client
 
 class DialogflowTerminalAgent:
     def __init__(self):
         self.webhook_url = "https://deepfake-detection-webhook-31255625957.us-central1.run.app"
         self.session_id = f"terminal-session-{datetime.now().strftime('%Y%m%d%H%M%S')}"
         self.conversation_history = []
+        self.http = get_client()  # Keeps the TLS connection to Cloud Run alive between calls
         
     def send_message(self, message, file_path=None):
         """Send message to the agent"""
@@ -22,32 +29,42 @@ class DialogflowTerminalAgent:
             "session_id": self.session_id
         }
         
-        # Handle file upload
-        if file_path and os.path.exists(file_path):
+        # Attachments are streamed from disk as the raw request body, with the message and
+        # session in headers, instead of being base64-encoded into JSON
+        upload = None
+        file_ext = os.path.splitext(file_path)[1].lower() if file_path else ''
+        if file_path and os.path.exists(file_path) and file_ext not in ['.jpg', '.jpeg', '.png', '.wav', '.mp3', '.flac']:
+            # As before, unsupported files are left off and the message is sent on its own
+            print(f"⚠️ Unsupported file type {file_ext}, sending the message without it")
+        elif file_path and os.path.exists(file_path):
             try:
-                with open(file_path, 'rb') as f:
-                    file_content = base64.b64encode(f.read()).decode()
-                
-                file_ext = os.path.splitext(file_path)[1].lower()
-                if file_ext in ['.jpg', '.jpeg', '.png']:
-                    payload['image_data'] = file_content
-                    payload['image_filename'] = os.path.basename(file_path)
-                elif file_ext in ['.wav', '.mp3', '.flac']:
-                    payload['audio_data'] = file_content
-                    payload['audio_filename'] = os.path.basename(file_path)
-                    
-                print(f"📎 Attached file: {os.path.basename(file_path)}")
-            except Exception as e:
+                upload = open(file_path, 'rb')
+            except OSError as e:
                 print(f"❌ Error reading file: {e}")
                 return None
+            print(f"📎 Attached file: {os.path.basename(file_path)}")
         
         try:
-            response = requests.post(
-                f"{self.webhook_url}/chat",
-                json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=30
-            )
+            if upload is not None:
+                with upload:
+                    response = self.http.post(
+                        f"{self.webhook_url}/chat",
+                        data=upload,
+                        headers={
+                            "Content-Type": mimetypes.guess_type(file_path)[0] or "application/octet-stream",
+                            "X-Filename": quote(os.path.basename(file_path)),
+                            "X-Message": quote(message),
+                            "X-Session-Id": quote(self.session_id)
+                        },
+                        deadline=60
+                    )
+            else:
+                response = self.http.post(
+                    f"{self.webhook_url}/chat",
+                    json=payload,
+                    headers={"Content-Type": "application/json"},
+                    deadline=30
+                )
             
             if response.status_code == 200:
                 result = response.json()
@@ -77,10 +94,11 @@ class DialogflowTerminalAgent:
             with open(file_path, 'rb') as f:
                 files = {'file': (os.path.basename(file_path), f)}
                 
-                response = requests.post(
+                response = self.http.post(
                     f"{self.webhook_url}/detect-file",
                     files=files,
-                    timeout=60
+                    deadline=60,
+                    retry=True
                 )
                 
                 if response.status_code == 200:
@@ -24,6 +24,12 @@ except ImportError:
 import requests
 from urllib.parse import urljoin
 
+from google_agent.http_client import get_client
+from google_agent.session_store import (
+    SESSION_MAX_COMPACTED, SESSION_MAX_MESSAGES, append_messages, create_session_store_from_env, new_session
+)
+from backend.metrics import record_mock_fallback, record_result, stage
+
 @dataclass
 class DialogflowConfig:
     """Configuration for Dialogflow CX Agent"""
@@ -39,9 +45,13 @@ class DialogflowDeepfakeAgent:
     Handles conversation flow and integrates with our backend API.
     """
     
-    def __init__(self, config: DialogflowConfig, backend_url: str = "http://127.0.0.1:8080"):
+    def __init__(self, config: DialogflowConfig, backend_url: str = "http://127.0.0.1:8080",
+                 async_min_bytes: int = int(os.getenv('DETECTION_ASYNC_MIN_BYTES', 8 * 1024 * 1024))):
         self.config = config
         self.backend_url = backend_url
+        # Files at least this large go to the backend job queue instead of a synchronous call
+        self.async_min_bytes = async_min_bytes
+        self.http = get_client()  # Pooled keep-alive connections with retries
         
         # Initialize Dialogflow client with better error handling
         self.session_client = None
@@ -93,7 +103,8 @@ class DialogflowDeepfakeAgent:
                 query_input=query_input
             )
             
-            response = self.session_client.detect_intent(request=request)
+            with stage('dialogflow'):
+                response = self.session_client.detect_intent(request=request)
             
             return {
                 "response_text": response.query_result.response_messages[0].text.text[0] 
@@ -112,8 +123,30 @@ class DialogflowDeepfakeAgent:
         """
         Process file upload and integrate with deepfake detection backend
         """
+        with open(file_path, 'rb') as file:
+            return self.detect_intent_with_upload(session_id, file, os.path.basename(file_path), file_type)
+    
+    def detect_intent_with_upload(self, session_id: str, stream, filename: str, file_type: str) -> Dict[str, Any]:
+        """
+        Same as detect_intent_with_file for an open, seekable binary stream (e.g. an ingested
+        upload), which is streamed to the backend without a temp-file copy
+        """
         # First, call our backend to analyze the file
-        detection_result = self._call_detection_backend(file_path, file_type)
+        with stage('backend_detection'):
+            detection_result = self._call_detection_backend(stream, filename, file_type)
+        record_result(detection_result.get("result", "error"))
+        
+        if detection_result.get("result") == "queued":
+            # Reply right away; the verdict is fetched later from the job's status URL
+            return {
+                "response_text": detection_result["explanation"],
+                "intent": "analysis_queued",
+                "confidence": 1.0,
+                "session_id": session_id,
+                "detection_result": detection_result,
+                "file_analyzed": False,
+                "file_type": file_type
+            }
         
         # Create appropriate text for Dialogflow based on detection result
         if detection_result["type"] == "image":
@@ -132,7 +165,7 @@ class DialogflowDeepfakeAgent:
             "file_type": file_type
         }
     
-    def _call_detection_backend(self, file_path: str, file_type: str) -> Dict[str, Any]:
+    def _call_detection_backend(self, stream, filename: str, file_type: str) -> Dict[str, Any]:
         """
         Call our Flask backend for deepfake detection
         """
@@ -145,27 +178,63 @@ class DialogflowDeepfakeAgent:
             else:
                 return {"error": "Unsupported file type", "type": "unknown"}
             
+            size = _stream_size(stream)
+            if size is not None and size >= self.async_min_bytes:
+                # Too slow for a webhook reply: queue it and return the job instead of waiting
+                return self._submit_detection_job(stream, filename, file_type)
+            
             url = urljoin(self.backend_url, endpoint)
             
-            with open(file_path, 'rb') as file:
-                files = {'file': (os.path.basename(file_path), file, file_type)}
-                response = requests.post(url, files=files, timeout=30)
-                response.raise_for_status()
-                return response.json()
+            files = {'file': (filename, stream, file_type)}
+            # Detection has no side effects beyond the result cache, so resending is safe
+            response = self.http.post(url, files=files, deadline=30, retry=True)
+            response.raise_for_status()
+            return response.json()
                 
         except requests.RequestException as e:
             print(f"Backend API error: {e}")
             # Return enhanced mock detection results
-            return self._mock_detection_result(file_path, file_type)
+            return self._mock_detection_result(filename, file_type)
     
-    def _mock_detection_result(self, file_path: str, file_type: str) -> Dict[str, Any]:
+    def _submit_detection_job(self, stream, filename: str, file_type: str) -> Dict[str, Any]:
+        """
+        Queue a file on the backend job queue and return a 'queued' result pointing at the job;
+        the webhook never waits for the job itself
+        """
+        kind = file_type.split("/")[0]
+        files = {'file': (filename, stream, file_type)}
+        # Not retried: a resent submission would queue the same file twice
+        response = self.http.post(urljoin(self.backend_url, "/jobs"), files=files,
+                                  data={'type': kind}, deadline=30)
+        response.raise_for_status()
+        job = response.json()
+        status_url = urljoin(self.backend_url, job["status_url"])
+        return {
+            "type": kind,
+            "result": "queued",
+            "confidence": 0.0,
+            "job_id": job["job_id"],
+            "status_url": status_url,
+            "explanation": f"This {kind} file is large, so it was queued for analysis as job "
+                           f"{job['job_id']}. Check {status_url} for the result.",
+            "filename": filename
+        }
+    
+    def get_detection_job(self, job_id: str) -> Dict[str, Any]:
+        """One status check of a queued detection job (status, and result once done)"""
+        response = self.http.get(urljoin(self.backend_url, f"/jobs/{job_id}"), deadline=10)
+        response.raise_for_status()
+        return response.json()
+    
+    def _mock_detection_result(self, filename: str, file_type: str) -> Dict[str, Any]:
         """
         Provide enhanced mock detection results based on file analysis
         """
+        record_mock_fallback('detection')
         import random
         import os
         
-        filename = os.path.basename(file_path).lower()
+        filename = os.path.basename(filename).lower()
         
         # Analyze filename for hints
         is_likely_synthetic = any(word in filename for word in [
@@ -211,6 +280,7 @@ class DialogflowDeepfakeAgent:
         """
         Provide mock responses when Dialogflow is not available
         """
+        record_mock_fallback('text')
         text_lower = text_input.lower()
         
         if any(word in text_lower for word in ["hello", "hi", "hey"]):
@@ -311,35 +381,51 @@ class DialogflowDeepfakeAgent:
                 }
             }
 
+def _stream_size(stream) -> Optional[int]:
+    """Bytes left in a seekable stream, without moving its position; None if it cannot seek"""
+    try:
+        position = stream.tell()
+        size = stream.seek(0, os.SEEK_END) - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
 class ConversationManager:
     """
     Manages conversation sessions and integrates Dialogflow CX with our backend
     """
     
-    def __init__(self, dialogflow_agent: DialogflowDeepfakeAgent):
+    def __init__(self, dialogflow_agent: DialogflowDeepfakeAgent, store=None,
+                 max_messages: int = SESSION_MAX_MESSAGES, max_compacted: int = SESSION_MAX_COMPACTED):
         self.agent = dialogflow_agent
-        self.sessions = {}  # Track active sessions
+        # Bounded by TTL and LRU eviction, so long-running processes keep flat memory
+        self.sessions = store if store is not None else create_session_store_from_env()
+        self.max_messages = max_messages
+        self.max_compacted = max_compacted
     
     def start_conversation(self, user_id: str) -> str:
         """Start a new conversation session"""
-        session_id = f"session-{user_id}-{len(self.sessions)}"
-        self.sessions[session_id] = {
-            "user_id": user_id,
-            "messages": [],
-            "created_at": "2025-07-25T00:00:00Z"
-        }
-        return session_id
+        session = new_session(user_id)
+        self.sessions.put(session["session_id"], session)
+        return session["session_id"]
+    
+    def _record(self, session_id: str, messages: List[Dict[str, Any]]):
+        """Append messages to a live session's history (expired sessions are not revived)"""
+        self.sessions.update(
+            session_id,
+            lambda session: append_messages(session, messages, self.max_messages, self.max_compacted)
+        )
     
     def send_message(self, session_id: str, message: str) -> Dict[str, Any]:
         """Send a text message to the agent"""
         response = self.agent.detect_intent_text(session_id, message)
         
         # Store in session history
-        if session_id in self.sessions:
-            self.sessions[session_id]["messages"].extend([
-                {"role": "user", "content": message},
-                {"role": "assistant", "content": response["response_text"]}
-            ])
+        self._record(session_id, [
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": response["response_text"]}
+        ])
         
         return response
     
@@ -348,17 +434,25 @@ class ConversationManager:
         response = self.agent.detect_intent_with_file(session_id, file_path, file_type)
         
         # Store in session history
-        if session_id in self.sessions:
-            self.sessions[session_id]["messages"].extend([
-                {"role": "user", "content": f"[uploaded {file_type} file: {os.path.basename(file_path)}]"},
-                {"role": "assistant", "content": response["response_text"], "detection": response.get("detection_result")}
-            ])
+        self._record(session_id, [
+            {"role": "user", "content": f"[uploaded {file_type} file: {os.path.basename(file_path)}]"},
+            {"role": "assistant", "content": response["response_text"], "detection": response.get("detection_result")}
+        ])
         
         return response
     
-    def get_session_history(self, session_id: str) -> List[Dict[str, Any]]:
-        """Get conversation history for a session"""
-        return self.sessions.get(session_id, {}).get("messages", [])
+    def get_session_history(self, session_id: str, include_compacted: bool = False) -> List[Dict[str, Any]]:
+        """Get conversation history for a session (recent messages; older compacted ones on request)"""
+        session = self.sessions.get(session_id)
+        if session is None:
+            return []
+        if include_compacted:
+            return session["compacted"] + session["messages"]
+        return session["messages"]
+    
+    def end_conversation(self, session_id: str):
+        """Drop a session before its TTL runs out"""
+        self.sessions.delete(session_id)
 
 # Example usage and configuration
 def create_example_config() -> DialogflowConfig:
@@ -0,0 +1,175 @@
+"""
+Shared HTTP Client for Detection Backend Calls
+Pooled keep-alive sessions with bounded, jittered exponential-backoff retries and per-call deadlines.
+"""
+
+import os
+import random
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# Safe to resend after a timeout or 5xx: the first attempt may have been processed
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE", "TRACE"})
+BODY_CHUNK_SIZE = 64 * 1024
+
+
+class HTTPClient:
+    """
+    Thin wrapper around a pooled ``requests.Session``.
+
+    Retries connection errors, timeouts and ``retry_statuses`` with full-jitter exponential
+    backoff, for idempotent methods only unless the caller passes ``retry=True``. ``deadline``
+    bounds the whole call (all attempts, backoff sleeps and reading the body), so a caller with
+    a 30 s budget never waits longer than that even when retries kick in.
+
+    Args:
+        pool_connections (int): Number of host pools kept alive.
+        pool_maxsize (int): Connections kept per host.
+        max_retries (int): Retries after the first attempt.
+        backoff_factor (float): Base backoff in seconds; attempt n sleeps up to factor * 2**n.
+        max_backoff (float): Cap on a single backoff sleep.
+        timeout (float): Default per-call deadline when the caller does not pass one.
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 20, max_retries: int = 3,
+                 backoff_factor: float = 0.3, max_backoff: float = 10.0, timeout: float = 30.0,
+                 retry_statuses: Iterable[int] = RETRY_STATUSES):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.retry_statuses = frozenset(retry_statuses)
+
+        self.session = requests.Session()
+        # Retries are handled below so they count against the caller's deadline
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    @staticmethod
+    def _file_positions(files, data=None) -> Dict[Any, int]:
+        """Remember where each uploaded file object (multipart or raw body) starts so a retry can resend it"""
+        positions = {}
+        entries = []
+        if files:
+            entries = files.values() if isinstance(files, dict) else [value for _, value in files]
+        for entry in list(entries) + [data]:
+            file_obj = entry[1] if isinstance(entry, (tuple, list)) else entry
+            if hasattr(file_obj, "seek") and hasattr(file_obj, "tell"):
+                positions[file_obj] = file_obj.tell()
+        return positions
+
+    @staticmethod
+    def _cut(sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def _read_body(self, response: requests.Response, expires: float, budget: float, method: str, url: str):
+        """Read the whole body before ``expires``, so a slowly trickling response cannot outlive the deadline"""
+        # requests' timeout bounds each socket read, not the whole body: cut the connection at the deadline
+        sock = getattr(getattr(response.raw, "connection", None), "sock", None)
+        watchdog = threading.Timer(max(0.0, expires - time.monotonic()), self._cut, (sock,)) if sock else None
+        try:
+            if watchdog is not None:
+                watchdog.daemon = True
+                watchdog.start()
+            content = b"".join(response.iter_content(BODY_CHUNK_SIZE))
+        except requests.RequestException as e:
+            response.close()
+            if time.monotonic() >= expires and not isinstance(e, requests.Timeout):
+                raise requests.Timeout(f"Deadline of {budget:.1f}s exceeded reading {method} {url}") from e
+            raise
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        if time.monotonic() > expires:
+            response.close()
+            raise requests.Timeout(f"Deadline of {budget:.1f}s exceeded reading {method} {url}")
+        response._content = content
+        # Fully read: hand the connection back to the pool
+        response.close()
+
+    def request(self, method: str, url: str, deadline: Optional[float] = None,
+                retry: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying transient failures until ``deadline`` seconds have passed.
+
+        Only idempotent methods are retried by default: a POST that timed out or got a 502 may
+        still have been processed (a duplicate job, say). Pass ``retry=True`` for side-effect-free
+        POSTs such as detections. Connect timeouts are always retried, as nothing was sent.
+        With ``stream=True`` the deadline covers getting the response, not reading its body.
+
+        Raises the last ``requests`` exception if every attempt fails; a response with a
+        retryable status is returned as-is once retries or time run out.
+        """
+        budget = deadline if deadline is not None else kwargs.pop("timeout", None) or self.timeout
+        kwargs.pop("timeout", None)
+        stream = kwargs.pop("stream", False)
+        retry = method.upper() in IDEMPOTENT_METHODS if retry is None else retry
+        expires = time.monotonic() + budget
+        positions = self._file_positions(kwargs.get("files"), kwargs.get("data"))
+
+        attempt = 0
+        while True:
+            remaining = expires - time.monotonic()
+            if remaining <= 0:
+                raise requests.Timeout(f"Deadline of {budget:.1f}s exceeded for {method} {url}")
+            for file_obj, position in positions.items():
+                file_obj.seek(position)
+
+            try:
+                response = self.session.request(method, url, timeout=remaining, stream=True, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retryable = retry or isinstance(e, requests.ConnectTimeout)
+                if not retryable or attempt >= self.max_retries or expires - time.monotonic() <= 0:
+                    raise
+            else:
+                if not retry or response.status_code not in self.retry_statuses or attempt >= self.max_retries:
+                    if not stream:
+                        self._read_body(response, expires, budget, method, url)
+                    return response
+                response.close()
+
+            sleep = min(self._backoff(attempt), max(0.0, expires - time.monotonic()))
+            time.sleep(sleep)
+            attempt += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+_client: Optional[HTTPClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HTTPClient:
+    """Process-wide client configured from HTTP_POOL_* / HTTP_MAX_RETRIES / HTTP_BACKOFF_FACTOR"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HTTPClient(
+                    pool_connections=int(os.getenv("HTTP_POOL_CONNECTIONS", 10)),
+                    pool_maxsize=int(os.getenv("HTTP_POOL_MAXSIZE", 20)),
+                    max_retries=int(os.getenv("HTTP_MAX_RETRIES", 3)),
+                    backoff_factor=float(os.getenv("HTTP_BACKOFF_FACTOR", 0.3)),
+                    timeout=float(os.getenv("HTTP_TIMEOUT", 30)),
+                )
+    return _client
@@ -0,0 +1,328 @@
+"""
+Conversation Session Store
+Bounded session storage for ConversationManager: idle sessions expire after a TTL, the least
+recently used are evicted beyond a size cap, and each session keeps only its latest messages
+in full, with older ones compacted into a fixed-size ring buffer. Backends: in-memory, SQLite,
+or any client speaking the small Redis subset used here (``LocalRedis`` for local runs).
+"""
+
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", 3600))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", 10000))
+# Messages kept verbatim per session; older ones are compacted
+SESSION_MAX_MESSAGES = int(os.getenv("SESSION_MAX_MESSAGES", 50))
+# Compacted messages kept per session (a ring buffer: the oldest drop off)
+SESSION_MAX_COMPACTED = int(os.getenv("SESSION_MAX_COMPACTED", 200))
+COMPACTED_CONTENT_CHARS = 160
+
+
+def new_session(user_id: str) -> Dict[str, Any]:
+    """A fresh session record with a collision-free id"""
+    return {
+        "session_id": f"session-{user_id}-{uuid.uuid4().hex}",
+        "user_id": user_id,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "messages": [],
+        "compacted": [],
+        "total_messages": 0,
+    }
+
+
+def compact_message(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Role, shortened content and the detection verdict (if any) of one message"""
+    content = str(message.get("content", ""))
+    if len(content) > COMPACTED_CONTENT_CHARS:
+        content = content[:COMPACTED_CONTENT_CHARS] + "..."
+    entry = {"role": message.get("role"), "content": content}
+    detection = message.get("detection")
+    if isinstance(detection, dict) and detection.get("result") is not None:
+        entry["result"] = detection["result"]
+    return entry
+
+
+def append_messages(session: Dict[str, Any], messages: List[Dict[str, Any]],
+                    max_messages: int = SESSION_MAX_MESSAGES,
+                    max_compacted: int = SESSION_MAX_COMPACTED) -> Dict[str, Any]:
+    """Append messages in place, compacting whatever falls outside the last ``max_messages``"""
+    session["messages"].extend(messages)
+    session["total_messages"] = session.get("total_messages", 0) + len(messages)
+    overflow = len(session["messages"]) - max_messages
+    if overflow > 0:
+        session["compacted"].extend(compact_message(m) for m in session["messages"][:overflow])
+        del session["messages"][:overflow]
+        excess = len(session["compacted"]) - max_compacted
+        if excess > 0:
+            del session["compacted"][:excess]
+    return session
+
+
+class _BaseSessionStore(ABC):
+    """get/put/delete plus an ``update`` that is atomic within this process"""
+
+    def __init__(self):
+        self._update_lock = threading.Lock()
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """The live session (refreshing its expiry), or None if it is unknown or expired"""
+
+    @abstractmethod
+    def put(self, session_id: str, session: Dict[str, Any]):
+        """Store a session, evicting expired and least recently used ones as needed"""
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        """Remove a session if present"""
+
+    def update(self, session_id: str, fn: Callable[[Dict[str, Any]], Any]) -> Optional[Dict[str, Any]]:
+        """Apply ``fn`` to a live session and store the result; None if the session is gone"""
+        with self._update_lock:
+            session = self.get(session_id)
+            if session is None:
+                return None
+            fn(session)
+            self.put(session_id, session)
+            return session
+
+    def __contains__(self, session_id: str) -> bool:
+        return self.get(session_id) is not None
+
+
+class MemorySessionStore(_BaseSessionStore):
+    """
+    In-process LRU with a sliding TTL.
+    Every access moves a session to the end and extends its expiry, so the dict is ordered
+    by expiry too and expired sessions are always found at the front.
+    """
+
+    def __init__(self, ttl_seconds: Optional[float] = SESSION_TTL_SECONDS,
+                 max_sessions: int = SESSION_MAX_SESSIONS):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds or None
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._expired = 0
+        self._evicted = 0
+
+    def _expiry(self, now: float) -> Optional[float]:
+        return now + self.ttl_seconds if self.ttl_seconds else None
+
+    def _purge(self, now: float):
+        # Caller holds self._lock
+        while self._sessions:
+            _, (_, expires_at) = next(iter(self._sessions.items()))
+            if expires_at is None or expires_at > now:
+                break
+            self._sessions.popitem(last=False)
+            self._expired += 1
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._purge(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            self._sessions[session_id] = (entry[0], self._expiry(now))
+            self._sessions.move_to_end(session_id)
+            return copy.deepcopy(entry[0])
+
+    def put(self, session_id: str, session: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._sessions[session_id] = (copy.deepcopy(session), self._expiry(now))
+            self._sessions.move_to_end(session_id)
+            self._purge(now)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._evicted += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            self._purge(time.time())
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"backend": "memory", "sessions": len(self._sessions), "capacity": self.max_sessions,
+                    "expired": self._expired, "evicted": self._evicted}
+
+
+class SQLiteSessionStore(_BaseSessionStore):
+    """Sessions as JSON rows with expiry and last-access columns; survives restarts"""
+
+    def __init__(self, path: str, ttl_seconds: Optional[float] = SESSION_TTL_SECONDS,
+                 max_sessions: int = SESSION_MAX_SESSIONS):
+        super().__init__()
+        self.ttl_seconds = ttl_seconds or None
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " data TEXT NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed_at)")
+
+    def _expiry(self, now: float) -> Optional[float]:
+        return now + self.ttl_seconds if self.ttl_seconds else None
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, expires_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            data, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                return None
+            self._conn.execute("UPDATE sessions SET expires_at = ?, accessed_at = ? WHERE id = ?",
+                               (self._expiry(now), now, session_id))
+        return json.loads(data)
+
+    def put(self, session_id: str, session: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, data, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (session_id, json.dumps(session), self._expiry(now), now),
+            )
+            self._conn.execute("DELETE FROM sessions WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            if count > self.max_sessions:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE id IN ("
+                    " SELECT id FROM sessions ORDER BY accessed_at LIMIT ?)",
+                    (count - self.max_sessions,),
+                )
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at IS NULL OR expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "sessions": len(self), "capacity": self.max_sessions}
+
+
+class RedisSessionStore(_BaseSessionStore):
+    """
+    Sessions as JSON strings in Redis (or ``LocalRedis``), using only GET, SET with EX,
+    EXPIRE and DELETE. Redis applies the TTL itself; configure ``maxmemory-policy volatile-lru``
+    on the server for the size bound.
+    """
+
+    def __init__(self, client, ttl_seconds: Optional[float] = SESSION_TTL_SECONDS, prefix: str = "session:"):
+        super().__init__()
+        self.client = client
+        self.ttl_seconds = int(ttl_seconds) if ttl_seconds else None
+        self.prefix = prefix
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        data = self.client.get(self.prefix + session_id)
+        if data is None:
+            return None
+        if self.ttl_seconds:
+            # Sliding expiry, like the other backends
+            self.client.expire(self.prefix + session_id, self.ttl_seconds)
+        return json.loads(data)
+
+    def put(self, session_id: str, session: Dict[str, Any]):
+        self.client.set(self.prefix + session_id, json.dumps(session), ex=self.ttl_seconds)
+
+    def delete(self, session_id: str):
+        self.client.delete(self.prefix + session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "ttl_seconds": self.ttl_seconds}
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the Redis commands RedisSessionStore uses (GET, SET EX, EXPIRE,
+    DELETE), with ``max_keys`` LRU eviction playing the part of a maxmemory policy
+    """
+
+    def __init__(self, max_keys: int = SESSION_MAX_SESSIONS):
+        self.max_keys = max_keys
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float):
+        # Caller holds self._lock
+        entry = self._data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= now:
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value, ex: Optional[int] = None) -> bool:
+        value = value.encode() if isinstance(value, str) else bytes(value)
+        with self._lock:
+            self._data[key] = (value, time.time() + ex if ex else None)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+        return True
+
+    def expire(self, key: str, seconds: int) -> bool:
+        with self._lock:
+            entry = self._live(key, time.time())
+            if entry is None:
+                return False
+            self._data[key] = (entry[0], time.time() + seconds)
+            return True
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(key, None) is not None for key in keys)
+
+
+def create_session_store_from_env():
+    """Pick the session backend from SESSION_STORE ('memory', 'sqlite' or 'redis')"""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB", "/tmp/deepfake-sessions.db"))
+    if backend == "redis":
+        redis_url = os.getenv("REDIS_URL")
+        if redis_url:
+            import redis
+            return RedisSessionStore(redis.Redis.from_url(redis_url))
+        return RedisSessionStore(LocalRedis())
+    return MemorySessionStore()
@@ -0,0 +1,154 @@
+"""
+Structured Request Logging
+One-line JSON log records written by a background listener thread (request threads only
+enqueue), with sampled full-payload logging and PII/base64 redaction.
+"""
+
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+from typing import Any, Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Fraction of requests whose full (redacted) payloads are logged; the rest log a summary only
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", 0.01))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+
+REDACTED = "[REDACTED]"
+SENSITIVE_KEYS = re.compile(
+    r"(pass(word)?|secret|token|api[-_]?key|authorization|credential|cookie|e-?mail|phone|"
+    r"address|first[-_]?name|last[-_]?name|full[-_]?name|ssn|birth)", re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_PATTERN = re.compile(r"\+?\d[\d\s().-]{7,}\d")
+DATA_URI_PATTERN = re.compile(r"^data:[\w/+.-]+;base64,", re.IGNORECASE)
+BASE64_PATTERN = re.compile(r"^[A-Za-z0-9+/=\s_-]+$")
+# Credentials inside free text: "Bearer <token>" header values and ?api_key=... style parameters
+AUTH_VALUE_PATTERN = re.compile(r"\b(Bearer|Basic)\s+[\w.~+/=-]+", re.IGNORECASE)
+SECRET_PARAM_PATTERN = re.compile(
+    r"\b((?:access[-_]?|refresh[-_]?|id[-_]?)?token|api[-_]?key|key|secret|password|sig(?:nature)?)=[^&\s\"']+",
+    re.IGNORECASE)
+# Strings this long that are pure base64 are file contents, not anything worth logging
+BASE64_MIN_LENGTH = 256
+MAX_STRING_LENGTH = 1024
+
+# Attributes every LogRecord has; anything else came in through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+def redact(value: Any) -> Any:
+    """Copy of ``value`` with sensitive keys masked, base64 blobs summarized and long strings cut"""
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(key, str) and SENSITIVE_KEYS.search(key) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        # (name, value) pairs, e.g. header lists
+        if len(value) == 2 and isinstance(value[0], str) and SENSITIVE_KEYS.search(value[0]):
+            return [value[0], REDACTED]
+        return [redact(item) for item in value]
+    if isinstance(value, str):
+        if DATA_URI_PATTERN.match(value) or (len(value) >= BASE64_MIN_LENGTH and BASE64_PATTERN.match(value)):
+            return f"[base64 {len(value)} chars]"
+        value = AUTH_VALUE_PATTERN.sub(lambda m: f"{m.group(1)} {REDACTED}", value)
+        value = SECRET_PARAM_PATTERN.sub(lambda m: f"{m.group(1)}={REDACTED}", value)
+        value = PHONE_PATTERN.sub(REDACTED, EMAIL_PATTERN.sub(REDACTED, value))
+        if len(value) > MAX_STRING_LENGTH:
+            return value[:MAX_STRING_LENGTH] + f"...[{len(value) - MAX_STRING_LENGTH} more chars]"
+    return value
+
+
+def should_sample(rate: Optional[float] = None) -> bool:
+    rate = LOG_PAYLOAD_SAMPLE_RATE if rate is None else rate
+    return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+class JsonFormatter(logging.Formatter):
+    """Compact single-line JSON: timestamp, level, logger, message plus any ``extra`` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the request thread: when the queue is full the record is dropped and counted"""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback now (the listener runs later, on another thread)
+        # but keep them in separate fields instead of QueueHandler's merged text
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = LOG_LEVEL, stream=None) -> logging.Logger:
+    """
+    Route the root logger through a bounded queue to a JSON stream handler (stdout by default).
+    Safe to call more than once; only the first call installs the handlers.
+    """
+    global _listener
+    root = logging.getLogger()
+    root.setLevel(level)
+    if _listener is not None:
+        return root
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    log_queue: "queue.Queue" = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    root.handlers = [_DroppingQueueHandler(log_queue)]
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(_listener.stop)
+    return root
+
+
+def log_payload(logger: logging.Logger, event: str, payload: Any, sample_rate: Optional[float] = None,
+                **fields):
+    """
+    Log ``event`` with ``fields``; a sampled fraction of calls also carries the redacted payload.
+    Unsampled calls never serialize or walk the payload.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    if should_sample(sample_rate):
+        fields["payload"] = redact(payload)
+        fields["sampled"] = True
+    logger.info(event, extra=fields)
+
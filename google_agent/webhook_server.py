@@ -5,18 +5,26 @@ This Flask app serves as a webhook endpoint for Dialogflow CX fulfillment.
 
 import os
 import sys
-import json
-import tempfile
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, Response, request, jsonify
 from werkzeug.utils import secure_filename
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from google_agent.dialogflow_agent import DialogflowDeepfakeAgent, DialogflowConfig
+from backend.ingestion import DEFAULT_MAX_BYTES, IngestionError, ingest_message_request
+from backend.metrics import metrics_payload, stage, track_request
+from google_agent.structured_logging import configure_logging, log_payload
+
+logger = configure_logging().getChild('webhook')
 
 app = Flask(__name__)
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# 16MB by default on this public endpoint. Set MAX_UPLOAD_BYTES (e.g. to the backend's
+# INGEST_AUDIO_MAX_BYTES) to accept long recordings, which are spooled to disk and streamed on;
+# images stay held to the backend's image limit once their type is known
+MAX_UPLOAD_BYTES = int(os.getenv('MAX_UPLOAD_BYTES', 16 * 1024 * 1024))
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 
 # Initialize Dialogflow agent
 config = DialogflowConfig(
@@ -40,27 +48,43 @@ def health_check():
         "version": "1.0.0"
     })
 
+@app.route('/healthz', methods=['GET'])
+def liveness():
+    """Liveness probe: answers as soon as the server is up, without touching Dialogflow or the backend"""
+    return jsonify({"status": "ok"})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics"""
+    body, content_type, status_code = metrics_payload()
+    return Response(body, status=status_code, content_type=content_type)
+
 @app.route('/webhook', methods=['POST'])
+@track_request('/webhook')
 def dialogflow_webhook():
     """
     Main webhook endpoint for Dialogflow CX fulfillment
     """
+    start = time.perf_counter()
     try:
         request_data = request.get_json()
+        intent = (request_data or {}).get('intentInfo', {}).get('displayName')
         
-        # Log the request for debugging
-        print(f"Webhook request: {json.dumps(request_data, indent=2)}")
+        # One compact line per request; full (redacted) payloads only for a sampled fraction
+        log_payload(logger, 'webhook_request', request_data, intent=intent,
+                    bytes=request.content_length)
         
         # Process the fulfillment request
-        response = agent.create_webhook_fulfillment(request_data)
+        with stage('fulfillment'):
+            response = agent.create_webhook_fulfillment(request_data)
         
-        # Log the response for debugging
-        print(f"Webhook response: {json.dumps(response, indent=2)}")
+        log_payload(logger, 'webhook_response', response, intent=intent,
+                    duration_ms=round((time.perf_counter() - start) * 1000, 2))
         
         return jsonify(response)
         
     except Exception as e:
-        print(f"Webhook error: {e}")
+        logger.exception('webhook_error', extra={'error': str(e)})
         return jsonify({
             "fulfillment_response": {
                 "messages": [
@@ -73,67 +97,90 @@ def dialogflow_webhook():
             }
         }), 200  # Return 200 to avoid Dialogflow retries
 
+def upload_file_type(filename):
+    """MIME type used for detection routing, or None for unsupported extensions"""
+    file_extension = secure_filename(filename).rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if file_extension in ['jpg', 'jpeg', 'png']:
+        return f"image/{file_extension}"
+    if file_extension in ['wav', 'mp3', 'flac']:
+        return f"audio/{file_extension}"
+    return None
+
+def upload_error(payload, file_type):
+    """(JSON error, status) when an upload cannot be analyzed, None when it can"""
+    if file_type is None:
+        return {"error": "Unsupported file type"}, 400
+    if file_type.startswith("image/") and payload.size > DEFAULT_MAX_BYTES:
+        return {"error": f"Image too large. Maximum size is {DEFAULT_MAX_BYTES // (1024 * 1024)}MB."}, 413
+    return None
+
 @app.route('/detect-file', methods=['POST'])
+@track_request('/detect-file')
 def detect_file():
     """
     Direct file upload endpoint for testing
-    This can be called directly or from Dialogflow rich responses
+    This can be called directly or from Dialogflow rich responses.
+    Accepts a multipart 'file' part or a raw image/audio body named by the X-Filename header.
     """
     try:
-        if 'file' not in request.files:
+        # Streamed into a bounded buffer (spilling to a private temp file only when large)
+        with stage('save_upload'):
+            fields, payload = ingest_message_request(request, max_bytes=MAX_UPLOAD_BYTES)
+        if payload is None:
             return jsonify({"error": "No file uploaded"}), 400
-        
-        file = request.files['file']
-        if file.filename == '':
-            return jsonify({"error": "No file selected"}), 400
-        
-        # Save file temporarily
-        filename = secure_filename(file.filename)
-        file_extension = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-        
-        # Determine file type
-        if file_extension in ['jpg', 'jpeg', 'png']:
-            file_type = f"image/{file_extension}"
-        elif file_extension in ['wav', 'mp3', 'flac']:
-            file_type = f"audio/{file_extension}"
-        else:
-            return jsonify({"error": "Unsupported file type"}), 400
-        
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_extension}') as tmp_file:
-            file.save(tmp_file.name)
-            tmp_path = tmp_file.name
+    except IngestionError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    with payload:
+        file_type = upload_file_type(payload.filename)
+        error = upload_error(payload, file_type)
+        if error is not None:
+            return jsonify(error[0]), error[1]
         
         try:
             # Analyze the file
-            session_id = request.form.get('session_id', 'direct-upload')
-            result = agent.detect_intent_with_file(session_id, tmp_path, file_type)
-            
-            # Clean up temporary file
-            os.unlink(tmp_path)
-            
+            session_id = fields.get('session_id') or 'direct-upload'
+            with payload.open() as stream:
+                result = agent.detect_intent_with_upload(session_id, stream, payload.filename, file_type)
             return jsonify(result)
-            
         except Exception as e:
-            # Clean up temporary file on error
-            if os.path.exists(tmp_path):
-                os.unlink(tmp_path)
-            raise e
-            
-    except Exception as e:
-        print(f"File detection error: {e}")
-        return jsonify({"error": str(e)}), 500
+            logger.exception('detect_file_error', extra={'error': str(e)})
+            return jsonify({"error": str(e)}), 500
 
 @app.route('/chat', methods=['POST'])
+@track_request('/chat')
 def chat():
     """
     Direct chat endpoint for testing
-    This provides a simple REST API for text conversations
+    This provides a simple REST API for text conversations, with an optional attachment sent as
+    multipart form data, as a raw body (message and session in X-Message / X-Session-Id
+    headers) or, for older clients, base64 in JSON image_data/audio_data
     """
     try:
-        data = request.get_json()
-        message = data.get('message', '')
-        session_id = data.get('session_id', 'direct-chat')
+        fields, payload = ingest_message_request(request, max_bytes=MAX_UPLOAD_BYTES)
+    except IngestionError as e:
+        return jsonify({"error": str(e)}), e.status_code
+    
+    try:
+        message = fields.get('message', '')
+        session_id = fields.get('session_id') or 'direct-chat'
+        
+        if payload is not None:
+            with payload:
+                file_type = upload_file_type(payload.filename)
+                error = upload_error(payload, file_type)
+                if error is not None:
+                    return jsonify(error[0]), error[1]
+                with payload.open() as stream:
+                    response = agent.detect_intent_with_upload(session_id, stream, payload.filename, file_type)
+            return jsonify({
+                "response": response.get("response_text", response.get("response")),
+                "intent": response["intent"],
+                "confidence": response["confidence"],
+                "session_id": session_id,
+                "detection_result": response["detection_result"],
+                "file_analyzed": response.get("file_analyzed", True)
+            })
         
         if not message:
             return jsonify({"error": "No message provided"}), 400
@@ -142,25 +189,25 @@ def chat():
         response = agent.detect_intent_text(session_id, message)
         
         return jsonify({
-            "response": response["response_text"],
+            "response": response.get("response_text", response.get("response")),
             "intent": response["intent"],
             "confidence": response["confidence"],
             "session_id": session_id
         })
         
     except Exception as e:
-        print(f"Chat error: {e}")
+        logger.exception('chat_error', extra={'error': str(e)})
         return jsonify({"error": str(e)}), 500
 
 @app.errorhandler(413)
 def too_large(e):
     """Handle file too large error"""
-    return jsonify({"error": "File too large. Maximum size is 16MB."}), 413
+    return jsonify({"error": f"File too large. Maximum size is {MAX_UPLOAD_BYTES // (1024 * 1024)}MB."}), 413
 
 @app.errorhandler(Exception)
 def handle_exception(e):
     """Global exception handler"""
-    print(f"Unhandled exception: {e}")
+    logger.exception('unhandled_exception', extra={'error': str(e)})
     return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == '__main__':
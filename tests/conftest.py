@@ -0,0 +1,52 @@
+"""
+Shared pytest setup: the backend modules import each other by bare name (the servers run
+from backend/), while google_agent modules are imported as a package from the project root.
+"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "backend")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+
+class FakeClock:
+    """Stands in for a module's ``time`` import; advance it instead of sleeping"""
+
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    # Stand-ins for the monotonic clocks; one timeline is enough for the tests
+    monotonic = time
+    perf_counter = time
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """The Flask backend module, imported once with its on-disk state under a temp directory"""
+    pytest.importorskip("flask")
+    state = tmp_path_factory.mktemp("state")
+    with pytest.MonkeyPatch.context() as patch:
+        # Keep the job queue, voice index and archive out of the shared /tmp paths
+        patch.setenv("JOB_DB", str(state / "jobs.db"))
+        patch.setenv("JOB_SPOOL_DIR", str(state / "jobs"))
+        patch.setenv("VOICE_INDEX_DIR", str(state / "voices"))
+        patch.setenv("STORAGE_BACKEND", "local")
+        patch.setenv("LOCAL_STORAGE_DIR", str(state / "uploads"))
+        patch.setenv("PRELOAD_MODELS", "false")
+        import main
+    yield main
+    main.job_queue.stop()
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("aiohttp")
+pytest.importorskip("httpx")
+
+from starlette.testclient import TestClient
+
+from model_registry import ModelRegistry
+
+
+@pytest.fixture
+def client(main, monkeypatch):
+    import asgi
+
+    seen = []
+
+    def analyze_image(payload, archive=True, near_duplicates=True):
+        data = payload.getvalue()
+        seen.append((payload.filename, data, archive))
+        return {"type": "image", "result": "real", "bytes": len(data)}
+
+    monkeypatch.setattr(main, "analyze_image_payload", analyze_image)
+    monkeypatch.setattr(main, "archive_payload", lambda payload: None)
+    # Without the context manager the lifespan (model warm-up, URL session) does not run
+    client = TestClient(asgi.app)
+    client.seen = seen
+    return client
+
+
+def test_raw_body_is_streamed_into_the_payload(client):
+    response = client.post("/detect-image?filename=a.png", content=b"png-bytes",
+                           headers={"content-type": "image/png"})
+    assert response.status_code == 200
+    assert response.json() == {"type": "image", "result": "real", "bytes": 9}
+    # Archiving was awaited by the route, so inference does not archive again
+    assert client.seen == [("a.png", b"png-bytes", False)]
+
+
+def test_multipart_upload_and_bad_bodies(client):
+    response = client.post("/detect-image", files={"file": ("b.png", b"multipart", "image/png")})
+    assert response.status_code == 200
+    assert client.seen == [("b.png", b"multipart", False)]
+
+    response = client.post("/detect-image", content=b"{not json", headers={"content-type": "application/json"})
+    assert response.status_code == 400
+    assert response.json() == {"error": "Request body is not valid JSON."}
+    assert client.post("/detect-image", json={}).status_code == 400
+
+
+def test_detect_batch_streams_one_line_per_item(client):
+    response = client.post("/detect-batch", files=[
+        ("files", ("a.png", b"first", "image/png")),
+        ("files", ("b.txt", b"text", "text/plain")),
+    ])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = sorted((json.loads(line) for line in response.text.splitlines()), key=lambda line: line["index"])
+    assert lines == [
+        {"index": 0, "source": "a.png", "type": "image", "result": "real", "bytes": 5},
+        {"index": 1, "source": "b.txt", "error": "Unsupported file type"},
+    ]
+
+
+def test_probes_follow_the_shared_registry(main, client, monkeypatch):
+    registry = ModelRegistry()
+    registry.register("image", lambda: "classifier")
+    monkeypatch.setattr(main, "registry", registry)
+    monkeypatch.setattr(main, "READY_MODELS", ["image"])
+
+    assert client.get("/healthz").status_code == 200
+    assert client.get("/readyz").status_code == 503
+    main.warm_up()
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["models"]["image"]["state"] == "warm"
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+librosa = pytest.importorskip("librosa")
+
+from audio_features import HOP_LENGTH, N_FFT, extract_features, zero_crossing_rate
+
+SR = 16000
+
+
+@pytest.fixture
+def signal():
+    """Two seconds of chirp plus noise with a stretch of exact silence in the middle"""
+    rng = np.random.default_rng(0)
+    t = np.arange(2 * SR) / SR
+    y = np.sin(2 * np.pi * (200 + 900 * t) * t) + 0.05 * rng.standard_normal(t.size)
+    y[SR // 2:SR // 2 + 4000] = 0.0
+    return y.astype(np.float32)
+
+
+def test_zero_crossing_rate_matches_librosa(signal):
+    expected = librosa.feature.zero_crossing_rate(signal, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+    np.testing.assert_allclose(zero_crossing_rate(signal), expected, atol=1e-12)
+
+
+def test_spectral_features_match_librosa(signal):
+    features = extract_features(signal, SR)
+
+    centroid = librosa.feature.spectral_centroid(y=signal, sr=SR, n_fft=N_FFT, hop_length=HOP_LENGTH)[0]
+    rolloff = librosa.feature.spectral_rolloff(y=signal, sr=SR, n_fft=N_FFT, hop_length=HOP_LENGTH)[0]
+    zcr = librosa.feature.zero_crossing_rate(signal, frame_length=N_FFT, hop_length=HOP_LENGTH)[0]
+
+    assert features.n_frames == centroid.shape[0] == rolloff.shape[0] == zcr.shape[0]
+    np.testing.assert_allclose(features.centroid, centroid, rtol=1e-4, atol=1e-3)
+    # Rolloff is a bin frequency; float32 rounding at the threshold may move it by one bin
+    np.testing.assert_allclose(features.rolloff, rolloff, atol=SR / N_FFT + 1e-6)
+    np.testing.assert_allclose(features.zcr, zcr, atol=1e-12)
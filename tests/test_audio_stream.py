@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from audio_stream import RunningStats
+
+
+@pytest.mark.parametrize("batch_sizes", [[1000], [1] * 50, [3, 700, 1, 250, 46]])
+def test_running_stats_match_numpy(batch_sizes):
+    rng = np.random.default_rng(0)
+    batches = [rng.normal(5.0, 3.0, size=n) for n in batch_sizes]
+    stats = RunningStats()
+    for batch in batches:
+        stats.update(batch)
+
+    values = np.concatenate(batches)
+    assert stats.count == values.size
+    assert stats.mean == pytest.approx(values.mean(), rel=1e-12)
+    assert stats.variance == pytest.approx(values.var(), rel=1e-9)
+
+
+def test_running_stats_flatten_and_skip_empty_batches():
+    stats = RunningStats()
+    stats.update(np.array([[1.0, 2.0], [3.0, 4.0]]))
+    stats.update([])
+    assert stats.count == 4
+    assert stats.mean == pytest.approx(2.5)
+    assert stats.variance == pytest.approx(1.25)
+
+
+def test_running_stats_stay_accurate_with_a_large_offset():
+    # The naive sum-of-squares formula loses all precision here
+    rng = np.random.default_rng(1)
+    values = 1e9 + rng.normal(0.0, 1.0, size=10000)
+    stats = RunningStats()
+    for batch in np.array_split(values, 7):
+        stats.update(batch)
+    assert stats.variance == pytest.approx(values.var(), rel=1e-6)
+
+
+def test_empty_running_stats():
+    stats = RunningStats()
+    assert stats.count == 0
+    assert stats.variance == 0.0
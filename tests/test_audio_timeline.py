@@ -0,0 +1,105 @@
+import io
+
+import numpy as np
+import pytest
+
+from audio_features import AudioFeatures, feature_timeline, score_arrays, synthetic_spans
+
+SR = 16000
+HOP = 512
+
+
+def random_features(n_frames, seed=0):
+    rng = np.random.default_rng(seed)
+    return AudioFeatures(
+        sr=SR, hop_length=HOP,
+        mfcc=rng.normal(0.0, 8.0, size=(13, n_frames)),
+        centroid=rng.uniform(500.0, 3500.0, size=n_frames),
+        rolloff=rng.uniform(2000.0, 7000.0, size=n_frames),
+        zcr=rng.uniform(0.0, 0.2, size=n_frames),
+    )
+
+
+def test_windows_match_recomputing_each_slice():
+    features = random_features(400)
+    timeline = feature_timeline(features, window_seconds=2.0, hop_seconds=0.5)
+
+    window = round(2.0 * SR / HOP)
+    hop = round(0.5 * SR / HOP)
+    starts = range(0, 400 - window + 1, hop)
+    assert len(timeline) == len(starts)
+    for entry, start in zip(timeline, starts):
+        frames = slice(start, start + window)
+        mfcc_var = np.var(features.mfcc[:, frames])
+        centroid = np.mean(features.centroid[frames])
+        zcr = np.mean(features.zcr[frames])
+        synthetic, confidence, score = score_arrays(mfcc_var, centroid, zcr)
+
+        assert entry["start"] == pytest.approx(start * HOP / SR, abs=1e-3)
+        assert entry["end"] == pytest.approx((start + window) * HOP / SR, abs=1e-3)
+        assert entry["mfcc_var"] == pytest.approx(mfcc_var, abs=1e-3)
+        assert entry["centroid_mean"] == pytest.approx(centroid, abs=1e-3)
+        assert entry["rolloff_mean"] == pytest.approx(np.mean(features.rolloff[frames]), abs=1e-3)
+        assert entry["zcr_mean"] == pytest.approx(zcr, abs=1e-4)
+        assert entry["synthetic"] == bool(synthetic)
+        assert entry["confidence"] == pytest.approx(float(confidence), abs=1e-4)
+        assert entry["synthetic_score"] == pytest.approx(float(score), abs=1e-4)
+
+
+def test_a_clip_shorter_than_the_window_is_one_window():
+    timeline = feature_timeline(random_features(20), window_seconds=5.0, hop_seconds=1.0)
+    assert len(timeline) == 1
+    assert timeline[0]["start"] == 0.0
+    assert timeline[0]["end"] == pytest.approx(20 * HOP / SR, abs=1e-3)
+
+
+def test_synthetic_windows_merge_into_spans():
+    def windows(flags, length, hop):
+        return [{"start": i * hop, "end": i * hop + length, "synthetic": flag} for i, flag in enumerate(flags)]
+
+    # Overlapping windows chain into one span even across a human window in between
+    assert synthetic_spans(windows([False, True, True, False, False, True], 2.0, 0.5)) == [{"start": 0.5, "end": 4.5}]
+    # Back-to-back windows touch; a human window leaves a gap
+    assert synthetic_spans(windows([False, True, True, False, True], 1.0, 1.0)) == [
+        {"start": 1.0, "end": 3.0}, {"start": 4.0, "end": 5.0}]
+    assert synthetic_spans(windows([False, False], 1.0, 1.0)) == []
+
+
+@pytest.fixture
+def client(main, monkeypatch):
+    def analyze_timeline(source, window_seconds, hop_seconds):
+        assert source.read() == b"RIFF-audio"
+        timeline = [
+            {"start": 0.0, "end": 2.0, "synthetic": False, "synthetic_score": 0.33},
+            {"start": 1.0, "end": 3.0, "synthetic": True, "synthetic_score": 0.67},
+            {"start": 2.0, "end": 4.0, "synthetic": True, "synthetic_score": 1.0},
+        ]
+        return (True, 0.6, "details"), timeline, 4.0
+
+    monkeypatch.setattr(main, "analyze_timeline", analyze_timeline)
+    monkeypatch.setattr(main, "inference_pool", None)
+    return main.app.test_client()
+
+
+def upload():
+    return {"file": (io.BytesIO(b"RIFF-audio"), "clip.wav", "audio/wav")}
+
+
+def test_timeline_route_labels_windows_and_spans(client):
+    response = client.post("/detect-audio/timeline?window=2&hop=1", data=upload(),
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["result"] == "synthetic"
+    assert body["duration"] == 4.0
+    assert (body["window_seconds"], body["hop_seconds"]) == (2.0, 1.0)
+    assert body["synthetic_spans"] == [{"start": 1.0, "end": 4.0}]
+    assert [window["result"] for window in body["timeline"]] == ["human", "synthetic", "synthetic"]
+    assert all("synthetic" not in window for window in body["timeline"])
+
+
+@pytest.mark.parametrize("query", ["window=abc", "hop=0", "window=-1"])
+def test_timeline_route_rejects_bad_windows(client, query):
+    response = client.post(f"/detect-audio/timeline?{query}", data=upload(), content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert "window and hop" in response.get_json()["error"]
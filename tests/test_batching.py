@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def test_results_scatter_back_to_their_callers():
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=5000)
+    futures = {}
+    lock = threading.Lock()
+
+    def caller(item):
+        future = batcher.submit(item)
+        with lock:
+            futures[item] = future
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert {item: future.result(timeout=5) for item, future in futures.items()} == {i: i * 10 for i in range(8)}
+    batcher.close()
+    assert sorted(len(batch) for batch in batches) == [4, 4]
+    assert batcher.stats()["items"] == 8
+    assert batcher.stats()["largest_batch"] == 4
+
+
+def test_an_item_exception_fails_only_that_caller():
+    def batch_fn(items):
+        return [ValueError(f"bad {item}") if item % 2 else item for item in items]
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=4, max_wait_ms=5000)
+    futures = [batcher.submit(i) for i in range(4)]
+
+    assert futures[0].result(timeout=5) == 0
+    assert futures[2].result(timeout=5) == 2
+    for i in (1, 3):
+        with pytest.raises(ValueError, match=f"bad {i}"):
+            futures[i].result(timeout=5)
+    batcher.close()
+
+
+def test_a_failing_batch_fails_every_caller_in_it():
+    def batch_fn(items):
+        raise RuntimeError("model down")
+
+    batcher = MicroBatcher(batch_fn, max_batch_size=2, max_wait_ms=5000)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model down"):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_a_short_result_list_fails_the_batch():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=2, max_wait_ms=5000)
+    futures = [batcher.submit(i) for i in range(2)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="1 results for 2 items"):
+            future.result(timeout=5)
+    batcher.close()
+
+
+def test_close_rejects_new_items():
+    batcher = MicroBatcher(lambda items: items, max_wait_ms=0)
+    assert batcher.run("x", timeout=5) == "x"
+    batcher.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.submit("y")
@@ -0,0 +1,77 @@
+import io
+import json
+
+import pytest
+
+
+@pytest.fixture
+def client(main, monkeypatch):
+    def analyze_image(payload, archive=True):
+        data = payload.getvalue()
+        if data == b"corrupt":
+            raise ValueError("cannot decode")
+        return {"type": "image", "result": "real", "bytes": len(data)}
+
+    def analyze_audio(payload, archive=True):
+        return {"type": "audio", "result": "human", "bytes": len(payload.getvalue())}
+
+    monkeypatch.setattr(main, "analyze_image_payload", analyze_image)
+    monkeypatch.setattr(main, "analyze_audio_payload", analyze_audio)
+    return main.app.test_client()
+
+
+def ndjson(response):
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return sorted(lines, key=lambda line: line["index"])
+
+
+def test_every_upload_gets_its_own_line(client):
+    response = client.post("/detect-batch", content_type="multipart/form-data", data={"files": [
+        (io.BytesIO(b"png-bytes"), "a.png", "image/png"),
+        (io.BytesIO(b"corrupt"), "b.png", "image/png"),
+        (io.BytesIO(b"wav-bytes!"), "c.wav", "audio/wav"),
+        (io.BytesIO(b"text"), "d.txt", "text/plain"),
+    ]})
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    assert ndjson(response) == [
+        {"index": 0, "source": "a.png", "type": "image", "result": "real", "bytes": 9},
+        {"index": 1, "source": "b.png", "error": "Error processing image: cannot decode"},
+        {"index": 2, "source": "c.wav", "type": "audio", "result": "human", "bytes": 10},
+        {"index": 3, "source": "d.txt", "error": "Unsupported file type"},
+    ]
+
+
+def test_url_entries_are_downloaded_per_item(main, client, monkeypatch):
+    def ingest_url(url, **kwargs):
+        if "missing" in url:
+            raise OSError("404")
+        return main.ingest_file(io.BytesIO(b"remote"), url.rsplit("/", 1)[-1], None)
+
+    monkeypatch.setattr(main, "ingest_url", ingest_url)
+    response = client.post("/detect-batch", json={"urls": [
+        "https://example.com/photo.jpg",
+        {"url": "https://example.com/clip", "type": "audio"},
+        "https://example.com/missing.jpg",
+        {"type": "image"},
+    ]})
+
+    assert ndjson(response) == [
+        {"index": 0, "source": "https://example.com/photo.jpg", "type": "image", "result": "real", "bytes": 6},
+        {"index": 1, "source": "https://example.com/clip", "type": "audio", "result": "human", "bytes": 6},
+        {"index": 2, "source": "https://example.com/missing.jpg", "error": "Error downloading file: 404"},
+        {"index": 3, "error": "Invalid URL entry"},
+    ]
+
+
+def test_empty_malformed_and_oversized_batches_are_rejected(main, client, monkeypatch):
+    assert client.post("/detect-batch").status_code == 400
+    response = client.post("/detect-batch", data="{not json", content_type="application/json")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "No files or URLs provided."}
+
+    monkeypatch.setattr(main, "BATCH_MAX_ITEMS", 2)
+    response = client.post("/detect-batch", json={"urls": ["https://example.com/1.jpg"] * 3})
+    assert response.status_code == 413
+    assert "limit is 2" in response.get_json()["error"]
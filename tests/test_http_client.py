@@ -0,0 +1,122 @@
+import io
+import socket
+import threading
+import time
+
+import pytest
+import requests
+
+from google_agent.http_client import HTTPClient
+
+
+def make_response(status: int, body: bytes = b"{}") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO(body)
+    return response
+
+
+class StubSession:
+    """Plays back scripted responses or exceptions in place of the pooled session"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, timeout=None, stream=False, **kwargs):
+        files = kwargs.get("files") or {}
+        self.calls.append((method, {name: f.read() for name, f in files.items()}))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def close(self):
+        pass
+
+
+def stub_client(*outcomes, **kwargs) -> HTTPClient:
+    client = HTTPClient(backoff_factor=0.0, **kwargs)
+    client.session = StubSession(*outcomes)
+    return client
+
+
+def test_idempotent_request_retries_a_retryable_status():
+    client = stub_client(make_response(503), make_response(200, b'{"ok": true}'))
+    response = client.get("http://backend/health")
+    assert response.status_code == 200
+    assert response.json() == {"ok": True}
+    assert len(client.session.calls) == 2
+
+
+def test_idempotent_request_retries_a_connection_error():
+    client = stub_client(requests.ConnectionError("reset"), make_response(200))
+    assert client.get("http://backend/health").status_code == 200
+    assert len(client.session.calls) == 2
+
+
+def test_retryable_status_is_returned_once_retries_run_out():
+    client = stub_client(*[make_response(503) for _ in range(3)], max_retries=2)
+    assert client.get("http://backend/health").status_code == 503
+    assert len(client.session.calls) == 3
+
+
+def test_post_is_not_retried_without_opt_in():
+    client = stub_client(make_response(502), make_response(200))
+    assert client.post("http://backend/jobs").status_code == 502
+    assert len(client.session.calls) == 1
+
+    client = stub_client(requests.ReadTimeout("slow"), make_response(200))
+    with pytest.raises(requests.ReadTimeout):
+        client.post("http://backend/jobs")
+    assert len(client.session.calls) == 1
+
+
+def test_post_connect_timeout_is_retried_as_nothing_was_sent():
+    client = stub_client(requests.ConnectTimeout("no route"), make_response(200))
+    assert client.post("http://backend/jobs").status_code == 200
+    assert len(client.session.calls) == 2
+
+
+def test_opted_in_post_retries_and_resends_the_upload_from_its_start():
+    upload = io.BytesIO(b"HEADER-image-bytes")
+    upload.read(7)
+    client = stub_client(make_response(503), make_response(200))
+    response = client.post("http://backend/detect-image", files={"file": upload}, retry=True)
+    assert response.status_code == 200
+    assert [files["file"] for _, files in client.session.calls] == [b"image-bytes", b"image-bytes"]
+
+
+def test_deadline_watchdog_cuts_a_trickling_body():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    port = server.getsockname()[1]
+    stop = threading.Event()
+
+    def trickle():
+        conn, _ = server.accept()
+        conn.recv(65536)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 1000\r\n\r\n")
+        try:
+            # Each byte arrives well within the per-read timeout; the body as a whole never finishes
+            while not stop.wait(0.05):
+                conn.sendall(b"x")
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=trickle, daemon=True)
+    thread.start()
+    client = HTTPClient(max_retries=0)
+    started = time.monotonic()
+    try:
+        with pytest.raises(requests.Timeout, match="Deadline"):
+            client.get(f"http://127.0.0.1:{port}/slow", deadline=0.5)
+        assert time.monotonic() - started < 3.0
+    finally:
+        stop.set()
+        client.close()
+        server.close()
+        thread.join(timeout=5)
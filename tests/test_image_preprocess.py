@@ -0,0 +1,109 @@
+import io
+import types
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from image_preprocess import ImageDecodeError, ImagePreprocessor, classify_pixels
+
+
+def photo(width, height, mode="RGB"):
+    """A smooth synthetic photo: gradients plus low-frequency waves, no sharp edges"""
+    y, x = np.mgrid[0:height, 0:width] / max(width, height)
+    channels = [
+        128 + 100 * np.sin(6 * x + 2 * y),
+        128 + 100 * np.cos(4 * y - 3 * x),
+        255 * (x + y) / 2,
+    ]
+    image = Image.fromarray(np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8))
+    return image.convert(mode)
+
+
+def encode(image, fmt, **params):
+    stream = io.BytesIO()
+    image.save(stream, fmt, **params)
+    stream.seek(0)
+    return stream
+
+
+def pil_reference(source, size=224, mean=0.5, std=0.5):
+    """The previous per-request path: full decode, PIL resize, then rescale and normalize in float64"""
+    image = Image.open(source).convert("RGB").resize((size, size), Image.BILINEAR)
+    pixels = np.asarray(image, dtype=np.float64) / 255
+    return ((pixels - mean) / std).transpose(2, 0, 1)
+
+
+def test_lossless_images_match_the_pil_path():
+    preprocessor = ImagePreprocessor()
+    sources = [photo(640, 480), photo(224, 224), photo(300, 500, mode="L"), photo(400, 400, mode="RGBA")]
+    batch = preprocessor.batch([preprocessor.load(encode(image, "PNG")) for image in sources])
+
+    assert batch.shape == (4, 3, 224, 224)
+    assert batch.dtype == np.float32
+    assert batch.flags.c_contiguous
+    for i, image in enumerate(sources):
+        np.testing.assert_allclose(batch[i], pil_reference(encode(image, "PNG")), atol=1e-5)
+
+
+def test_draft_decoded_jpegs_stay_close_to_the_full_decode():
+    preprocessor = ImagePreprocessor()
+    stream = encode(photo(2400, 1800), "JPEG", quality=95)
+    loaded = preprocessor.load(stream)
+    assert loaded.size == (224, 224)
+
+    stream.seek(0)
+    reference = pil_reference(stream)
+    difference = np.abs(preprocessor.batch([loaded])[0] - reference)
+    # Normalized values span [-1, 1]; draft decoding only changes the resampling detail
+    assert difference.mean() < 0.01
+    assert difference.max() < 0.05
+
+
+def test_batch_accepts_unprocessed_images_and_reuses_its_buffer():
+    preprocessor = ImagePreprocessor(max_batch=2)
+    first = preprocessor.batch([photo(300, 200), photo(224, 224, mode="L")])
+    np.testing.assert_allclose(first[1], pil_reference(encode(photo(224, 224, mode="L"), "PNG")), atol=1e-5)
+
+    again = preprocessor.batch([photo(224, 224)])
+    assert np.shares_memory(first, again)
+    grown = preprocessor.batch([photo(224, 224)] * 3)
+    assert grown.shape[0] == 3
+
+
+def test_from_classifier_reads_the_processor_config():
+    processor = types.SimpleNamespace(size={"height": 32, "width": 32}, image_mean=[0.485, 0.456, 0.406],
+                                      image_std=[0.229, 0.224, 0.225], rescale_factor=1 / 255,
+                                      resample=Image.BICUBIC, do_normalize=True, do_rescale=True)
+    preprocessor = ImagePreprocessor.from_classifier(types.SimpleNamespace(image_processor=processor))
+    assert preprocessor.size == 32
+    assert preprocessor.resample == Image.BICUBIC
+
+    image = photo(32, 32)
+    expected = (np.asarray(image, dtype=np.float64) / 255 - processor.image_mean) / processor.image_std
+    np.testing.assert_allclose(preprocessor.batch([image])[0], expected.transpose(2, 0, 1), atol=1e-5)
+
+
+def test_undecodable_uploads_raise_image_decode_error():
+    with pytest.raises(ImageDecodeError):
+        ImagePreprocessor().load(io.BytesIO(b"not an image"))
+    truncated = encode(photo(256, 256), "JPEG").getvalue()[:300]
+    with pytest.raises(ImageDecodeError):
+        ImagePreprocessor().load(io.BytesIO(truncated))
+
+
+def test_classify_pixels_prefers_predict_pixels():
+    predictions = [[{"label": "Real", "score": 1.0}]]
+    classifier = types.SimpleNamespace(predict_pixels=lambda pixels: predictions * len(pixels))
+    assert classify_pixels(classifier, np.zeros((2, 3, 224, 224), dtype=np.float32)) == predictions * 2
+
+
+def test_matches_the_hugging_face_vit_processor():
+    transformers = pytest.importorskip("transformers")
+    processor = transformers.ViTImageProcessor(size={"height": 224, "width": 224},
+                                               image_mean=[0.5, 0.5, 0.5], image_std=[0.5, 0.5, 0.5])
+    preprocessor = ImagePreprocessor.from_classifier(types.SimpleNamespace(image_processor=processor))
+    images = [photo(640, 480), photo(120, 90)]
+
+    expected = processor(images=images, return_tensors="np")["pixel_values"]
+    np.testing.assert_allclose(preprocessor.batch(images), expected, atol=1e-4)
@@ -0,0 +1,90 @@
+import os
+import types
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from inference_pool import InferencePool
+from model_registry import ModelRegistry
+
+# Workers are forked, so they see the module-level registry as the parent left it
+REGISTRY = ModelRegistry()
+LOADS = []
+
+
+def load_model():
+    LOADS.append(os.getpid())
+    return {"weights": list(range(1000)), "loaded_in": os.getpid()}
+
+
+def broken_loader():
+    raise OSError("weights unavailable")
+
+
+REGISTRY.register("model", load_model)
+REGISTRY.register("broken", broken_loader, fallback="mock")
+
+
+def describe_worker():
+    model = REGISTRY.get("model")
+    return {"pid": os.getpid(), "loaded_in": model["loaded_in"], "loads_in_worker": len(LOADS) - 1}
+
+
+def read_source(source, suffix):
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            return b"path:" + f.read() + suffix
+    return source.read() + suffix
+
+
+def fail(message):
+    raise ValueError(message)
+
+
+def die():
+    os._exit(1)
+
+
+@pytest.fixture
+def pool():
+    pool = InferencePool(REGISTRY, processes=2, preload=["model", "broken"], threads_per_worker=1)
+    yield pool
+    pool.close()
+
+
+def test_workers_use_the_models_loaded_before_the_fork(pool):
+    pool.start()
+    assert LOADS == [os.getpid()]
+    assert pool.stats()["started"] is True
+
+    worker = pool.run(describe_worker, timeout=30)
+    assert worker["pid"] != os.getpid()
+    assert worker["loaded_in"] == os.getpid()
+    assert worker["loads_in_worker"] == 0
+    # A model that failed to preload does not stop the fork
+    assert REGISTRY.status()["broken"]["state"] == "failed"
+
+
+def test_payloads_reach_workers_as_streams_or_paths(pool, tmp_path):
+    in_memory = types.SimpleNamespace(path=None, getvalue=lambda: b"in memory")
+    assert pool.run_on_payload(read_source, in_memory, b"!", timeout=30) == b"in memory!"
+
+    spilled = tmp_path / "upload.bin"
+    spilled.write_bytes(b"spilled")
+    on_disk = types.SimpleNamespace(path=str(spilled), getvalue=None)
+    assert pool.run_on_payload(read_source, on_disk, b"!", timeout=30) == b"path:spilled!"
+
+
+def test_errors_fail_only_their_call_and_a_dead_worker_is_replaced(pool):
+    with pytest.raises(ValueError, match="bad input"):
+        pool.run(fail, "bad input", timeout=30)
+    assert pool.run(describe_worker, timeout=30)["loaded_in"] == os.getpid()
+
+    with pytest.raises(BrokenProcessPool):
+        pool.run(die, timeout=30)
+    assert pool.run(describe_worker, timeout=30)["loaded_in"] == os.getpid()
+
+    stats = pool.stats()
+    assert stats["failed"] == 2
+    assert stats["restarts"] == 1
+    assert stats["tasks"] == 4
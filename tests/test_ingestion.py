@@ -0,0 +1,164 @@
+import base64
+import hashlib
+import io
+import os
+import tempfile
+
+import pytest
+
+from ingestion import (IngestionError, PayloadTooLarge, ingest_file, ingest_message_request,
+                       ingest_request, ingest_stream)
+
+
+@pytest.fixture
+def flask():
+    return pytest.importorskip("flask")
+
+
+@pytest.fixture
+def app(flask):
+    return flask.Flask(__name__)
+
+
+def _chunks(data, size=1000):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_small_payload_stays_in_memory():
+    data = os.urandom(5000)
+    with ingest_stream(_chunks(data), "a.jpg", spool_threshold=10000) as payload:
+        assert payload.in_memory and payload.path is None
+        assert payload.size == len(data)
+        assert payload.sha256 == hashlib.sha256(data).hexdigest()
+        assert bytes(payload.view()) == data
+        assert payload.open().read() == data
+
+
+def test_payload_spills_to_disk_above_the_threshold():
+    data = os.urandom(50000)
+    payload = ingest_stream(_chunks(data), "a.wav", spool_threshold=10000)
+    assert not payload.in_memory
+    path = payload.path
+    assert path.endswith(".wav") and os.path.getsize(path) == len(data)
+    assert bytes(payload.view()) == data
+    assert payload.sha256 == hashlib.sha256(data).hexdigest()
+    with payload.open() as stream:
+        assert stream.read() == data
+
+    view = payload.view()
+    payload.close()  # a live view must not make close() fail
+    assert not os.path.exists(path)
+    assert bytes(view[:10]) == data[:10]
+
+
+def test_oversized_payload_is_rejected_and_cleaned_up(monkeypatch):
+    created = []
+    real_mkstemp = tempfile.mkstemp
+
+    def recording_mkstemp(*args, **kwargs):
+        fd, path = real_mkstemp(*args, **kwargs)
+        created.append(path)
+        return fd, path
+
+    monkeypatch.setattr("ingestion.tempfile.mkstemp", recording_mkstemp)
+    with pytest.raises(PayloadTooLarge) as excinfo:
+        ingest_stream(_chunks(b"x" * 30000), "a.wav", max_bytes=20000, spool_threshold=5000)
+    assert excinfo.value.status_code == 413
+    assert created and not any(os.path.exists(path) for path in created)
+
+
+@pytest.mark.parametrize("spool_threshold", [1 << 20, 100])
+def test_hand_off_file_gives_the_caller_an_independent_copy(spool_threshold):
+    data = os.urandom(5000)
+    with ingest_stream(_chunks(data), "a.png", spool_threshold=spool_threshold) as payload:
+        handed = payload.hand_off_file()
+        assert handed != payload.path and handed.endswith(".png")
+    # The payload is closed; the handed-off file now belongs to the caller alone
+    try:
+        with open(handed, "rb") as f:
+            assert f.read() == data
+    finally:
+        os.remove(handed)
+
+
+def test_ingest_file_reads_any_stream():
+    with ingest_file(io.BytesIO(b"abc" * 100000), "a.wav", "audio/wav", spool_threshold=1000) as payload:
+        assert payload.size == 300000
+        assert payload.content_type == "audio/wav"
+
+
+def test_raw_body_upload(flask, app):
+    data = os.urandom(3000)
+    with app.test_request_context("/?filename=ignored.png", method="POST", data=data, content_type="image/png",
+                                  headers={"X-Filename": "my%20photo.png"}):
+        with ingest_request(flask.request, "image") as payload:
+            assert payload.filename == "my photo.png"
+            assert payload.content_type == "image/png"
+            assert payload.getvalue() == data
+
+
+def test_unnamed_raw_bodies_get_unique_names(flask, app):
+    names = set()
+    for _ in range(2):
+        with app.test_request_context("/", method="POST", data=b"RIFF", content_type="audio/wav"):
+            fields, payload = ingest_message_request(flask.request)
+            with payload:
+                names.add(payload.filename)
+    assert len(names) == 2 and all(name.endswith(".wav") for name in names)
+
+
+def test_raw_body_declared_length_is_checked_before_reading(flask, app):
+    with app.test_request_context("/", method="POST", data=b"x" * 2000, content_type="audio/wav"):
+        with pytest.raises(PayloadTooLarge):
+            ingest_request(flask.request, "audio", max_bytes=1000)
+
+
+def test_raw_body_message_fields_come_from_headers(flask, app):
+    with app.test_request_context("/", method="POST", data=b"img", content_type="image/jpeg",
+                                  headers={"X-Message": "is%20this%20real%3F", "X-Session-Id": "s1",
+                                           "X-Filename": "a.jpg"}):
+        fields, payload = ingest_message_request(flask.request)
+        with payload:
+            assert fields == {"message": "is this real?", "session_id": "s1"}
+            assert payload.getvalue() == b"img"
+
+
+@pytest.mark.parametrize("data_key, name_key", [("file_data", "filename"), ("image_data", "image_filename"),
+                                                ("audio_data", "audio_filename")])
+def test_legacy_base64_json(data_key, name_key, flask, app):
+    data = os.urandom(1000)
+    body = {"message": "check", data_key: base64.b64encode(data).decode(), name_key: "clip.wav"}
+    with app.test_request_context("/", method="POST", json=body):
+        fields, payload = ingest_message_request(flask.request)
+        with payload:
+            assert payload.getvalue() == data
+            assert payload.filename == "clip.wav"
+        assert fields["message"] == "check" and data_key not in fields
+
+
+def test_legacy_base64_errors(flask, app):
+    with app.test_request_context("/", method="POST", json={"image_data": "not base64!"}):
+        with pytest.raises(IngestionError) as excinfo:
+            ingest_message_request(flask.request)
+        assert excinfo.value.status_code == 400
+    with app.test_request_context("/", method="POST", json={"image_data": base64.b64encode(b"x" * 2000).decode()}):
+        with pytest.raises(PayloadTooLarge):
+            ingest_message_request(flask.request, max_bytes=1000)
+
+
+def test_malformed_json_is_a_json_ingestion_error(flask, app):
+    with app.test_request_context("/", method="POST", data="{not json", content_type="application/json"):
+        with pytest.raises(IngestionError) as excinfo:
+            ingest_request(flask.request, "image")
+        assert excinfo.value.status_code == 400
+        with pytest.raises(IngestionError):
+            ingest_message_request(flask.request)
+
+
+def test_multipart_message_request(flask, app):
+    data = {"message": "hi", "file": (io.BytesIO(b"abc"), "a.jpg", "image/jpeg")}
+    with app.test_request_context("/", method="POST", data=data, content_type="multipart/form-data"):
+        fields, payload = ingest_message_request(flask.request)
+        with payload:
+            assert fields == {"message": "hi"}
+            assert (payload.filename, payload.getvalue()) == ("a.jpg", b"abc")
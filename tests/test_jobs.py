@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+import jobs
+from conftest import FakeClock
+from jobs import DONE, FAILED, RUNNING, JobQueue
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(jobs, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(clock, tmp_path):
+    # Workers are never started: the tests drive _claim and _finish directly
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "spool"), handler=lambda job: {},
+                     lease_seconds=30, max_attempts=3)
+    queue.start = lambda: None
+    return queue
+
+
+def _spooled(tmp_path, name="input.wav"):
+    path = tmp_path / name
+    path.write_bytes(b"data")
+    return str(path)
+
+
+def test_claim_takes_the_oldest_queued_job_once(queue, clock):
+    first = queue.submit("image", options={"n": 1})
+    clock.advance(1)
+    second = queue.submit("image")
+
+    job = queue._claim()
+    assert job["id"] == first
+    assert job["attempts"] == 1
+    assert job["options"] == {"n": 1}
+    assert job["lease_until"] is None  # the row as it was before the claim
+    assert queue.get(first)["status"] == RUNNING
+    assert queue._claim()["id"] == second
+    assert queue._claim() is None
+
+
+def test_expired_lease_is_reclaimed_and_fences_the_old_worker(queue, clock):
+    job_id = queue.submit("image")
+    stale = queue._claim()
+    clock.advance(29)
+    assert queue._claim() is None
+    clock.advance(2)
+
+    fresh = queue._claim()
+    assert fresh["id"] == job_id
+    assert fresh["attempts"] == 2
+    assert queue._finish(stale, DONE, result={"from": "stale"}) is False
+    assert queue._finish(fresh, DONE, result={"from": "fresh"}) is True
+    assert queue.get(job_id)["result"] == {"from": "fresh"}
+
+
+def test_lost_job_fails_after_max_attempts(queue, clock, tmp_path):
+    job_id = queue.submit("audio", source_path=_spooled(tmp_path))
+    for attempt in range(1, 4):
+        assert queue._claim()["attempts"] == attempt
+        clock.advance(31)  # the worker dies without finishing
+
+    assert queue._claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == FAILED
+    assert job["attempts"] == 3
+    assert "lease expired" in job["error"]
+    assert not (tmp_path / "spool" / job_id).exists()
+    assert queue.pending() == 0
+
+
+def test_renewal_keeps_a_long_job_leased(clock, tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.db"), str(tmp_path / "spool"), handler=lambda job: {},
+                     lease_seconds=0.3)
+    queue.start = lambda: None
+    job_id = queue.submit("image")
+    job = queue._claim()
+
+    done = threading.Event()
+    renewer = threading.Thread(target=queue._renew_leases, args=(job, done))
+    clock.advance(0.25)
+    renewer.start()
+    time.sleep(0.25)  # real time: renewals run every lease_seconds / 3
+    done.set()
+    renewer.join()
+
+    clock.advance(0.25)  # past the original lease, within the renewed one
+    assert queue._claim() is None
+    clock.advance(0.1)
+    assert queue._claim()["id"] == job_id
+
+
+@pytest.mark.parametrize("url", ["file:///etc/passwd", "gopher://host/", "http://", "/relative"])
+def test_submit_rejects_non_http_callbacks(queue, tmp_path, url):
+    source = _spooled(tmp_path)
+    with pytest.raises(ValueError):
+        queue.submit("audio", source_path=source, callback_url=url)
+    assert not (tmp_path / "input.wav").exists()
+    assert queue.pending() == 0
+
+
+def test_callbacks_are_queued_and_not_slept_on_after_the_last_attempt(queue, clock, monkeypatch):
+    posts = []
+
+    def failing_post(url, json, timeout):
+        posts.append(clock.time())
+        raise jobs.requests.ConnectionError("refused")
+
+    monkeypatch.setattr(jobs.requests, "post", failing_post)
+    queue._notify("http://callback.invalid/done", {"job_id": "a"})
+    assert posts == []  # the worker only queues the delivery
+
+    url, job = queue._callbacks.get_nowait()
+    start = clock.time()
+    JobQueue._post_callback(url, job)
+    assert [t - start for t in posts] == [0, 1, 3]
+    assert clock.time() - start == 3
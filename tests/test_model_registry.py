@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+import model_registry
+from conftest import FakeClock
+from model_registry import COLD, FAILED, WARM, ModelRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_registry, "time", clock)
+    return clock
+
+
+class FlakyLoader:
+    """Fails the first ``failures`` calls, then returns a model"""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise OSError(f"download failed ({self.calls})")
+        return f"model-{self.calls}"
+
+
+def test_model_loads_once_for_concurrent_first_requests(clock):
+    loader = FlakyLoader()
+    registry = ModelRegistry()
+    registry.register("image", loader)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get("image"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["model-1"] * 8
+    assert loader.calls == 1
+    assert registry.is_warm("image")
+
+
+def test_failed_load_is_retried_only_after_the_backoff(clock):
+    loader = FlakyLoader(failures=1)
+    registry = ModelRegistry(retry_backoff=5.0)
+    registry.register("image", loader)
+
+    with pytest.raises(RuntimeError, match="download failed"):
+        registry.get("image")
+    assert registry.status()["image"]["state"] == FAILED
+    assert registry.seconds_until_retry() == pytest.approx(5.0)
+
+    clock.advance(4.9)
+    with pytest.raises(RuntimeError):
+        registry.get("image")
+    assert loader.calls == 1
+
+    clock.advance(0.2)
+    assert registry.get("image") == "model-2"
+    assert registry.status()["image"] == {"state": WARM, "load_seconds": 0.0, "error": None, "failures": 0}
+    assert registry.seconds_until_retry() is None
+
+
+def test_backoff_doubles_up_to_the_cap(clock):
+    loader = FlakyLoader(failures=10)
+    registry = ModelRegistry(retry_backoff=5.0, max_retry_backoff=30.0)
+    registry.register("voice_encoder", loader, fallback="mock")
+
+    delays = []
+    for _ in range(5):
+        # The fallback stands in for the model while it is failing
+        assert registry.get("voice_encoder") == "mock"
+        delays.append(registry.seconds_until_retry(["voice_encoder"]))
+        clock.advance(delays[-1])
+    assert delays == [5.0, 10.0, 20.0, 30.0, 30.0]
+    assert loader.calls == 5
+    assert registry.status()["voice_encoder"]["failures"] == 5
+
+
+def test_seconds_until_retry_only_counts_the_named_models(clock):
+    registry = ModelRegistry(retry_backoff=5.0)
+    registry.register("image", FlakyLoader())
+    registry.register("voice_encoder", FlakyLoader(failures=1), fallback="mock")
+    registry.preload()
+
+    assert registry.seconds_until_retry(["image"]) is None
+    assert registry.seconds_until_retry(["image", "voice_encoder"]) == pytest.approx(5.0)
+
+
+def test_unload_resets_the_model_to_cold(clock):
+    loader = FlakyLoader()
+    registry = ModelRegistry()
+    registry.register("image", loader)
+    registry.get("image")
+    registry.unload("image")
+    assert registry.status()["image"]["state"] == COLD
+    assert registry.get("image") == "model-2"
+
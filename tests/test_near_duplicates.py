@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from near_duplicates import BKTree, NearDuplicateIndex, hamming
+
+
+def _near(rng, key, flips):
+    for bit in rng.sample(range(64), flips):
+        key ^= 1 << bit
+    return key
+
+
+@pytest.mark.parametrize("radius", [0, 1, 4, 10])
+def test_bktree_search_matches_brute_force(radius):
+    rng = random.Random(radius)
+    bases = [rng.getrandbits(64) for _ in range(20)]
+    # Clusters of close hashes plus exact duplicates, like re-encoded copies of the same images
+    keys = [_near(rng, rng.choice(bases), rng.randint(0, 12)) for _ in range(2000)]
+    keys += keys[:50]
+    tree = BKTree()
+    for i, key in enumerate(keys):
+        tree.add(key, str(i))
+    assert tree.size == len(keys)
+
+    for _ in range(100):
+        query = _near(rng, rng.choice(bases), rng.randint(0, 8))
+        expected = sorted((hamming(query, key), str(i)) for i, key in enumerate(keys)
+                          if hamming(query, key) <= radius)
+        assert sorted(tree.search(query, radius)) == expected
+
+
+def test_empty_bktree():
+    assert BKTree().search(0, 64) == []
+
+
+def test_index_requires_both_hashes_to_match():
+    index = NearDuplicateIndex(radius=4, dhash_radius=8)
+    index.add("a", (0b1111, 0), {"result": "fake"})
+
+    match = index.lookup((0b0111, 0b11))
+    assert match is not None and match["id"] == "a"
+    assert (match["distance"], match["dhash_distance"]) == (1, 2)
+    assert index.lookup((0b0111, (1 << 9) - 1)) is None  # pHash close, dHash 9 bits away
+    assert index.lookup((0b1111 << 8, 0)) is None
+    assert index.stats()["hits"] == 1
+
+
+def test_index_ignores_evicted_and_rehashed_entries():
+    index = NearDuplicateIndex(max_entries=2)
+    index.add("a", (0, 0), {"result": "fake"})
+    index.add("b", (1 << 40, 0), {"result": "real"})
+    index.add("a", (1 << 20, 0), {"result": "fake"})  # same id, new hash: the old node is stale
+    index.add("c", (1 << 60, 0), {"result": "real"})  # evicts "b"
+
+    assert index.matches((0, 0), radius=0) == []
+    assert index.matches((1 << 40, 0), radius=0) == []
+    assert [m["id"] for m in index.matches((1 << 20, 0), radius=0)] == ["a"]
@@ -0,0 +1,65 @@
+import pytest
+
+import model_registry
+from conftest import FakeClock
+from model_registry import ModelRegistry
+
+
+@pytest.fixture
+def clock(main, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(model_registry, "time", clock)
+    monkeypatch.setattr(main, "time", clock)
+    return clock
+
+
+def make_registry(main, monkeypatch, image_failures=0):
+    calls = {"image": 0}
+
+    def load_image():
+        calls["image"] += 1
+        if calls["image"] <= image_failures:
+            raise OSError("weights unavailable")
+        return "classifier"
+
+    registry = ModelRegistry(retry_backoff=5.0)
+    registry.register("image", load_image)
+    registry.register("image_preprocessor", lambda: "preprocessor")
+    monkeypatch.setattr(main, "registry", registry)
+    monkeypatch.setattr(main, "READY_MODELS", ["image", "image_preprocessor"])
+    return calls
+
+
+def test_readyz_reports_503_until_warm_up_and_200_after(main, clock, monkeypatch):
+    make_registry(main, monkeypatch)
+    client = main.app.test_client()
+
+    assert client.get("/healthz").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.get_json()["ready"] is False
+    assert response.get_json()["models"]["image"]["state"] == "cold"
+
+    main.warm_up()
+
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json()["ready"] is True
+    assert {name: model["state"] for name, model in response.get_json()["models"].items()} == {
+        "image": "warm", "image_preprocessor": "warm"}
+
+
+def test_background_warm_up_retries_until_ready(main, clock, monkeypatch):
+    calls = make_registry(main, monkeypatch, image_failures=2)
+    client = main.app.test_client()
+
+    main.warm_up(retry=False)
+    assert client.get("/readyz").status_code == 503
+    assert client.get("/readyz").get_json()["models"]["image"]["error"] == "weights unavailable"
+
+    # Sleeps on the registry's backoff (5 s, then 10 s) instead of spinning
+    started = clock.now
+    main.warm_up(retry=True)
+    assert calls["image"] == 3
+    assert clock.now - started == pytest.approx(15.0)
+    assert client.get("/readyz").status_code == 200
@@ -0,0 +1,87 @@
+import pytest
+
+import result_cache
+from conftest import FakeClock
+from result_cache import ResultCache, make_cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache, "time", clock)
+    return clock
+
+
+def test_cache_key_depends_on_model_and_params():
+    key = make_cache_key("abc", "model", "v1", threshold=0.5)
+    assert key == make_cache_key("abc", "model", "v1", threshold=0.5)
+    assert key != make_cache_key("abc", "model", "v2", threshold=0.5)
+    assert key != make_cache_key("abc", "model", "v1", threshold=0.6)
+
+
+def test_memory_tier_evicts_least_recently_used(clock):
+    cache = ResultCache(max_entries=2)
+    cache.set("a", {"result": "real"})
+    cache.set("b", {"result": "fake"})
+    assert cache.get("a") == {"result": "real"}  # "b" is now the oldest
+    cache.set("c", {"result": "real"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["memory_entries"] == 2
+
+
+def test_returned_results_are_copies(clock):
+    cache = ResultCache()
+    cache.set("a", {"result": "real"})
+    cache.get("a")["result"] = "changed"
+    assert cache.get("a") == {"result": "real"}
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(ttl_seconds=60)
+    cache.set("a", {"result": "real"})
+    clock.advance(59)
+    assert cache.get("a") is not None
+    clock.advance(2)
+    assert cache.get("a") is None
+
+
+def test_disk_tier_survives_a_new_cache_and_promotes_hits(clock, tmp_path):
+    path = str(tmp_path / "results.db")
+    ResultCache(disk_path=path).set("a", {"result": "fake"})
+
+    cache = ResultCache(max_entries=10, disk_path=path)
+    assert cache.get("a") == {"result": "fake"}
+    assert cache.get("a") == {"result": "fake"}
+    stats = cache.stats()
+    assert stats["hits"] == 2
+    assert stats["disk_hits"] == 1  # the second lookup is served from memory
+    assert stats["memory_entries"] == 1
+
+
+def test_disk_tier_evicts_least_recently_accessed_rows(clock, tmp_path):
+    cache = ResultCache(max_entries=0, disk_path=str(tmp_path / "results.db"), disk_max_entries=2)
+    cache.set("a", {"n": 1})
+    clock.advance(1)
+    cache.set("b", {"n": 2})
+    clock.advance(1)
+    assert cache.get("a") == {"n": 1}
+    clock.advance(1)
+    cache.set("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+    assert cache.stats()["disk_entries"] == 2
+
+
+def test_disk_tier_drops_expired_rows(clock, tmp_path):
+    cache = ResultCache(max_entries=0, ttl_seconds=10, disk_path=str(tmp_path / "results.db"))
+    cache.set("a", {"n": 1})
+    clock.advance(11)
+    assert cache.get("a") is None
+    assert cache.stats()["disk_entries"] == 0
@@ -0,0 +1,87 @@
+import pytest
+
+from conftest import FakeClock
+from google_agent import session_store
+from google_agent.session_store import (LocalRedis, MemorySessionStore, RedisSessionStore,
+                                        SQLiteSessionStore, append_messages, new_session)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(session_store, "time", clock)
+    return clock
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def make_store(request, tmp_path):
+    def make(ttl_seconds=60, max_sessions=100):
+        if request.param == "memory":
+            return MemorySessionStore(ttl_seconds=ttl_seconds, max_sessions=max_sessions)
+        if request.param == "sqlite":
+            return SQLiteSessionStore(str(tmp_path / "sessions.db"), ttl_seconds=ttl_seconds,
+                                      max_sessions=max_sessions)
+        return RedisSessionStore(LocalRedis(max_keys=max_sessions), ttl_seconds=ttl_seconds)
+    return make
+
+
+def test_sessions_expire_after_idle_ttl(clock, make_store):
+    store = make_store(ttl_seconds=60)
+    store.put("a", {"n": 1})
+    clock.advance(59)
+    assert store.get("a") == {"n": 1}  # access slides the expiry
+    clock.advance(59)
+    assert "a" in store
+    clock.advance(61)
+    assert store.get("a") is None
+
+
+def test_least_recently_used_session_is_evicted(clock, make_store):
+    store = make_store(max_sessions=2)
+    store.put("a", {"n": 1})
+    clock.advance(1)
+    store.put("b", {"n": 2})
+    clock.advance(1)
+    store.get("a")
+    clock.advance(1)
+    store.put("c", {"n": 3})
+
+    assert store.get("b") is None
+    assert store.get("a") == {"n": 1}
+    assert store.get("c") == {"n": 3}
+
+
+def test_update_and_delete(clock, make_store):
+    store = make_store()
+    store.put("a", {"n": 1})
+    assert store.update("a", lambda session: session.update(n=2)) == {"n": 2}
+    assert store.get("a") == {"n": 2}
+    store.delete("a")
+    assert store.update("a", lambda session: session.update(n=3)) is None
+
+
+def test_memory_store_returns_copies(clock):
+    store = MemorySessionStore()
+    session = {"messages": []}
+    store.put("a", session)
+    session["messages"].append("changed")
+    store.get("a")["messages"].append("changed")
+    assert store.get("a") == {"messages": []}
+
+
+def test_append_messages_compacts_into_a_ring_buffer():
+    session = new_session("user")
+    messages = [{"role": "user", "content": str(i)} for i in range(10)]
+    messages[1]["detection"] = {"result": "fake"}
+    append_messages(session, messages, max_messages=3, max_compacted=4)
+
+    assert [m["content"] for m in session["messages"]] == ["7", "8", "9"]
+    assert [m["content"] for m in session["compacted"]] == ["3", "4", "5", "6"]
+    assert session["total_messages"] == 10
+
+    session = new_session("user")
+    append_messages(session, messages[:4], max_messages=2, max_compacted=4)
+    assert session["compacted"] == [{"role": "user", "content": "0"},
+                                    {"role": "user", "content": "1", "result": "fake"}]
+    append_messages(session, messages[4:], max_messages=2, max_compacted=4)
+    assert [m["content"] for m in session["compacted"]] == ["4", "5", "6", "7"]
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("torch")
+resemblyzer = pytest.importorskip("resemblyzer")
+
+from voice_embedding import combine_partials, forward_partials, utterance_partials
+
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    return resemblyzer.VoiceEncoder("cpu", verbose=False)
+
+
+def clip(seconds, seed):
+    """A preprocessed-looking waveform: a few harmonics with vibrato plus noise"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    pitch = 120 + 40 * seed + 5 * np.sin(2 * np.pi * 5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / SAMPLE_RATE
+    wav = sum(np.sin(h * phase) / h for h in range(1, 6)) + 0.05 * rng.standard_normal(t.size)
+    return (0.3 * wav / np.abs(wav).max()).astype(np.float32)
+
+
+def test_batched_embeddings_match_embed_utterance(encoder):
+    clips = [clip(1.2, 0), clip(4.0, 1), clip(9.5, 2)]
+    expected = [encoder.embed_utterance(wav) for wav in clips]
+
+    partials = [utterance_partials(wav) for wav in clips]
+    # A small window cap splits the stacked batch across several forward passes
+    batched = forward_partials(encoder, partials, max_windows=5)
+
+    assert [len(p) for p in batched] == [len(p) for p in partials]
+    for embedding, reference in zip(batched, expected):
+        combined = combine_partials(embedding)
+        assert combined.shape == reference.shape
+        assert np.linalg.norm(combined) == pytest.approx(1.0, abs=1e-5)
+        np.testing.assert_allclose(combined, reference, atol=1e-4)
+
+
+def test_single_clip_matches_embed_utterance(encoder):
+    wav = clip(3.0, 3)
+    embedding = combine_partials(forward_partials(encoder, [utterance_partials(wav)])[0])
+    np.testing.assert_allclose(embedding, encoder.embed_utterance(wav), atol=1e-4)
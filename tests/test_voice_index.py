@@ -0,0 +1,108 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+import voice_index
+from voice_index import EMBEDDINGS_FILE, VoiceIndex
+
+DIM = 32
+
+
+def random_vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def test_index_round_trips_through_its_directory(tmp_path):
+    vectors = random_vectors(50)
+    index = VoiceIndex(str(tmp_path), dim=DIM)
+    entries = [index.add(v, 'synthetic' if i % 3 else 'human', name=f"voice-{i}", source="test")
+               for i, v in enumerate(vectors)]
+
+    reopened = VoiceIndex(str(tmp_path), dim=DIM)
+    assert len(reopened) == 50
+    assert reopened.stats()['labels'] == {'synthetic': 33, 'human': 17}
+    for i in (0, 17, 49):
+        best = reopened.search(vectors[i], k=1)[0]
+        assert best['id'] == entries[i]['id']
+        assert best['name'] == f"voice-{i}"
+        assert best['source'] == "test"
+        assert best['similarity'] == pytest.approx(1.0, abs=1e-4)
+
+
+def test_growth_beyond_the_initial_capacity_keeps_rows():
+    vectors = random_vectors(1500, seed=1)
+    index = VoiceIndex(dim=DIM)
+    entries = [index.add(v, 'human') for v in vectors]
+    assert len(index) == 1500
+    assert index.search(vectors[1400], k=1)[0]['id'] == entries[1400]['id']
+
+
+def _enroll(path, seed, count):
+    index = VoiceIndex(path, dim=DIM)
+    for vector in random_vectors(count, seed=seed):
+        index.add(vector, 'synthetic', name=f"proc-{seed}")
+
+
+@pytest.mark.skipif(voice_index.fcntl is None, reason="cross-process appends need flock")
+def test_processes_append_to_one_directory_and_see_each_other(tmp_path):
+    path = str(tmp_path)
+    index = VoiceIndex(path, dim=DIM)
+    index.add(random_vectors(1, seed=99)[0], 'human', name="parent")
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_enroll, args=(path, seed, 40)) for seed in (1, 2, 3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(timeout=30)
+        assert worker.exitcode == 0
+
+    # The parent picks the other processes' rows up incrementally, without reopening
+    assert index.stats()['size'] == 121
+    for seed in (1, 2, 3):
+        best = index.search(random_vectors(40, seed=seed)[7], k=1)[0]
+        assert best['name'] == f"proc-{seed}"
+        assert best['similarity'] == pytest.approx(1.0, abs=1e-4)
+
+    # Both files stay row-aligned: a fresh reader maps every vector to its own metadata
+    fresh = VoiceIndex(path, dim=DIM)
+    assert len(fresh) == 121
+    assert fresh.search(random_vectors(40, seed=2)[39], k=1)[0]['name'] == "proc-2"
+
+
+def test_unpaired_tail_from_a_dead_writer_is_dropped(tmp_path):
+    index = VoiceIndex(str(tmp_path), dim=DIM)
+    vectors = random_vectors(3, seed=4)
+    index.add(vectors[0], 'human', name="first")
+    # A writer that died after its embedding append but before its metadata line
+    with open(os.path.join(str(tmp_path), EMBEDDINGS_FILE), 'ab') as f:
+        f.write(vectors[1].tobytes())
+
+    assert len(VoiceIndex(str(tmp_path), dim=DIM)) == 1
+    index.add(vectors[2], 'synthetic', name="second")
+    reopened = VoiceIndex(str(tmp_path), dim=DIM)
+    assert len(reopened) == 2
+    assert reopened.search(vectors[2], k=1)[0]['name'] == "second"
+
+
+def test_ivf_recall_against_brute_force():
+    rng = np.random.default_rng(5)
+    centers = rng.standard_normal((40, DIM))
+    data = (centers[rng.integers(0, 40, 4000)] + 0.3 * rng.standard_normal((4000, DIM))).astype(np.float32)
+    queries = (centers[rng.integers(0, 40, 50)] + 0.3 * rng.standard_normal((50, DIM))).astype(np.float32)
+
+    index = VoiceIndex(dim=DIM, ivf_min_size=0, nprobe=8)
+    ids = [index.add(v, 'human')['id'] for v in data]
+    index.train()
+    assert index.stats()['mode'] == 'ivf'
+
+    unit = data / np.linalg.norm(data, axis=1, keepdims=True)
+    k = 10
+    hits = 0
+    for query in queries:
+        exact = np.argsort(-(unit @ (query / np.linalg.norm(query))))[:k]
+        found = {match['id'] for match in index.search(query, k=k)}
+        hits += len(found & {ids[i] for i in exact})
+    assert hits / (k * len(queries)) >= 0.9